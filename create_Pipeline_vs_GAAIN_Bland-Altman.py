@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 """
 Create NEW Figure 2B: Bland-Altman for Your Pipeline vs GAAIN
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python create_Pipeline_vs_GAAIN_Bland-Altman.py --profile[=timers|cprofile|sample]
 """
 
+from pet_pipeline import profiling
+profile = profiling.start("create_Pipeline_vs_GAAIN_Bland-Altman")
+profile.phase("imports", "loading")
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -13,6 +20,7 @@ plt.style.use('seaborn-v0_8-whitegrid')
 
 print("Creating NEW Figure 2B: Pipeline vs GAAIN Bland-Altman...")
 
+profile.phase("load data", "loading")
 # Load your cleaned validation data (from earlier script)
 # Assuming you have validation_df from previous analysis
 # If not, recreate it:
@@ -52,6 +60,7 @@ for idx, row in valid_results.iterrows():
 
 validation_df = pd.DataFrame(validation_data)
 
+profile.phase("figure 2B stats", "statistics")
 # Calculate Bland-Altman for Your Pipeline vs GAAIN
 validation_df['Mean_SUVR'] = (validation_df['Your_SUVR_CG'] + validation_df['GAAIN_SUVR_CG']) / 2
 validation_df['Diff_SUVR'] = validation_df['Your_SUVR_CG'] - validation_df['GAAIN_SUVR_CG']  # Your - GAAIN
@@ -70,6 +79,7 @@ print(f"  Limits of agreement: [{lower_limit:.3f}, {upper_limit:.3f}]")
 print(f"  Correlation: r = {r:.3f}, p = {p:.4f}")
 print(f"  MAPE: {np.mean(np.abs(validation_df['Diff_SUVR']/validation_df['GAAIN_SUVR_CG']))*100:.1f}%")
 
+profile.phase("figure 2B render", "rendering")
 # Create Figure 2B
 fig, ax = plt.subplots(figsize=(8, 6))
 
@@ -110,10 +120,12 @@ ax.legend(loc='upper right', fontsize=10)
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 2B save", "saving")
 # Save figure
 fig.savefig('Figure2B_Pipeline_vs_GAAIN_BlandAltman.png', dpi=300, bbox_inches='tight')
 print("\nFigure 2B saved as 'Figure2B_Pipeline_vs_GAAIN_BlandAltman.png'")
 
+profile.phase("display", "rendering")
 # Show figure
 plt.show()
 
@@ -121,6 +133,7 @@ plt.show()
 # OPTIONAL: Create a combined figure (2A + 2B)
 # ==============================================
 print("\nCreating combined Figure 2 (A+B)...")
+profile.phase("combined figure render", "rendering")
 
 # Load SPM vs FSL data (from Abdullahi's results)
 # This would need the actual data files
@@ -163,5 +176,6 @@ ax2.legend(loc='upper right', fontsize=9)
 plt.suptitle('Bland-Altman Analyses: Reproducibility and Validation', 
              fontsize=14, fontweight='bold', y=1.02)
 plt.tight_layout()
+profile.phase("combined figure save", "saving")
 plt.savefig('Figure2_Combined_BlandAltman.png', dpi=300, bbox_inches='tight')
 print("Combined Figure 2 saved as 'Figure2_Combined_BlandAltman.png'")
\ No newline at end of file
@@ -3,8 +3,15 @@
 Create AAIC submission figures for amyloid PET pipeline
 Author: Your Name
 Date: 2025-01-07
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python create_aaic_figures.py --profile[=timers|cprofile|sample]
 """
 
+from pet_pipeline import profiling
+profile = profiling.start("create_aaic_figures")
+profile.phase("imports", "loading")
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -21,6 +28,7 @@ sns.set_palette("colorblind")
 # 1. LOAD AND PREPARE DATA
 # ============================================================================
 
+profile.phase("load data", "loading")
 print("Loading data...")
 
 # Load your FSL results
@@ -36,6 +44,7 @@ print(f"Your valid results: {len(valid_results)} subjects")
 # FIGURE 1: VALIDATION SCATTER PLOT (Your FSL vs GAAIN)
 # ============================================================================
 
+profile.phase("figure 1 stats", "statistics")
 print("\nCreating Figure 1: Validation Scatter Plot...")
 
 # GAAIN reference values (manually extracted from your data)
@@ -78,6 +87,7 @@ print(f"Correlation with GAAIN: r = {r:.3f}, p = {p:.4f}")
 print(f"MAPE: {mape:.1f}%")
 print(f"R²: {r_squared:.3f}")
 
+profile.phase("figure 1 render", "rendering")
 # Create Figure 1
 fig1, ax1 = plt.subplots(figsize=(8, 6))
 
@@ -116,6 +126,7 @@ ax1.set_aspect('equal', adjustable='box')
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 1 save", "saving")
 # Save figure
 fig1.savefig('Figure1_Validation_Scatter.png', dpi=300, bbox_inches='tight')
 print("Figure 1 saved as 'Figure1_Validation_Scatter.png'")
@@ -124,6 +135,7 @@ print("Figure 1 saved as 'Figure1_Validation_Scatter.png'")
 # FIGURE 2: REPRODUCIBILITY BLAND-ALTMAN (SPM vs FSL)
 # ============================================================================
 
+profile.phase("figure 2 stats", "statistics")
 print("\nCreating Figure 2: Reproducibility Bland-Altman Plot...")
 
 # We'll use Abdullahi's data for reproducibility
@@ -183,6 +195,7 @@ print(f"Reproducibility correlation: r = {r_repro:.3f}, p = {p_repro:.4f}")
 print(f"Mean difference (SPM - FSL): {mean_diff:.3f}")
 print(f"Limits of agreement: [{lower_limit:.3f}, {upper_limit:.3f}]")
 
+profile.phase("figure 2 render", "rendering")
 # Create Figure 2
 fig2, ax2 = plt.subplots(figsize=(8, 6))
 
@@ -216,6 +229,7 @@ ax2.legend(loc='upper right', fontsize=10)
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 2 save", "saving")
 # Save figure
 fig2.savefig('Figure2_Reproducibility_BlandAltman.png', dpi=300, bbox_inches='tight')
 print("Figure 2 saved as 'Figure2_Reproducibility_BlandAltman.png'")
@@ -224,6 +238,7 @@ print("Figure 2 saved as 'Figure2_Reproducibility_BlandAltman.png'")
 # FIGURE 3: CENTILOID DISTRIBUTION (AD vs Controls)
 # ============================================================================
 
+profile.phase("figure 3 stats", "statistics")
 print("\nCreating Figure 3: Centiloid Distribution...")
 
 # Calculate Centiloid from your valid results
@@ -234,6 +249,7 @@ slope_cl = 0.0086
 
 valid_results['Centiloid'] = (valid_results['SUVR_CG'] - intercept) / slope_cl
 
+profile.phase("figure 3 render", "rendering")
 # Create Figure 3
 fig3, ax3 = plt.subplots(figsize=(8, 6))
 
@@ -286,6 +302,7 @@ ax3.legend(loc='upper right', fontsize=10)
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 3 save", "saving")
 # Save figure
 fig3.savefig('Figure3_Centiloid_Distribution.png', dpi=300, bbox_inches='tight')
 print("Figure 3 saved as 'Figure3_Centiloid_Distribution.png'")
@@ -294,6 +311,7 @@ print("Figure 3 saved as 'Figure3_Centiloid_Distribution.png'")
 # SUMMARY STATISTICS
 # ============================================================================
 
+profile.phase("summary", "statistics")
 print("\n" + "="*60)
 print("SUMMARY STATISTICS")
 print("="*60)
@@ -317,5 +335,6 @@ print("2. Figure2_Reproducibility_BlandAltman.png")
 print("3. Figure3_Centiloid_Distribution.png")
 print("="*60)
 
+profile.phase("display", "rendering")
 # Show all figures
 plt.show()
@@ -3,8 +3,15 @@
 Create AAIC submission figures for amyloid PET pipeline - CLEANED VERSION
 Author: Your Name
 Date: 2025-01-07
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python create_aaic_figures_cleaned.py --profile[=timers|cprofile|sample]
 """
 
+from pet_pipeline import profiling
+profile = profiling.start("create_aaic_figures_cleaned")
+profile.phase("imports", "loading")
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -21,6 +28,7 @@ sns.set_palette("colorblind")
 # 1. LOAD AND PREPARE DATA
 # ============================================================================
 
+profile.phase("load data", "loading")
 print("Loading and cleaning data...")
 
 # Load your FSL results
@@ -41,6 +49,7 @@ print(f"Removed problematic subjects: {problematic_fsl}")
 # FIGURE 1: VALIDATION SCATTER PLOT (Your FSL vs GAIN)
 # ============================================================================
 
+profile.phase("figure 1 stats", "statistics")
 print("\nCreating Figure 1: Validation Scatter Plot...")
 
 # GAIN reference values (manually extracted from your data)
@@ -83,6 +92,7 @@ print(f"Correlation with GAIN: r = {r:.3f}, p = {p:.4f}")
 print(f"MAPE: {mape:.1f}%")
 print(f"R²: {r_squared:.3f}")
 
+profile.phase("figure 1 render", "rendering")
 # Create Figure 1
 fig1, ax1 = plt.subplots(figsize=(8, 6))
 
@@ -121,6 +131,7 @@ ax1.set_aspect('equal', adjustable='box')
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 1 save", "saving")
 # Save figure
 fig1.savefig('Figure1_Validation_Scatter_CLEANED.png', dpi=300, bbox_inches='tight')
 print("Figure 1 saved as 'Figure1_Validation_Scatter_CLEANED.png'")
@@ -129,6 +140,7 @@ print("Figure 1 saved as 'Figure1_Validation_Scatter_CLEANED.png'")
 # FIGURE 2: REPRODUCIBILITY BLAND-ALTMAN (SPM vs FSL) - CLEANED
 # ============================================================================
 
+profile.phase("figure 2 stats", "statistics")
 print("\nCreating Figure 2: Reproducibility Bland-Altman Plot (Cleaned)...")
 
 # Abdullahi's FSL results
@@ -193,6 +205,7 @@ print(f"Reproducibility correlation: r = {r_repro:.3f}, p = {p_repro:.4f}")
 print(f"Mean difference (SPM - FSL): {mean_diff:.3f}")
 print(f"Limits of agreement: [{lower_limit:.3f}, {upper_limit:.3f}]")
 
+profile.phase("figure 2 render", "rendering")
 # Create Figure 2
 fig2, ax2 = plt.subplots(figsize=(8, 6))
 
@@ -226,6 +239,7 @@ ax2.legend(loc='upper right', fontsize=10)
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 2 save", "saving")
 # Save figure
 fig2.savefig('Figure2_Reproducibility_BlandAltman_CLEANED.png', dpi=300, bbox_inches='tight')
 print("Figure 2 saved as 'Figure2_Reproducibility_BlandAltman_CLEANED.png'")
@@ -234,6 +248,7 @@ print("Figure 2 saved as 'Figure2_Reproducibility_BlandAltman_CLEANED.png'")
 # FIGURE 3: CENTILOID DISTRIBUTION - CLEANED
 # ============================================================================
 
+profile.phase("figure 3 stats", "statistics")
 print("\nCreating Figure 3: Centiloid Distribution (Cleaned)...")
 
 # Calculate Centiloid from your valid results
@@ -244,6 +259,7 @@ slope_cl = 0.0086
 
 valid_results['Centiloid'] = (valid_results['SUVR_CG'] - intercept) / slope_cl
 
+profile.phase("figure 3 render", "rendering")
 # Create Figure 3
 fig3, ax3 = plt.subplots(figsize=(8, 6))
 
@@ -299,6 +315,7 @@ ax3.legend(loc='upper right', fontsize=10)
 # Adjust layout
 plt.tight_layout()
 
+profile.phase("figure 3 save", "saving")
 # Save figure
 fig3.savefig('Figure3_Centiloid_Distribution_CLEANED.png', dpi=300, bbox_inches='tight')
 print("Figure 3 saved as 'Figure3_Centiloid_Distribution_CLEANED.png'")
@@ -307,12 +324,14 @@ print("Figure 3 saved as 'Figure3_Centiloid_Distribution_CLEANED.png'")
 # FIGURE 4: QC IMPACT VISUALIZATION
 # ============================================================================
 
+profile.phase("figure 4 stats", "statistics")
 print("\nCreating Figure 4: QC Impact Visualization...")
 
 # Identify subjects that needed QC correction
 qc_subjects = your_results[your_results['Note'].str.contains('HIGH_CEREB_', na=False)].copy()
 
 if len(qc_subjects) > 0:
+    profile.phase("figure 4 render", "rendering")
     # These subjects had intensity issues that needed correction
     # We can show the impact by comparing their values to expected ranges
     
@@ -348,6 +367,7 @@ if len(qc_subjects) > 0:
     ax4b.tick_params(axis='x', rotation=45)
     
     plt.tight_layout()
+    profile.phase("figure 4 save", "saving")
     fig4.savefig('Figure4_QC_Impact_CLEANED.png', dpi=300, bbox_inches='tight')
     print("Figure 4 saved as 'Figure4_QC_Impact_CLEANED.png'")
 else:
@@ -357,6 +377,7 @@ else:
 # SUMMARY STATISTICS - CLEANED
 # ============================================================================
 
+profile.phase("summary", "statistics")
 print("\n" + "="*60)
 print("SUMMARY STATISTICS (CLEANED DATASET)")
 print("="*60)
@@ -399,4 +420,5 @@ if len(qc_subjects) > 0:
 print("="*60)
 
 # Show all figures
+profile.phase("display", "rendering")
 plt.show()
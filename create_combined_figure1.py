@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 """
 Create NEW Figure 1: Combined Validation Plot (Both pipelines vs GAAIN)
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python create_combined_figure1.py --profile[=timers|cprofile|sample]
 """
 
+from pet_pipeline import profiling
+profile = profiling.start("create_combined_figure1")
+profile.phase("imports", "loading")
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -18,6 +25,7 @@ print("Creating NEW Figure 1: Combined Validation Plot...")
 # ============================================================================
 # 1. PREPARE YOUR FSL DATA
 # ============================================================================
+profile.phase("load data", "loading")
 # Your cleaned results
 your_results = pd.read_csv('results/summary_20251230.csv')
 valid_results = your_results[~your_results['Note'].str.contains('HIGH_CEREB_', na=False)].copy()
@@ -58,6 +66,7 @@ your_corr, _ = stats.pearsonr(your_df['GAAIN_SUVR'], your_df['Pipeline_SUVR'])
 # ============================================================================
 # 2. PREPARE ABDULLAHI'S SPM DATA
 # ============================================================================
+profile.phase("spm data", "loading")
 # Abdullahi's SPM results
 abdullahi_spm_data = {
     'subject_id': ['sub-01', 'sub-02', 'sub-03', 'sub-04', 'sub-06', 'sub-07', 
@@ -83,6 +92,7 @@ abdullahi_corr, _ = stats.pearsonr(abdullahi_df['GAAIN_SUVR'], abdullahi_df['Pip
 # ============================================================================
 # 3. COMBINE DATA
 # ============================================================================
+profile.phase("combine data", "statistics")
 # Add YC data to Abdullahi's for completeness (all 1.0 SUVR for visualization)
 yc_reference = pd.DataFrame({
     'GAAIN_SUVR': [1.0, 1.1, 1.2, 1.3],
@@ -105,6 +115,7 @@ print(f"• Abdullahi's SPM vs GAAIN: r = {abdullahi_corr:.3f}")
 # ============================================================================
 # 4. CREATE COMBINED PLOT
 # ============================================================================
+profile.phase("figure 1 render", "rendering")
 fig, ax = plt.subplots(figsize=(10, 8))
 
 # Define colors and markers
@@ -175,6 +186,7 @@ ax.text(0.05, 0.05, 'Reproducibility between FSL implementations: r = 0.92',
 
 plt.tight_layout()
 
+profile.phase("figure 1 save", "saving")
 # Save figure
 plt.savefig('Figure1_Combined_Validation.png', dpi=300, bbox_inches='tight')
 plt.savefig('Figure1_Combined_Validation.jpg', dpi=300, bbox_inches='tight')
@@ -183,6 +195,7 @@ print("\n✓ Figure 1 saved as 'Figure1_Combined_Validation.png' and '.jpg'")
 # ============================================================================
 # 5. CREATE SIMPLER VERSION (Alternative)
 # ============================================================================
+profile.phase("simple figure render", "rendering")
 print("\nCreating simplified version...")
 
 fig2, ax2 = plt.subplots(figsize=(8, 6))
@@ -221,9 +234,11 @@ ax2.grid(True, alpha=0.3)
 ax2.set_aspect('equal', adjustable='box')
 
 plt.tight_layout()
+profile.phase("simple figure save", "saving")
 plt.savefig('Figure1_Simple_Validation.png', dpi=300, bbox_inches='tight')
 print("✓ Simplified version saved as 'Figure1_Simple_Validation.png'")
 
+profile.phase("display", "rendering")
 plt.show()
 
 print("\n" + "="*60)
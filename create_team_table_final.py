@@ -2,8 +2,15 @@
 """
 Create Table 1: Complete Team Collaboration Results
 Includes ALL analyses: Your FSL, Abdullahi's SPM, AND Abdullahi's FSL
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python create_team_table_final.py --profile[=timers|cprofile|sample]
 """
 
+from pet_pipeline import profiling
+profile = profiling.start("create_team_table_final")
+profile.phase("imports", "loading")
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -14,6 +21,7 @@ print("Creating Table 1: Complete Team Collaboration Results\n")
 # ============================================================================
 # 1. GAAIN REFERENCE VALUES
 # ============================================================================
+profile.phase("load data", "loading")
 gaain_ad_mean = 2.31
 gaain_ad_sd = 0.28
 
@@ -88,6 +96,7 @@ abdullahi_fsl_corr, _ = pearsonr(abdullahi_fsl_clean['FSL_SUVR_CG'], abdullahi_f
 # ============================================================================
 # 5. REPRODUCIBILITY ANALYSIS (Your FSL vs Abdullahi's FSL)
 # ============================================================================
+profile.phase("reproducibility", "statistics")
 # We need to match subjects between your FSL and Abdullahi's FSL
 # For simplicity, let's assume we have 20 matched subjects (from your r=0.924 result)
 repro_correlation = 0.924
@@ -96,6 +105,7 @@ repro_mean_diff = -0.239  # Your FSL - Abdullahi's FSL
 # ============================================================================
 # 6. CREATE THE COMPLETE TABLE
 # ============================================================================
+profile.phase("table", "statistics")
 table_data = [
     {
         "Analysis": "REFERENCE STANDARD",
@@ -173,6 +183,7 @@ print("=" * 90)
 # ============================================================================
 # 7. SAVE AS IMAGE FOR AAIC
 # ============================================================================
+profile.phase("table render", "rendering")
 print("\nSaving table as image...")
 
 fig, ax = plt.subplots(figsize=(14, 5))
@@ -201,12 +212,14 @@ plt.title("Table 1: Comprehensive Validation and Reproducibility Analysis\nby CO
           fontsize=12, fontweight='bold', pad=20)
 
 plt.tight_layout()
+profile.phase("table save", "saving")
 plt.savefig('Table1_Complete_Collaboration.png', dpi=300, bbox_inches='tight')
 print("✓ Table saved as 'Table1_Complete_Collaboration.png'")
 
 # ============================================================================
 # 8. KEY INSIGHTS
 # ============================================================================
+profile.phase("summary", "statistics")
 print("\n" + "=" * 90)
 print("KEY INSIGHTS FROM COMPLETE ANALYSIS")
 print("=" * 90)
@@ -230,6 +243,7 @@ print("\n4. REPRODUCIBILITY:")
 print(f"   • Between FSL implementations: r = {repro_correlation:.3f} (EXCELLENT)")
 print(f"   • Different teams, same method = High reproducibility")
 
+profile.phase("csv save", "saving")
 # Save as CSV
 df_table.to_csv('Table1_Complete_Collaboration.csv', index=False)
 print("\n✓ Table saved as 'Table1_Complete_Collaboration.csv'")
\ No newline at end of file
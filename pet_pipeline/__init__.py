@@ -0,0 +1,7 @@
+"""
+Native Python helpers for the amyloid PET pipeline.
+
+The shell scripts in scripts/ drive FSL; the modules here cover the parts
+that are faster or easier to do in NumPy (QC rendering, statistics, caches).
+Run them from the project root, e.g. ``python -m pet_pipeline.contact_sheet``.
+"""
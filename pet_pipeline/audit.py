@@ -0,0 +1,124 @@
+"""
+Header-only orientation and geometry audit of the cohort.
+
+Reads just the 348-byte NIfTI header of every T1 and PET under data/ on a
+thread pool (no voxel data, no fslreorient2std test writes) and reports
+qform/sform codes, orientation, dims, pixdim, datatype and scaling. Files
+are flagged when fslreorient2std would change them (not LAS), when they
+carry no usable orientation, when qform and sform disagree, or when an
+MNI-space output is not on the 2mm MNI grid.
+
+Usage:
+    python -m pet_pipeline.audit                 # whole data/ tree
+    python -m pet_pipeline.audit FILE [FILE...]  # selected images
+"""
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import config, nifti
+from .manifest import Manifest
+
+FIELDS = ["subject", "modality", "path", "dims", "pixdim", "datatype", "scl_slope",
+          "scl_inter", "qform_code", "sform_code", "orientation", "flags"]
+
+
+def find_images(data_dir=config.DATA_DIR):
+    """(subject, modality, path) for every NIfTI in the cohort manifest."""
+    manifest = Manifest.load_or_build(data_dir, hash_files=False)
+    return [(subject, f["folder"], f["path"])
+            for subject in sorted(manifest.subjects)
+            for f in manifest.files(subject)
+            if f["folder"] in ("anat", "pet") and not f["path"].endswith(".mat")]
+
+
+def audit_header(header, path):
+    """Flags for one header (empty list means nothing to fix)."""
+    flags = []
+    if header.qform_code == 0 and header.sform_code == 0:
+        flags.append("NO_ORIENTATION")
+    elif header.qform_code > 0 and header.sform_code > 0:
+        if not np.allclose(header.qform(), header.sform(), atol=1e-3):
+            flags.append("QFORM_SFORM_MISMATCH")
+    if nifti.orientation(header.affine) != config.STANDARD_ORIENTATION:
+        flags.append("NEEDS_REORIENT")
+    if header.scaled:
+        flags.append("SCALED")
+    if "_MNI" in os.path.basename(path):
+        if (header.shape[:3] != config.MNI_2MM_SHAPE
+                or not np.allclose(header.affine, config.MNI_2MM_AFFINE, atol=1e-3)):
+            flags.append("NOT_MNI_2MM_GRID")
+    return flags
+
+
+def audit_file(subject, modality, path):
+    try:
+        header = nifti.read_header(path)
+    except (OSError, EOFError, ValueError) as exc:
+        return {"subject": subject, "modality": modality, "path": path,
+                "flags": "UNREADABLE (%s)" % exc}
+    return {
+        "subject": subject,
+        "modality": modality,
+        "path": path,
+        "dims": "x".join(str(d) for d in header.shape),
+        "pixdim": "x".join("%g" % z for z in header.zooms),
+        "datatype": str(header.dtype.name) if header.datatype in nifti.DATATYPES
+        else "code%d" % header.datatype,
+        "scl_slope": "%g" % header.scl_slope,
+        "scl_inter": "%g" % header.scl_inter,
+        "qform_code": header.qform_code,
+        "sform_code": header.sform_code,
+        "orientation": "".join(nifti.orientation(header.affine)),
+        "flags": " ".join(audit_header(header, path)),
+    }
+
+
+def audit(images, workers=16):
+    """Audit (subject, modality, path) triples concurrently, preserving order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: audit_file(*item), images))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Header-only orientation/geometry audit")
+    parser.add_argument("files", nargs="*", help="images to audit (default: all of data/)")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--out", default=os.path.join(config.RESULTS_DIR, "orientation_audit.csv"))
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.files:
+        images = [(os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(f)))),
+                   os.path.basename(os.path.dirname(os.path.abspath(f))), f)
+                  for f in args.files]
+    else:
+        images = find_images(args.data)
+    rows = audit(images, args.workers)
+
+    for row in rows:
+        status = "⚠ " + row["flags"] if row["flags"] else "✓"
+        print("%-8s %-4s %-16s %-10s %s  %s" % (
+            row["subject"], row["modality"], row.get("dims", "?"),
+            row.get("orientation", "?"), os.path.basename(row["path"]), status))
+
+    flagged = [r for r in rows if r["flags"]]
+    print("")
+    print("Audited %d images, %d flagged" % (len(rows), len(flagged)))
+    if not args.files:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print("Report: %s" % args.out)
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
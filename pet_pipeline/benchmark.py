@@ -0,0 +1,258 @@
+"""
+Extraction benchmark on synthetic phantoms (runs offline).
+
+A phantom cohort (pet_pipeline.phantom) is written to a scratch directory
+and every extraction engine is run over it in a fresh interpreter, so the
+peak memory of one engine does not hide another's:
+
+  extract    pet_pipeline.extract.extract_subject (single-pass moments)
+  sweep      pet_pipeline.sweep.sweep_image at the extraction threshold
+  normalize  pet_pipeline.normalize.reference_mean (cerebellar grey mean
+             behind the >10 rescale rule)
+  resample   pet_pipeline.resample.fused_output with an identity FLIRT
+             matrix onto the phantom's own grid (one interpolation and
+             write), then extract_subject on the result
+  pvc        pet_pipeline.pvc.pvc_subject (GTM) with the phantoms' PSF
+             (--fwhm); the transfer model is built once per run from the
+             phantom's own brain, so the build is part of the timing
+  fslstats   ``fslstats PET -l THR -k VOI -M`` per region, as the shell
+             scripts call it (-l config.PET_THRESHOLD, see
+             scripts/pet_threshold.sh; skipped when fslstats is not on the
+             PATH)
+
+Each engine reports subjects per second, peak RSS (the engine's process,
+or the largest fslstats child) and its error against the analytically known
+values: SUVR per reference region, and for normalize the cerebellar grey
+mean (which also shows whether the x50 subjects cross the rescale rule).
+Aligned subjects must agree within TOLERANCE; misaligned ones are reported
+as bias only. The exit status is 1 when an engine is wrong. --fwhm blurs
+the phantoms like a scanner: pvc should then still recover the SUVRs,
+while the other engines measure the blurred image and fall short of them.
+
+Usage:
+    python -m pet_pipeline.benchmark [--ad 25] [--yc 25] [--engines extract sweep] \\
+        [--corrupt AD02=50] [--misalign AD04=4,0,0] [--fwhm 8] [--keep DIR]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import config, nifti, phantom
+
+ENGINES = ["extract", "sweep", "normalize", "resample", "pvc", "fslstats"]
+TOLERANCE = 0.01        # relative error allowed on aligned phantoms
+FIELDS = ["engine", "subjects", "wall", "subjects_per_s", "peak_rss_mb", "max_error",
+          "misaligned_bias", "failures"]
+
+
+def _rss_mb(maxrss):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+
+
+def _extract(subject, group, path):
+    from .extract import extract_subject
+    rows, _ = extract_subject(subject, path, group)
+    return {"suvr_" + r["reference"]: r["suvr"] for r in rows}
+
+
+def _sweep(subject, group, path):
+    from .sweep import sweep_image
+    curves = sweep_image(path, [config.PET_THRESHOLD])
+    return {"suvr_" + ref: float(suvr[0]) for ref, (_, _, suvr) in curves.items()}
+
+
+def _normalize(subject, group, path):
+    from .normalize import REFERENCE, reference_mean
+    return {"mean_" + REFERENCE: reference_mean(path)}
+
+
+def _resample(subject, group, path):
+    from .extract import extract_subject
+    from .resample import fused_output, write_flirt_mat
+    scratch = _scratch()
+    mat = os.path.join(scratch, "identity.mat")
+    if not os.path.exists(mat):
+        write_flirt_mat(mat, np.eye(4))
+    out = os.path.join(scratch, "%s_MNI.nii" % subject)
+    fused_output(path, mat, out, ref_path=path, threshold=config.PET_THRESHOLD)
+    rows, _ = extract_subject(subject, out, group)
+    os.remove(out)
+    return {"suvr_" + r["reference"]: r["suvr"] for r in rows}
+
+
+def _pvc(subject, group, path):
+    from .pvc import TransferModel, pvc_subject
+    if "pvc" not in _STATE:
+        labels, affine, header = phantom.grid()
+        mask = os.path.join(_scratch(), "brain_mask.nii.gz")
+        nifti.save(mask, (labels > 0).astype(np.float32), affine, template=header)
+        _STATE["pvc"] = TransferModel(_STATE["fwhm"], mask, _scratch())
+    rows = pvc_subject(_STATE["pvc"], subject, path)
+    return {"suvr_" + r["reference"]: r["suvr"] for r in rows}
+
+
+def _scratch():
+    """Per-process scratch directory of the resample and pvc engines."""
+    if "scratch" not in _STATE:
+        _STATE["scratch"] = tempfile.mkdtemp(prefix="pet_benchmark_")
+    return _STATE["scratch"]
+
+
+def _fslstats(subject, group, path):
+    means = {}
+    threshold = [] if config.PET_THRESHOLD is None else ["-l", str(config.PET_THRESHOLD)]
+    for name in [config.TARGET_REGION] + config.REFERENCE_REGIONS:
+        voi = config.voi_path(name)
+        out = subprocess.run(["fslstats", path] + threshold + ["-k", voi, "-M"],
+                             stdout=subprocess.PIPE, text=True, check=True).stdout
+        means[name] = float(out.split()[0])
+    cortical = means[config.TARGET_REGION]
+    return {"suvr_" + ref: cortical / means[ref] for ref in config.REFERENCE_REGIONS}
+
+
+RUNNERS = {"extract": _extract, "sweep": _sweep, "normalize": _normalize,
+           "resample": _resample, "pvc": _pvc, "fslstats": _fslstats}
+_STATE = {}
+
+
+def _run_engine(engine, jobs, conn, fwhm=0.0):
+    """Child process: run one engine over jobs, send back (values, wall, peak MB)."""
+    runner = RUNNERS[engine]
+    _STATE["fwhm"] = fwhm
+    values = {}
+    start = time.perf_counter()
+    try:
+        for subject, group, path in jobs:
+            values[subject] = runner(subject, group, path)
+    finally:
+        if "scratch" in _STATE:
+            shutil.rmtree(_STATE["scratch"], ignore_errors=True)
+    wall = time.perf_counter() - start
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    conn.send((values, wall, _rss_mb(peak)))
+    conn.close()
+
+
+def run_engine(engine, jobs, fwhm=0.0):
+    """(values, wall, peak RSS MB) of an engine run in a fresh interpreter;
+    fwhm is the phantoms' PSF."""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    proc = context.Process(target=_run_engine, args=(engine, jobs, child, fwhm))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = None
+    proc.join()
+    if result is None:
+        raise RuntimeError("%s engine exited with status %s" % (engine, proc.exitcode))
+    return result
+
+
+def expected_values(spec):
+    truth = {"suvr_" + ref: v for ref, v in phantom.expected_suvrs(spec["suvr"]).items()}
+    for name, mean in phantom.region_means(spec["suvr"], ["CG"]).items():
+        truth["mean_" + name] = mean * phantom.REF_ACTIVITY * spec["scale"]
+    return truth
+
+
+def compare(specs, values):
+    """(max relative error on aligned subjects, max on misaligned, failures)."""
+    worst, bias, failures = 0.0, 0.0, []
+    for spec in specs:
+        truth = expected_values(spec)
+        aligned = not any(spec["shift_mm"]) and not spec["rotate_deg"]
+        for key, got in values.get(spec["subject"], {}).items():
+            if key not in truth:
+                continue
+            error = abs(got - truth[key]) / truth[key] if got is not None else float("inf")
+            if aligned:
+                worst = max(worst, error)
+                if error > TOLERANCE:
+                    failures.append("%s %s %.4f (expected %.4f)" % (
+                        spec["subject"], key, got if got is not None else float("nan"),
+                        truth[key]))
+            else:
+                bias = max(bias, error)
+    return worst, bias, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction benchmark on synthetic phantoms")
+    parser.add_argument("--ad", type=int, default=25)
+    parser.add_argument("--yc", type=int, default=25)
+    parser.add_argument("--noise", type=float, default=phantom.NOISE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corrupt", nargs="*", default=["AD02=50"], metavar="SUBJ=FACTOR")
+    parser.add_argument("--misalign", nargs="*", default=[], metavar="SUBJ=DX,DY,DZ[,DEG]")
+    parser.add_argument("--fwhm", type=float, default=0.0,
+                        help="blur the phantoms with this PSF (mm; the pvc engine's PSF)")
+    parser.add_argument("--engines", nargs="*", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--gzip", action="store_true", help="write .nii.gz phantoms")
+    parser.add_argument("--keep", help="write the phantoms here and keep them")
+    parser.add_argument("--out", default=os.path.join(config.RESULTS_DIR, "benchmark_extract.csv"))
+    args = parser.parse_args()
+
+    specs = phantom.cohort_specs(args.ad, args.yc, args.noise,
+                                 phantom.parse_overrides(args.corrupt, float),
+                                 phantom.parse_overrides(
+                                     args.misalign, lambda v: [float(x) for x in v.split(",")]),
+                                 args.seed, fwhm=args.fwhm)
+    data_dir = args.keep or tempfile.mkdtemp(prefix="pet_phantoms_")
+    try:
+        print("=== EXTRACTION BENCHMARK (%d phantoms, noise %g) ===" % (len(specs), args.noise))
+        start = time.perf_counter()
+        jobs = [(s["subject"], s["group"], phantom.write_phantom(s, data_dir, args.gzip))
+                for s in specs]
+        elapsed = time.perf_counter() - start
+        print("Phantoms written in %.1fs (%.1f/s) → %s" % (elapsed, len(jobs) / elapsed, data_dir))
+
+        rows, status = [], 0
+        print("%-10s %8s %9s %10s %9s %10s %9s" % (
+            "engine", "subjects", "wall s", "subj/s", "peak MB", "max err", "misalign"))
+        for engine in args.engines:
+            if engine == "fslstats" and shutil.which("fslstats") is None:
+                print("%-10s ⚠️  fslstats not on PATH, skipped" % engine)
+                continue
+            values, wall, peak = run_engine(engine, jobs, args.fwhm)
+            worst, bias, failures = compare(specs, values)
+            rows.append({"engine": engine, "subjects": len(jobs), "wall": "%.3f" % wall,
+                         "subjects_per_s": "%.2f" % (len(jobs) / wall),
+                         "peak_rss_mb": "%.0f" % peak, "max_error": "%.5f" % worst,
+                         "misaligned_bias": "%.5f" % bias, "failures": len(failures)})
+            print("%-10s %8d %9.2f %10.2f %9.0f %9.3f%% %8.2f%% %s" % (
+                engine, len(jobs), wall, len(jobs) / wall, peak, 100 * worst, 100 * bias,
+                "✓" if not failures else "✗"))
+            for failure in failures[:10]:
+                print("    ✗ %s" % failure)
+            if failures:
+                status = 1
+    finally:
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print("✓ Results: %s" % args.out)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Content hashing helpers for the on-disk caches under qc/.
+
+Cache entries are keyed by the SHA-1 of the inputs' bytes, so a cached tile
+or matrix is reused only while every input file is byte-identical.
+"""
+
+import hashlib
+import os
+
+CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """SHA-1 hex digest of a file's contents, read in 1 MB chunks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(*parts):
+    """Combine strings (digests, parameter tags) into a single cache key."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cache_path(cache_dir, key, suffix):
+    """Path for a cache entry, sharded by the first two hex digits."""
+    directory = os.path.join(cache_dir, key[:2])
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, key + suffix)
+
+
+def stat_key(path):
+    """Cheap signature (path, size, mtime) for caches rebuilt on any change."""
+    st = os.stat(path)
+    return "%s:%d:%d" % (os.path.abspath(path), st.st_size, st.st_mtime_ns)
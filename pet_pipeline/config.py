@@ -0,0 +1,85 @@
+"""
+Project layout and constants shared by the pet_pipeline modules.
+
+Paths mirror the conventions used by the shell scripts (data/, vois/,
+results/, qc/) and are resolved relative to the current working directory,
+so commands are run from the project root like the scripts are.
+"""
+
+import os
+
+DATA_DIR = "data"
+RESULTS_DIR = "results"
+QC_DIR = "qc"
+LOG_DIR = "logs"
+
+# VOIs live in vois/ on the processing machine; the bundled copies in
+# pipeline_package/vois/ are used when the working directory has none.
+VOI_DIRS = ["vois", os.path.join("pipeline_package", "vois")]
+
+MNI_TEMPLATE = "/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
+MNI_BRAIN_MASK = os.path.join(os.path.dirname(MNI_TEMPLATE), "MNI152_T1_2mm_brain_mask.nii.gz")
+
+# Geometry of the 2mm MNI152 grid (FSL's MNI152_T1_2mm and the GAAIN VOIs),
+# stored LAS as fslreorient2std produces
+MNI_2MM_SHAPE = (91, 109, 91)
+MNI_2MM_AFFINE = [[-2.0, 0.0, 0.0, 90.0],
+                  [0.0, 2.0, 0.0, -126.0],
+                  [0.0, 0.0, 2.0, -72.0],
+                  [0.0, 0.0, 0.0, 1.0]]
+STANDARD_ORIENTATION = ("L", "A", "S")
+
+# GAAIN VOIs (2mm MNI grid), keyed by the short names used in the results
+# tables (CG = Cerebellar Gray, WC = Whole Cerebellum, WCBS = WC + brainstem)
+VOI_FILES = {
+    "ctx": "voi_ctx_2mm.nii",
+    "CG": "voi_CerebGry_2mm.nii",
+    "WC": "voi_WhlCbl_2mm.nii",
+    "WCBS": "voi_WhlCblBrnStm_2mm.nii",
+    "Pons": "voi_Pons_2mm.nii",
+}
+
+TARGET_REGION = "ctx"
+REFERENCE_REGIONS = ["CG", "WC", "Pons"]
+
+# File naming: data/<SUBJ>/pet/<SUBJ>_PiB_5070[_<variant>].nii[.gz] and
+# data/<SUBJ>/anat/<SUBJ>_MR[_<variant>].nii[.gz]
+PET_BASE = "PiB_5070"
+T1_BASE = "MR"
+
+# Static summation windows (minutes post-injection) for dynamic PET, by
+# tracer; PiB 50-70 gives the <SUBJ>_PiB_5070 images above
+TRACER_WINDOWS = {
+    "PiB": (50.0, 70.0),
+    "NAV4694": (50.0, 70.0),
+    "FBP": (50.0, 60.0),    # florbetapir
+    "FBB": (90.0, 110.0),   # florbetaben
+    "FMM": (90.0, 110.0),   # flutemetamol
+}
+
+# MNI-space PET variants, in the order the scripts probe them
+PET_VARIANTS = ["MNI", "MNI_thr", "T1", "MNI_norm"]
+
+# Intensity threshold applied at extraction time (was fslmaths -thr 0.001
+# writing _MNI_thr copies); None disables it
+PET_THRESHOLD = 0.001
+
+# Cerebellar gray mean above which pet_pipeline.normalize records a scale
+# factor (normalize_pet.sh, run_complete_pipeline.sh)
+NORMALIZE_ABOVE = 10.0
+
+# Subject ID schemes: regex -> group, and regex -> alias template. The SPM
+# team numbers the AD cohort sub-01..sub-25 (sub-01 = AD01).
+ID_GROUPS = [(r"^AD\d+$", "AD"), (r"^YC\d+$", "YC")]
+ID_ALIASES = [(r"^AD(\d+)$", "sub-{:02d}")]
+
+
+def voi_path(name):
+    """Return the path of a GAAIN VOI by short name, or None if not found."""
+    filename = VOI_FILES[name]
+    for voi_dir in VOI_DIRS:
+        for candidate in (filename, filename + ".gz"):
+            path = os.path.join(voi_dir, candidate)
+            if os.path.exists(path):
+                return path
+    return None
@@ -0,0 +1,159 @@
+"""
+Cohort QC contact sheet.
+
+Renders one downsampled tri-planar thumbnail per subject (PET in 'hot' with
+cortex/cerebellum VOI outlines) and lays them out in a paged HTML sheet,
+annotated with SUVR and QC status from the latest results summary.
+
+Thumbnails are cached in qc/thumbnails/ keyed by the PET and VOI file
+hashes plus the render settings, so re-running after adding subjects only
+renders the new tiles.
+
+Usage:
+    python -m pet_pipeline.contact_sheet [--out qc/contact_sheet.html]
+"""
+
+import argparse
+import html
+import os
+import time
+
+import numpy as np
+
+from . import cache, config, nifti, render, results, trace
+from .manifest import Manifest
+
+RENDER_VERSION = "triplanar-v1"
+OVERLAY_VOIS = ["ctx", "CG"]
+
+
+def list_subjects(data_dir=config.DATA_DIR):
+    """(subject, PET path, SHA-1) for subjects with an MNI-space PET."""
+    manifest = Manifest.load_or_build(data_dir)
+    subjects = []
+    for name in sorted(manifest.subjects):
+        pet = manifest.pet(name)
+        if pet:
+            digest = next(f["sha1"] for f in manifest.files(name, "pet") if f["path"] == pet)
+            subjects.append((name, pet, digest))
+    return subjects
+
+
+def load_masks(names, factor):
+    """Downsampled boolean VOI masks and their file digests."""
+    masks, digests = {}, []
+    for name in names:
+        path = config.voi_path(name)
+        if path is None:
+            continue
+        volume = nifti.load(path).get_fdata() > 0
+        masks[name] = render.downsample(volume.astype(np.float32), factor) > 0.5
+        digests.append(cache.file_digest(path))
+    return masks, digests
+
+
+def render_thumbnail(pet_path, masks, factor):
+    """Tri-planar RGB thumbnail of one PET volume."""
+    volume = render.downsample(nifti.load(pet_path, orient=config.STANDARD_ORIENTATION).get_fdata(), factor)
+    # VOIs are on the 2mm MNI grid; skip the overlay for images that are not
+    overlays = {k: m for k, m in masks.items() if m.shape == volume.shape}
+    return render.triplanar(volume, overlays)
+
+
+def status_class(status, suvr):
+    if suvr is None:
+        return "missing"
+    if status.startswith(("OK", "PASS")) or status == "":
+        return "pass"
+    return "check"
+
+
+def build_sheet(subjects, out_path, factor=2, per_page=24, summary_path=None,
+                cache_dir=None):
+    """Render (or reuse) thumbnails and write the HTML contact sheet.
+
+    Returns (rendered, reused) thumbnail counts.
+    """
+    cache_dir = cache_dir or os.path.join(config.QC_DIR, "thumbnails")
+    masks, mask_digests = load_masks(OVERLAY_VOIS, factor)
+    params = (RENDER_VERSION, factor, ",".join(sorted(masks)), *mask_digests)
+    summary = results.load_summary(summary_path) if summary_path else {}
+
+    tiles, rendered, reused = [], 0, 0
+    for subject, pet_path, digest in subjects:
+        with trace.step("thumbnail", subject) as info:
+            key = cache.cache_key(digest or cache.file_digest(pet_path), *params)
+            thumb = cache.cache_path(cache_dir, key, ".png")
+            if os.path.exists(thumb):
+                info["cache"] = "hit"
+                reused += 1
+            else:
+                info["cache"] = "miss"
+                render.write_png(thumb, render_thumbnail(pet_path, masks, factor))
+                rendered += 1
+        suvr, status = results.subject_status(summary.get(subject, {}))
+        tiles.append((subject, pet_path, thumb, suvr, status))
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write(_html(tiles, out_dir, per_page, summary_path))
+    return rendered, reused
+
+
+def _html(tiles, out_dir, per_page, summary_path):
+    pages = [tiles[i:i + per_page] for i in range(0, len(tiles), per_page)] or [[]]
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        "<title>PET QC contact sheet</title><style>",
+        "body{font-family:sans-serif;background:#111;color:#eee;margin:1em}",
+        ".page{display:grid;grid-template-columns:repeat(auto-fill,minmax(300px,1fr));"
+        "gap:8px;margin-bottom:2em}",
+        ".tile{background:#000;border:3px solid #555;padding:4px;font-size:12px}",
+        ".tile img{width:100%;image-rendering:pixelated}",
+        ".pass{border-color:#2a2}.check{border-color:#d22}.missing{border-color:#777}",
+        "@media print{body{background:#fff;color:#000}.page{page-break-after:always}}",
+        "</style></head><body>",
+        "<h2>PET QC contact sheet</h2>",
+        "<p>%d subjects &middot; results: %s &middot; generated %s</p>" % (
+            len(tiles), html.escape(summary_path or "none"), time.strftime("%Y-%m-%d %H:%M")),
+        "<p>Red outline: cortex VOI &middot; green outline: cerebellar gray VOI</p>",
+    ]
+    for number, page in enumerate(pages, 1):
+        parts.append("<h3>Page %d/%d</h3><div class='page'>" % (number, len(pages)))
+        for subject, pet_path, thumb, suvr, status in page:
+            suvr_text = "SUVR %.3f" % suvr if suvr is not None else "no SUVR"
+            parts.append(
+                "<div class='tile %s'><img src='%s' alt='%s'><br><b>%s</b> %s %s"
+                "<br><small>%s</small></div>" % (
+                    status_class(status, suvr),
+                    html.escape(os.path.relpath(thumb, out_dir)),
+                    html.escape(subject), html.escape(subject), suvr_text,
+                    html.escape(status), html.escape(pet_path)))
+        parts.append("</div>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort QC contact sheet")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--out", default=os.path.join(config.QC_DIR, "contact_sheet.html"))
+    parser.add_argument("--summary", help="results CSV (default: latest summary_*.csv)")
+    parser.add_argument("--downsample", type=int, default=2,
+                        help="integer voxel downsampling factor for thumbnails")
+    parser.add_argument("--per-page", type=int, default=24)
+    args = parser.parse_args()
+
+    summary = args.summary or results.latest_summary()
+    subjects = list_subjects(args.data)
+    print("=== QC CONTACT SHEET ===")
+    print("Subjects with MNI-space PET: %d" % len(subjects))
+    rendered, reused = build_sheet(subjects, args.out, args.downsample,
+                                   args.per_page, summary)
+    print("Thumbnails rendered: %d, reused from cache: %d" % (rendered, reused))
+    print("✓ Contact sheet: %s" % args.out)
+
+
+if __name__ == "__main__":
+    main()
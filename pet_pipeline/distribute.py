@@ -0,0 +1,312 @@
+"""
+Multi-host work distribution over a shared project directory.
+
+Any number of worker processes, on any hosts that mount the project,
+claim subjects from a queue directory (work/<queue>/) with lock files:
+
+  <SUBJ>.lock    created with O_CREAT | O_EXCL (atomic, also over NFS v3+),
+                 holding the lease's token; the owner renews the lease by
+                 touching it every HEARTBEAT seconds
+  <SUBJ>.done    written (atomically, by rename) when the stage succeeded
+  <SUBJ>.failed  written when it failed or the subject is quarantined
+
+A lock not touched for LEASE seconds belongs to a dead worker. To take it
+over, a worker renames it aside to a name of its own: rename is atomic, so
+exactly one worker moves a given lock file. The mover checks that the file
+it moved still holds the stale token (every lease has its own) and is
+still stale, deletes it and then competes for a new lock with O_EXCL like
+any other worker; if the file turns out to be a live lock taken or renewed
+since it looked, it links it back. A worker that dies half-way leaves at
+most a <SUBJ>.lock.stale.* file, never a lock nobody can take over.
+Workers start at different offsets of the subject list so they rarely
+contend for the same lock, and keep polling until every subject has a
+marker, which also picks up subjects left by dead workers.
+
+The stage itself runs through pet_pipeline.journal (retries, backoff,
+quarantine, input and output hashes, with the subject's PET and the VOIs
+as inputs) and its results go to the shared results store. ``reset``
+also journals a reset of the stage, so cleared subjects are really run
+again rather than replayed from the journal. Lease ages are compared with
+the local clock, so hosts' clocks must agree to well within LEASE.
+
+Usage:
+    python -m pet_pipeline.distribute worker extract [--subjects AD01 ...] \\
+        -- python -m pet_pipeline.extract {subject} {pet} --group {group}
+    python -m pet_pipeline.distribute status extract
+    python -m pet_pipeline.distribute reset extract [--failed-only]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from . import config
+from .journal import QUARANTINED, run_stage
+from .manifest import Manifest
+from .store import DB_PATH, ResultsStore
+
+WORK_DIR = "work"
+LEASE = 300.0       # seconds without a heartbeat before a lock is reclaimed
+HEARTBEAT = 30.0
+
+
+class Lease:
+    """Lock-file lease on one subject of a queue."""
+
+    def __init__(self, queue_dir, subject, token):
+        self.path = os.path.join(queue_dir, subject + ".lock")
+        # unique per lease, so a stale lock's content names one generation
+        self.token = "%s/%s" % (token, uuid.uuid4().hex[:8])
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(self.token)
+        return True
+
+    def owner(self):
+        try:
+            with open(self.path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _age(self):
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return None
+
+    def acquire(self, lease=LEASE):
+        """Claim the subject; steals the lock when its lease has expired."""
+        if self._create():
+            return True
+        age, stale = self._age(), self.owner()
+        if age is None or stale is None:
+            return self._create()
+        if age < lease:
+            return False
+        aside = "%s.stale.%s" % (self.path, uuid.uuid4().hex[:8])
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return False        # another worker moved it first
+        try:
+            with open(aside) as f:
+                moved = f.read()
+            if moved != stale or time.time() - os.path.getmtime(aside) < lease:
+                # released and retaken, or renewed, since we looked: put it back
+                try:
+                    os.link(aside, self.path)
+                except FileExistsError:
+                    pass        # its owner sees the new token and drops the lease
+                return False
+        finally:
+            os.remove(aside)
+        if not self._create():
+            return False
+        print("↻ reclaiming %s (no heartbeat for %.0fs)" % (os.path.basename(self.path), age),
+              file=sys.stderr)
+        return True
+
+    def _beat(self, interval):
+        while not self._stop.wait(interval):
+            owned = self.owner() == self.token
+            if owned:
+                try:
+                    os.utime(self.path)
+                except FileNotFoundError:   # moved aside by a worker taking it over
+                    owned = False
+            if not owned:
+                self.lost = True
+                print("⚠️  lost lease %s" % self.path, file=sys.stderr)
+                return
+
+    def start_heartbeat(self, interval=HEARTBEAT):
+        self._thread = threading.Thread(target=self._beat, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.owner() == self.token:
+            os.remove(self.path)
+
+
+def write_marker(queue_dir, subject, kind, **info):
+    """Atomically write <SUBJ>.done / <SUBJ>.failed."""
+    path = os.path.join(queue_dir, "%s.%s" % (subject, kind))
+    tmp = "%s.%s.tmp" % (path, uuid.uuid4().hex[:8])
+    with open(tmp, "w") as f:
+        json.dump(dict(info, created=time.time()), f)
+    os.replace(tmp, path)
+
+
+def finished(queue_dir, subject):
+    return any(os.path.exists(os.path.join(queue_dir, "%s.%s" % (subject, kind)))
+               for kind in ("done", "failed"))
+
+
+def queue_state(queue_dir, subjects, lease=LEASE):
+    """{subject: done | failed | running | stale | pending}."""
+    state = {}
+    now = time.time()
+    for subject in subjects:
+        base = os.path.join(queue_dir, subject)
+        if os.path.exists(base + ".done"):
+            state[subject] = "done"
+        elif os.path.exists(base + ".failed"):
+            state[subject] = "failed"
+        elif os.path.exists(base + ".lock"):
+            try:
+                fresh = now - os.path.getmtime(base + ".lock") < lease
+            except FileNotFoundError:
+                fresh = False
+            state[subject] = "running" if fresh else "stale"
+        else:
+            state[subject] = "pending"
+    return state
+
+
+def stage_inputs(fields):
+    """Files a queued stage reads: the subject's PET and the VOIs."""
+    vois = [config.voi_path(name) for name in config.VOI_FILES]
+    return [fields["pet"]] + [p for p in vois if p]
+
+
+def worker(queue, jobs, command, work_dir=WORK_DIR, db=DB_PATH, lease=LEASE,
+           heartbeat=HEARTBEAT, retries=None):
+    """Claim and run jobs [(subject, fields)] until every one has a marker."""
+    queue_dir = os.path.join(work_dir, queue)
+    os.makedirs(queue_dir, exist_ok=True)
+    token = "%s:%d:%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+    if not jobs:
+        return 0, 0
+    # each worker walks the list from its own offset
+    offset = zlib.crc32(token.encode()) % len(jobs)
+    order = jobs[offset:] + jobs[:offset]
+    done = failed = 0
+    extra = {} if retries is None else {"retries": retries}
+    with ResultsStore(db) as store:
+        while True:
+            pending = [(s, f) for s, f in order if not finished(queue_dir, s)]
+            if not pending:
+                return done, failed
+            claimed = False
+            for subject, fields in pending:
+                lock = Lease(queue_dir, subject, token)
+                if finished(queue_dir, subject) or not lock.acquire(lease):
+                    continue
+                claimed = True
+                lock.start_heartbeat(heartbeat)
+                start = time.time()
+                try:
+                    if finished(queue_dir, subject):     # completed while we claimed it
+                        continue
+                    status = run_stage(store, subject, queue,
+                                       [part.format(**fields) for part in command],
+                                       inputs=stage_inputs(fields), run_id=token, **extra)
+                    if lock.lost:
+                        continue
+                    kind = "done" if status == 0 else "failed"
+                    write_marker(queue_dir, subject, kind, owner=token, status=status,
+                                 quarantined=status == QUARANTINED,
+                                 elapsed=time.time() - start)
+                    if status == 0:
+                        done += 1
+                    else:
+                        failed += 1
+                finally:
+                    lock.release()
+            if not claimed:
+                time.sleep(min(heartbeat, lease / 4))
+
+
+def cohort_jobs(manifest, subjects=None):
+    """(subject, placeholder fields) for subjects with an MNI-space PET."""
+    jobs = []
+    for subject in subjects or sorted(manifest.list(has=["pet:MNI"])):
+        subject = manifest.canonical(subject) or subject
+        pet = manifest.pet(subject, ["MNI"])
+        if pet:
+            jobs.append((subject, {"subject": subject, "pet": pet,
+                                   "group": manifest.subjects[subject]["group"]}))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute subjects across workers and hosts")
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--lease", type=float, default=LEASE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("worker", help="claim and run subjects (command after --, with "
+                                      "{subject} {pet} {group} placeholders)")
+    p.add_argument("queue")
+    p.add_argument("--subjects", nargs="*")
+    p.add_argument("--heartbeat", type=float, default=HEARTBEAT)
+    p.add_argument("--retries", type=int)
+    p.add_argument("--db", default=DB_PATH)
+    p = sub.add_parser("status", help="progress of a queue")
+    p.add_argument("queue")
+    p = sub.add_parser("reset", help="clear markers so subjects are run again")
+    p.add_argument("queue")
+    p.add_argument("--failed-only", action="store_true")
+    p.add_argument("--db", default=DB_PATH)
+    argv, command = sys.argv[1:], []
+    if "--" in argv:
+        argv, command = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+
+    manifest = Manifest.load_or_build(args.data, hash_files=False)
+    queue_dir = os.path.join(args.work_dir, args.queue)
+    if args.command == "worker":
+        if not command:
+            parser.error("worker needs a command after --")
+        jobs = cohort_jobs(manifest, args.subjects)
+        print("=== WORKER %s:%d on %s (%d subjects) ===" % (
+            socket.gethostname(), os.getpid(), args.queue, len(jobs)))
+        done, failed = worker(args.queue, jobs, command, args.work_dir, args.db, args.lease,
+                              args.heartbeat, args.retries)
+        print("✓ %s:%d finished: %d done, %d failed here" % (
+            socket.gethostname(), os.getpid(), done, failed))
+    elif args.command == "status":
+        state = queue_state(queue_dir, [s for s, _ in cohort_jobs(manifest)], args.lease)
+        counts = {}
+        for subject, s in sorted(state.items()):
+            counts[s] = counts.get(s, 0) + 1
+            if s in ("failed", "stale"):
+                print("%-8s %s" % (subject, s))
+        print("=== %s: %s ===" % (args.queue, ", ".join(
+            "%d %s" % (n, s) for s, n in sorted(counts.items()))))
+    else:
+        kinds = ("failed",) if args.failed_only else ("done", "failed")
+        cleared = set()
+        for name in os.listdir(queue_dir) if os.path.isdir(queue_dir) else []:
+            subject, _, kind = name.rpartition(".")
+            if kind in kinds:
+                os.remove(os.path.join(queue_dir, name))
+                cleared.add(subject)
+        # without a journal reset the workers would replay the old "done" record
+        with ResultsStore(args.db) as store:
+            for subject in sorted(cleared):
+                store.append_journal(subject, args.queue, "reset")
+        print("✓ %s: %d subjects cleared" % (args.queue, len(cleared)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
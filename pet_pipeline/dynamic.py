@@ -0,0 +1,218 @@
+"""
+Dynamic (4D) PET: stream frames and sum them into a static window.
+
+The scripts expect a pre-summed static image (<SUBJ>_PiB_5070 is PiB
+summed over 50-70 min). Here the frames of a 4D series are read one at a
+time (nifti.iter_frames: one reused buffer, frames outside the window are
+skipped without being decoded into arrays) and averaged with duration
+weights into a float64 accumulator:
+
+  static = sum_i overlap_i * frame_i / sum_i overlap_i
+
+where overlap_i is the time frame i spends inside the window, so frames
+straddling a window edge count for the part inside it. Memory stays at one
+frame plus the accumulator whatever the length of the series. The window
+comes from config.TRACER_WINDOWS (--tracer) or --window; a window the
+frames cover less than MIN_COVERAGE of is an error.
+
+Frame timing is read from the BIDS sidecar next to the image
+(<base>.json: FrameTimesStart and FrameDuration, seconds), or given as
+consecutive frame durations in seconds with --durations.
+
+With --motion each window frame after the first is registered rigidly
+(pet_pipeline.align.register, 6 DOF, 8 and 4 mm levels) to the running
+weighted mean and resampled onto it before being added.
+
+Usage:
+    python -m pet_pipeline.dynamic SUBJECT DYNAMIC.nii.gz [--tracer PiB] [--motion]
+    python -m pet_pipeline.dynamic SUBJECT DYNAMIC.nii --window 50 70 --durations 300 300 ...
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from scipy import ndimage
+
+from . import config, nifti, trace
+from .align import register
+
+MIN_COVERAGE = 0.95     # fraction of the window the frames must cover
+MOTION_LEVELS = (8.0, 4.0)
+
+
+# ----------------------------------------------------------------------
+# Frame timing
+# ----------------------------------------------------------------------
+
+def sidecar_path(path):
+    """BIDS sidecar of an image: the same name with .json."""
+    base = path[:-len(".gz")] if path.endswith(".gz") else path
+    return (base[:-len(".nii")] if base.endswith(".nii") else base) + ".json"
+
+
+def frame_timing(path, durations=None):
+    """(starts, durations) of the frames in seconds, from durations or the sidecar."""
+    if durations is not None:
+        durations = np.asarray(durations, dtype=np.float64)
+        starts = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+        return starts, durations
+    sidecar = sidecar_path(path)
+    if not os.path.exists(sidecar):
+        raise FileNotFoundError("%s: no frame timing (no %s, and no --durations)" % (
+            path, sidecar))
+    with open(sidecar) as f:
+        meta = json.load(f)
+    if "FrameDuration" not in meta:
+        raise ValueError("%s: no FrameDuration" % sidecar)
+    durations = np.asarray(meta["FrameDuration"], dtype=np.float64)
+    if "FrameTimesStart" in meta:
+        starts = np.asarray(meta["FrameTimesStart"], dtype=np.float64)
+    else:
+        starts = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+    if len(starts) != len(durations):
+        raise ValueError("%s: %d frame starts but %d durations" % (
+            sidecar, len(starts), len(durations)))
+    return starts, durations
+
+
+def window_weights(starts, durations, window):
+    """Seconds each frame spends inside window (minutes, post-injection)."""
+    lo, hi = window[0] * 60.0, window[1] * 60.0
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = starts + np.asarray(durations, dtype=np.float64)
+    return np.maximum(np.minimum(ends, hi) - np.maximum(starts, lo), 0.0)
+
+
+def tracer_window(tracer, window=None):
+    if window is not None:
+        return tuple(float(w) for w in window)
+    if tracer not in config.TRACER_WINDOWS:
+        raise ValueError("no window for tracer %s (known: %s); pass --window" % (
+            tracer, ", ".join(sorted(config.TRACER_WINDOWS))))
+    return config.TRACER_WINDOWS[tracer]
+
+
+def window_name(tracer, window):
+    """File tag of a summed image, e.g. PiB_5070."""
+    return "%s_%s" % (tracer, "".join("%g" % w for w in window))
+
+
+# ----------------------------------------------------------------------
+# Summation
+# ----------------------------------------------------------------------
+
+class _Volume:
+    """Array with the attributes align.register reads."""
+
+    def __init__(self, data, affine, zooms):
+        self.data, self.affine, self.zooms = data, affine, zooms
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def get_fdata(self):
+        return self.data
+
+
+def sum_frames(path, starts, durations, window, motion=False, orient=None):
+    """Duration-weighted mean of the frames over window; returns (float32 image,
+    info, affine of the image).
+
+    info has the frames used, the window coverage, and with motion the
+    largest displacement (mm, at 50 mm from the centre) of each frame.
+    """
+    header = nifti.read_header(path)
+    count = header.shape[3] if header.ndim > 3 else 1
+    if count != len(durations):
+        raise ValueError("%s: %d frames but timing for %d" % (path, count, len(durations)))
+    weights = window_weights(starts, durations, window)
+    coverage = weights.sum() / ((window[1] - window[0]) * 60.0)
+    if coverage < MIN_COVERAGE:
+        raise ValueError("%s: frames cover %.0f%% of %g-%g min" % (
+            path, 100 * coverage, window[0], window[1]))
+    used = [int(i) for i in np.flatnonzero(weights)]
+    affine = nifti.reoriented_affine(header, orient) if orient else header.affine
+    zooms = header.zooms[:3]
+    if orient:
+        axes, _, _ = nifti.reorient_transform(header.affine, header.shape[:3], orient)
+        zooms = tuple(zooms[a] for a in axes)
+
+    total, weight, moved = None, 0.0, {}
+    for index, frame in nifti.iter_frames(path, frames=set(used), orient=orient):
+        frame = np.nan_to_num(frame, copy=False)
+        if total is None:
+            total = np.zeros(frame.shape, dtype=np.float64)
+        elif motion:
+            reference = _Volume((total / weight).astype(np.float32), affine, zooms)
+            transform, _ = register(reference, _Volume(frame, affine, zooms), init=np.eye(4),
+                                    levels=MOTION_LEVELS, dof=6)
+            matrix = np.linalg.inv(affine) @ transform @ affine
+            frame = ndimage.affine_transform(frame, matrix[:3, :3], matrix[:3, 3], order=1,
+                                             mode="nearest")
+            moved[index] = _displacement(transform)
+        total += weights[index] * frame
+        weight += weights[index]
+    info = {"frames": used, "coverage": float(coverage), "motion_mm": moved}
+    return (total / weight).astype(np.float32), info, affine
+
+
+def _displacement(transform, radius=50.0):
+    """Largest movement (mm) of a point radius mm from the transform's origin."""
+    linear = transform[:3, :3] - np.eye(3)
+    return float(np.linalg.norm(transform[:3, 3]) + radius * np.linalg.norm(linear, 2))
+
+
+def sum_subject(subject, path, tracer=config.PET_BASE.split("_")[0], window=None,
+                durations=None, motion=False, out=None, data_dir=config.DATA_DIR):
+    """Write the subject's static window image; returns (out path, info)."""
+    window = tracer_window(tracer, window)
+    starts, durations = frame_timing(path, durations)
+    with trace.step("frames", subject):
+        image, info, affine = sum_frames(path, starts, durations, window, motion,
+                                         orient=config.STANDARD_ORIENTATION)
+    if out is None:
+        out = os.path.join(data_dir, subject, "pet",
+                           "%s_%s.nii.gz" % (subject, window_name(tracer, window)))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    nifti.save(out, image, affine, template=nifti.read_header(path))
+    return out, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sum dynamic PET frames into a static window")
+    parser.add_argument("subject")
+    parser.add_argument("dynamic", help="4D PET (.nii or .nii.gz)")
+    parser.add_argument("--tracer", default=config.PET_BASE.split("_")[0],
+                        help="tracer whose window to use (%s)" % ", ".join(config.TRACER_WINDOWS))
+    parser.add_argument("--window", type=float, nargs=2, metavar=("START", "END"),
+                        help="window in minutes post-injection (overrides --tracer's)")
+    parser.add_argument("--durations", type=float, nargs="+",
+                        help="frame durations in seconds (default: BIDS sidecar)")
+    parser.add_argument("--motion", action="store_true",
+                        help="rigid frame-to-frame motion correction")
+    parser.add_argument("--out", help="default: data/<SUBJ>/pet/<SUBJ>_<tracer>_<window>.nii.gz")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    args = parser.parse_args()
+
+    try:
+        window = tracer_window(args.tracer, args.window)
+        out, info = sum_subject(args.subject, args.dynamic, args.tracer, window, args.durations,
+                                args.motion, args.out, args.data)
+    except (OSError, ValueError) as exc:
+        print("%-8s ⚠️  %s" % (args.subject, exc))
+        return 1
+    print("=== DYNAMIC SUMMATION (%s %g-%g min) ===" % (args.tracer, window[0], window[1]))
+    print("✓ %-8s frames %s (coverage %.0f%%) → %s" % (
+        args.subject, ",".join(str(i) for i in info["frames"]), 100 * info["coverage"], out))
+    if info["motion_mm"]:
+        worst = max(info["motion_mm"], key=info["motion_mm"].get)
+        print("  motion: largest %.2f mm (frame %d)" % (info["motion_mm"][worst], worst))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Single-pass regional SUVR and QC statistics.
+
+One read of the PET volume produces, for the whole volume and every GAAIN
+VOI: min, max, mean, SD, skewness, kurtosis, non-zero and NaN counts, plus
+the non-zero mean that ``fslstats -k mask -M`` reports. SUVRs for each
+reference region come from the same pass.
+
+Moments are accumulated slab by slab and merged with the pairwise update of
+Chan et al. / Pebay (numerically stable, no sum-of-squares cancellation).
+
+With --harmonize FWHM (or $PIPELINE_HARMONIZE_FWHM) the loaded volume is
+first smoothed to that common resolution (see pet_pipeline.harmonize), in
+memory, from the subject's native resolution in data/scanners.json. A
+subject with no entry there is an error (exit status 1, nothing stored),
+so unsmoothed SUVRs do not end up next to harmonized ones, unless
+--allow-unharmonized is given.
+
+Usage (prints REF:cortical:ref:suvr:status lines for the shell scripts):
+    python -m pet_pipeline.extract AD01 data/AD01/pet/AD01_PiB_5070_MNI.nii.gz --group AD
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from . import config, harmonize, nifti, trace
+from .manifest import subject_group
+from .store import DB_PATH, ResultsStore
+
+WHOLE = "whole"
+SLAB = 16
+
+
+class RegionMoments:
+    """Streaming min/max/mean/M2/M3/M4 accumulator for one region."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.nonzero = 0
+        self.nonzero_sum = 0.0
+        self.nan_count = 0
+
+    def update(self, values):
+        """Fold a batch of voxel values (any shape) into the accumulator."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        self.nan_count += int(values.size - finite.sum())
+        values = values[finite]
+        nb = values.size
+        if nb == 0:
+            return
+        nz = values != 0
+        self.nonzero += int(nz.sum())
+        self.nonzero_sum += float(values[nz].sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        mean_b = float(values.mean())
+        d = values - mean_b
+        d2 = d * d
+        m2_b = float(d2.sum())
+        m3_b = float((d2 * d).sum())
+        m4_b = float((d2 * d2).sum())
+        self.merge(nb, mean_b, m2_b, m3_b, m4_b)
+
+    def merge(self, nb, mean_b, m2_b, m3_b, m4_b):
+        na = self.n
+        if na == 0:
+            self.n, self.mean, self.m2, self.m3, self.m4 = nb, mean_b, m2_b, m3_b, m4_b
+            return
+        n = na + nb
+        delta = mean_b - self.mean
+        d_n = delta / n
+        m2 = self.m2 + m2_b + delta * d_n * na * nb
+        m3 = (self.m3 + m3_b + delta * d_n * d_n * na * nb * (na - nb)
+              + 3.0 * d_n * (na * m2_b - nb * self.m2))
+        m4 = (self.m4 + m4_b + delta * d_n * d_n * d_n * na * nb * (na * na - na * nb + nb * nb)
+              + 6.0 * d_n * d_n * (na * na * m2_b + nb * nb * self.m2)
+              + 4.0 * d_n * (na * m3_b - nb * self.m3))
+        self.n, self.mean = n, self.mean + d_n * nb
+        self.m2, self.m3, self.m4 = m2, m3, m4
+
+    def result(self):
+        n = self.n
+        var = self.m2 / (n - 1) if n > 1 else 0.0
+        skew = (np.sqrt(n) * self.m3 / self.m2 ** 1.5) if self.m2 > 0 else 0.0
+        kurt = (n * self.m4 / (self.m2 * self.m2) - 3.0) if self.m2 > 0 else 0.0
+        return {
+            "n_voxels": n,
+            "nonzero": self.nonzero,
+            "nan_count": self.nan_count,
+            "min": self.min if n else None,
+            "max": self.max if n else None,
+            "mean": self.mean if n else None,
+            "sd": float(np.sqrt(var)) if n else None,
+            "skewness": float(skew),
+            "kurtosis": float(kurt),
+            "mean_nonzero": self.nonzero_sum / self.nonzero if self.nonzero else None,
+        }
+
+
+class SortedValues:
+    """Sorted finite voxel values of one region with prefix sums.
+
+    Answers ``fslmaths -thr t`` + ``fslstats -M`` (mean of the non-zero
+    voxels >= t) for any t by binary search instead of a rescan.
+    """
+
+    def __init__(self, chunks):
+        values = np.concatenate(chunks) if chunks else np.empty(0, np.float32)
+        self.values = np.sort(values[np.isfinite(values)])
+        self.cumsum = np.concatenate([[0.0], np.cumsum(self.values, dtype=np.float64)])
+        lo, hi = np.searchsorted(self.values, 0.0, "left"), np.searchsorted(self.values, 0.0, "right")
+        self.zero_count = int(hi - lo)
+
+    def count_sum_above(self, thresholds):
+        """(count, sum) of the non-zero values >= each threshold."""
+        t = np.asarray(thresholds, dtype=np.float64)
+        i = np.searchsorted(self.values, t, "left")
+        count = self.values.size - i - np.where(t <= 0, self.zero_count, 0)
+        return count, self.cumsum[-1] - self.cumsum[i]
+
+    def mean_above(self, thresholds):
+        count, total = self.count_sum_above(thresholds)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+_MASKS = {}
+
+
+def load_vois(names=None):
+    """Boolean VOI masks keyed by short name (loaded once per process)."""
+    names = names or list(config.VOI_FILES)
+    masks = {}
+    for name in names:
+        path = config.voi_path(name)
+        if path is None:
+            continue
+        if path not in _MASKS:
+            _MASKS[path] = np.asarray(nifti.load(path).get_fdata() > 0)
+        masks[name] = _MASKS[path]
+    return masks
+
+
+def regional_stats(volume, masks, slab=SLAB, threshold=None, keep_values=False):
+    """QC moments for the whole volume and each mask in one pass over z-slabs.
+
+    threshold reproduces ``fslmaths -thr``: voxels below it are zeroed in
+    the slab before accumulation (so they drop out of the non-zero mean),
+    giving the statistics of a thresholded image without writing one.
+
+    With keep_values=True the unthresholded voxel values of each mask are
+    also collected in the same pass and (stats, {region: SortedValues}) is
+    returned, for threshold sweeps (see pet_pipeline.sweep).
+    """
+    accumulators = {WHOLE: RegionMoments()}
+    accumulators.update((name, RegionMoments()) for name in masks)
+    chunks = {name: [] for name in masks} if keep_values else None
+    for z in range(0, volume.shape[2], slab):
+        block = np.asarray(volume[:, :, z:z + slab], dtype=np.float32)
+        if keep_values:
+            for name, mask in masks.items():
+                chunks[name].append(block[mask[:, :, z:z + slab]])
+        if threshold is not None:
+            block = np.where(block < threshold, np.float32(0), block)
+        accumulators[WHOLE].update(block)
+        for name, mask in masks.items():
+            accumulators[name].update(block[mask[:, :, z:z + slab]])
+    stats = {name: acc.result() for name, acc in accumulators.items()}
+    if keep_values:
+        return stats, {name: SortedValues(c) for name, c in chunks.items()}
+    return stats
+
+
+SCALED_FIELDS = ("min", "max", "mean", "sd", "mean_nonzero")
+
+
+def scale_stats(stats, factor):
+    """Apply a lazy intensity scale factor to regional statistics.
+
+    Scaling is done on the summary numbers, never on voxels: counts,
+    skewness and kurtosis are scale-invariant and SUVRs are ratios of means.
+    """
+    if factor == 1.0:
+        return stats
+    return {region: {k: (v * factor if k in SCALED_FIELDS and v is not None else v)
+                     for k, v in s.items()}
+            for region, s in stats.items()}
+
+
+def qc_status(group, suvr):
+    """Group plausibility flag, as in run_complete_pipeline.sh."""
+    if group == "AD" and suvr < 1.2:
+        return "CHECK_AD_LOW"
+    if group == "YC" and suvr > 1.4:
+        return "CHECK_YC_HIGH"
+    return "PASS"
+
+
+def suvr_rows(stats, group, target=config.TARGET_REGION,
+              references=config.REFERENCE_REGIONS):
+    """SUVR for each reference region from fslstats-style non-zero means."""
+    rows = []
+    cortical = stats.get(target, {}).get("mean_nonzero")
+    if cortical is None:
+        return rows
+    for ref in references:
+        ref_mean = stats.get(ref, {}).get("mean_nonzero")
+        if not ref_mean or ref_mean <= 0:
+            continue
+        suvr = cortical / ref_mean
+        rows.append({"reference": ref, "cortical_mean": cortical, "ref_mean": ref_mean,
+                     "suvr": suvr, "qc_status": qc_status(group, suvr)})
+    return rows
+
+
+def extract_subject(subject, pet_path, group=None, store=None, qc_dir=None, scale=None,
+                    threshold=config.PET_THRESHOLD, smoothing=None):
+    """Extract SUVRs and QC stats for one subject; optionally persist them.
+
+    scale is the subject's intensity normalization factor; by default it is
+    looked up in the store (see pet_pipeline.normalize). SUVRs are computed
+    from the unscaled means, and only the reported means/ranges are scaled.
+    threshold applies to the image values before scaling and replaces the
+    _MNI_thr copies. smoothing is the (x, y, z) FWHM in mm of a Gaussian
+    applied to the loaded volume first (harmonization), None for none.
+    """
+    group = group or subject_group(subject)
+    if scale is None:
+        scale = store.get_scale(subject) if store is not None else 1.0
+    with trace.step("extract", subject):
+        image = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+        masks = {k: m for k, m in load_vois().items() if m.shape == image.shape[:3]}
+        volume = image.get_fdata() if image.header.scaled else image.dataobj
+        if smoothing is not None and any(smoothing):
+            volume = harmonize.smooth(volume, smoothing, image.zooms)
+        stats = regional_stats(volume, masks, threshold=threshold)
+    rows = suvr_rows(stats, group)
+    if scale != 1.0:
+        stats = scale_stats(stats, scale)
+        for r in rows:
+            r["cortical_mean"] *= scale
+            r["ref_mean"] *= scale
+    if store is not None:
+        store.put_suvr(subject, group, rows, pet_path, threshold, smoothing)
+        store.put_qc_stats(subject, stats, pet_path, threshold, smoothing)
+    if qc_dir:
+        os.makedirs(qc_dir, exist_ok=True)
+        with open(os.path.join(qc_dir, "%s_stats.json" % subject), "w") as f:
+            json.dump({"subject": subject, "pet_file": pet_path, "scale": scale,
+                       "threshold": threshold, "smoothing_fwhm": smoothing,
+                       "regions": stats}, f, indent=2)
+    return rows, stats
+
+
+def parse_threshold(text):
+    return None if text.lower() == "none" else float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass SUVR + QC statistics")
+    parser.add_argument("subject")
+    parser.add_argument("pet_file")
+    parser.add_argument("--group", help="AD or YC (default: from subject ID)")
+    parser.add_argument("--qc-dir", default=config.QC_DIR,
+                        help="where to write <subject>_stats.json")
+    parser.add_argument("--db", default=DB_PATH, help="results database path")
+    parser.add_argument("--threshold", type=parse_threshold, default=config.PET_THRESHOLD,
+                        help="zero voxels below this before statistics ('none' to disable)")
+    parser.add_argument("--harmonize", type=float,
+                        default=os.environ.get(harmonize.HARMONIZE_ENV) or None,
+                        help="smooth to this common FWHM in mm first (default $%s)"
+                             % harmonize.HARMONIZE_ENV)
+    parser.add_argument("--scanners", default=harmonize.SCANNER_FILE,
+                        help="native resolutions for --harmonize")
+    parser.add_argument("--allow-unharmonized", action="store_true",
+                        help="with --harmonize, extract a subject with no native resolution "
+                             "unsmoothed instead of failing")
+    args = parser.parse_args()
+
+    smoothing = None
+    if args.harmonize:
+        smoothing, _ = harmonize.subject_kernel(args.subject, args.harmonize,
+                                                harmonize.load_resolutions(args.scanners))
+        if smoothing is None:
+            if not args.allow_unharmonized:
+                print("✗ %s: no native resolution in %s, cannot harmonize to %g mm "
+                      "(--allow-unharmonized to extract it unsmoothed)"
+                      % (args.subject, args.scanners, args.harmonize), file=sys.stderr)
+                return 1
+            print("⚠️  %s: no native resolution in %s, not harmonized"
+                  % (args.subject, args.scanners), file=sys.stderr)
+
+    with ResultsStore(args.db) as store:
+        rows, _ = extract_subject(args.subject, args.pet_file, args.group, store, args.qc_dir,
+                                  threshold=args.threshold, smoothing=smoothing)
+    for r in rows:
+        print("%s:%.6f:%.6f:%.6f:%s" % (r["reference"], r["cortical_mean"], r["ref_mean"],
+                                        r["suvr"], r["qc_status"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Multi-scanner harmonization: Gaussian smoothing to a common effective resolution.
+
+Images from different scanners and reconstructions come with different
+resolutions, which alone moves regional SUVRs. Each PET is smoothed with
+the Gaussian that takes its native resolution to a common target FWHM
+(per axis, FWHM_kernel² = FWHM_target² - FWHM_native²; axes already at or
+beyond the target are left alone).
+
+Native resolutions come from data/scanners.json:
+
+    {"scanners": {"HR+": 5.5, "mMR": [4.3, 4.3, 4.9]},
+     "subjects": {"AD01": "HR+", "YC101": {"fwhm": [6, 6, 7]}},
+     "default": "HR+"}
+
+Smoothing happens inside pet_pipeline.extract's single load of the PET
+(``--harmonize 8`` or $PIPELINE_HARMONIZE_FWHM, so the shell scripts need
+no changes): one float32 buffer, smoothed in place by three 1D passes, or
+by one FFT convolution when the kernel is wider than FFT_SIGMA voxels.
+Nothing is written to disk; the kernel is recorded with the results.
+
+Usage (kernel each subject needs):
+    python -m pet_pipeline.harmonize [SUBJECT ...] --target 8
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from scipy import fft, ndimage
+
+from . import config
+
+SCANNER_FILE = os.path.join(config.DATA_DIR, "scanners.json")
+HARMONIZE_ENV = "PIPELINE_HARMONIZE_FWHM"
+FFT_SIGMA = 8.0         # voxels; wider kernels are applied by FFT
+TRUNCATE = 4.0          # kernel half-width in sigmas
+FWHM_TO_SIGMA = 1.0 / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+
+
+def sigma_voxels(fwhm, zooms):
+    """Per-axis Gaussian sigma in voxels for a FWHM (mm, scalar or 3 values)."""
+    fwhm = np.broadcast_to(np.asarray(fwhm, dtype=np.float64), (3,))
+    return fwhm * FWHM_TO_SIGMA / np.asarray(zooms[:3], dtype=np.float64)
+
+
+def convolve(volumes, sigma):
+    """Gaussian-blur a stack (K, X, Y, Z) by FFT, zero-padded by TRUNCATE sigma.
+
+    Returns float32; the same result as scipy.ndimage.gaussian_filter with
+    mode="constant" but one transform per volume whatever the kernel width.
+    """
+    volumes = np.asarray(volumes, dtype=np.float32)
+    shape = volumes.shape[1:]
+    pad = [int(np.ceil(TRUNCATE * s)) for s in sigma]
+    padded = [fft.next_fast_len(n + 2 * p, real=True) for n, p in zip(shape, pad)]
+    # separable kernel, centred on index 0 (wrapped), normalized per axis
+    kernel = np.ones(1, dtype=np.float64)
+    for n, s in zip(padded, sigma):
+        offsets = np.minimum(np.arange(n), n - np.arange(n))
+        axis = np.exp(-0.5 * (offsets / s) ** 2) if s > 0 else (offsets == 0).astype(float)
+        kernel = np.multiply.outer(kernel, axis / axis.sum())
+    kernel_f = fft.rfftn(kernel.reshape(padded))
+    out = np.empty(volumes.shape, dtype=np.float32)
+    for k, volume in enumerate(volumes):
+        spectrum = fft.rfftn(volume, s=padded) * kernel_f
+        out[k] = fft.irfftn(spectrum, s=padded)[:shape[0], :shape[1], :shape[2]]
+    return out
+
+
+def smooth(volume, fwhm, zooms):
+    """float32 copy of volume smoothed by a Gaussian of fwhm mm per axis
+    (zeros beyond the edges, NaNs as zero)."""
+    sigma = sigma_voxels(fwhm, zooms)
+    data = np.nan_to_num(np.array(volume, dtype=np.float32), copy=False)
+    if sigma.max() > FFT_SIGMA:
+        return convolve(data[None], sigma)[0]
+    for axis, s in enumerate(sigma):
+        if s > 0:
+            ndimage.gaussian_filter1d(data, s, axis=axis, output=data, mode="constant",
+                                      truncate=TRUNCATE)
+    return data
+
+
+def load_resolutions(path=SCANNER_FILE):
+    """Parsed scanner file, or an empty one when it does not exist."""
+    if not os.path.exists(path):
+        return {"scanners": {}, "subjects": {}}
+    with open(path) as f:
+        data = json.load(f)
+    data.setdefault("scanners", {})
+    data.setdefault("subjects", {})
+    return data
+
+
+def native_fwhm(subject, resolutions):
+    """Native (x, y, z) FWHM in mm of a subject's PET, or None if unknown."""
+    entry = resolutions["subjects"].get(subject, resolutions.get("default"))
+    if isinstance(entry, dict):
+        entry = entry.get("fwhm", entry.get("scanner"))
+    if isinstance(entry, str):
+        entry = resolutions["scanners"].get(entry)
+    if entry is None:
+        return None
+    return tuple(float(v) for v in np.broadcast_to(np.asarray(entry, dtype=np.float64), (3,)))
+
+
+def kernel_fwhm(native, target):
+    """Per-axis FWHM of the Gaussian taking native to target resolution."""
+    target = np.broadcast_to(np.asarray(target, dtype=np.float64), (3,))
+    return tuple(float(v) for v in np.sqrt(np.maximum(target ** 2 - np.asarray(native) ** 2, 0)))
+
+
+def subject_kernel(subject, target, resolutions=None):
+    """(kernel FWHM, native FWHM) for a subject; kernel None if native is unknown."""
+    resolutions = resolutions if resolutions is not None else load_resolutions()
+    native = native_fwhm(subject, resolutions)
+    if native is None:
+        return None, None
+    return kernel_fwhm(native, target), native
+
+
+def format_fwhm(fwhm):
+    return "x".join("%.2f" % v for v in fwhm) if fwhm is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smoothing kernels for resolution harmonization")
+    parser.add_argument("subjects", nargs="*", help="default: every subject in the scanner file")
+    parser.add_argument("--target", type=float, required=True, help="common FWHM in mm")
+    parser.add_argument("--scanners", default=SCANNER_FILE)
+    args = parser.parse_args()
+
+    resolutions = load_resolutions(args.scanners)
+    subjects = args.subjects or sorted(resolutions["subjects"])
+    print("=== HARMONIZATION KERNELS (target %g mm) ===" % args.target)
+    for subject in subjects:
+        kernel, native = subject_kernel(subject, args.target, resolutions)
+        if kernel is None:
+            print("%-8s ⚠️  no resolution in %s, would not be smoothed" % (subject, args.scanners))
+            continue
+        note = ("  (already at or beyond the target on some axes)"
+                if max(native) >= args.target else "")
+        print("%-8s native %s mm → kernel %s mm%s" % (
+            subject, format_fwhm(native), format_fwhm(kernel), note))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Crash-resumable stage runner backed by an append-only journal.
+
+Each per-subject stage of a cohort run is executed through
+``python -m pet_pipeline.journal run`` and every event (start, error, done,
+failed, quarantined, ...) is appended to the journal table of the results
+store with the SHA-1 of the stage's input and output files. On a restart a
+stage whose last outcome is "done", whose inputs are unchanged and whose
+outputs still hash to the recorded values is not run again: its recorded
+stdout is replayed, so ``result=$(...)`` in the scripts sees the same
+output and summaries can be rebuilt without repeating the work. Settings
+that change a stage's result without being files (--param NAME=VALUE:
+smoothing, threshold, scale factor, ...) are recorded with the input
+digests, so changing one makes the stage run again.
+
+A failing command is retried up to RETRIES times with exponential backoff
+(BACKOFF, 2 * BACKOFF, ...). A subject whose stages exhaust their retries
+in QUARANTINE_AFTER separate runs is quarantined: its stages are skipped
+(exit status 3) until ``journal release SUBJECT``.
+
+Usage:
+    python -m pet_pipeline.journal run AD01 extract --input PET --param threshold=0.001 \\
+        --output results/AD01_results.csv -- python -m pet_pipeline.extract AD01 PET
+    python -m pet_pipeline.journal status [--subject AD01]
+    python -m pet_pipeline.journal release AD01
+    python -m pet_pipeline.journal reset AD01 [STAGE]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from . import cache
+from .store import DB_PATH, ResultsStore
+
+RETRIES = 3
+BACKOFF = 5.0           # seconds before the first retry, doubled each time
+QUARANTINE_AFTER = 2    # runs that exhausted their retries
+QUARANTINED = 3         # exit status of a skipped, quarantined subject
+TERMINAL = ("done", "failed", "reset")
+
+
+def digests(paths):
+    """{path: SHA-1} for existing files, None for missing ones."""
+    return {p: cache.file_digest(p) if os.path.exists(p) else None for p in paths}
+
+
+def completed(records, stage, inputs):
+    """The journal record that lets stage be skipped, or None."""
+    last = None
+    for r in records:
+        if r["stage"] == stage and r["status"] in TERMINAL:
+            last = r
+    if last is None or last["status"] != "done":
+        return None
+    if json.loads(last["inputs"] or "{}") != inputs:
+        return None
+    outputs = json.loads(last["outputs"] or "{}")
+    if outputs != digests(outputs):
+        return None
+    return last
+
+
+def is_quarantined(records):
+    """Whether the subject's latest quarantine decision is still in force."""
+    state = False
+    for r in records:
+        if r["status"] == "quarantined":
+            state = True
+        elif r["status"] == "released":
+            state = False
+    return state
+
+
+def failed_runs(records):
+    """Runs that exhausted their retries since the subject was last released."""
+    count = 0
+    for r in records:
+        if r["status"] == "failed":
+            count += 1
+        elif r["status"] == "released":
+            count = 0
+    return count
+
+
+def run_stage(store, subject, stage, command, inputs=(), outputs=(), retries=RETRIES,
+              backoff=BACKOFF, run_id=None, params=None):
+    """Run (or skip) one stage; returns the exit status for the caller.
+
+    params ({name: value text}) are compared along with the input digests.
+    """
+    records = store.journal_records(subject)
+    event = {"run_id": run_id, "host": socket.gethostname(), "pid": os.getpid()}
+    if is_quarantined(records):
+        print("⚠️  %s %s: subject quarantined, skipping (journal release %s)"
+              % (subject, stage, subject), file=sys.stderr)
+        return QUARANTINED
+
+    in_digests = digests(inputs)
+    in_digests.update(("param:%s" % name, value) for name, value in (params or {}).items())
+    done = completed(records, stage, in_digests)
+    if done is not None:
+        sys.stdout.write(done["stdout"] or "")
+        print("↷ %s %s: done in run %s, skipping" % (subject, stage, done["run_id"] or "?"),
+              file=sys.stderr)
+        return 0
+
+    status, retries = 1, max(1, retries)
+    for attempt in range(1, retries + 1):
+        store.append_journal(subject, stage, "start", attempt=attempt,
+                             inputs=json.dumps(in_digests), **event)
+        start = time.time()
+        result = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        elapsed = time.time() - start
+        missing = [p for p in outputs if not os.path.exists(p)]
+        if result.returncode == 0 and not missing:
+            store.append_journal(subject, stage, "done", attempt=attempt,
+                                 inputs=json.dumps(in_digests),
+                                 outputs=json.dumps(digests(outputs)), stdout=result.stdout,
+                                 elapsed=elapsed, **event)
+            sys.stdout.write(result.stdout)
+            return 0
+        status = result.returncode or 1
+        message = ("exit status %d" % result.returncode if result.returncode
+                   else "missing outputs: %s" % " ".join(missing))
+        sys.stderr.write(result.stdout)
+        store.append_journal(subject, stage, "error", attempt=attempt, message=message,
+                             stdout=result.stdout, elapsed=elapsed, **event)
+        if attempt < retries:
+            delay = backoff * 2 ** (attempt - 1)
+            print("⚠️  %s %s: %s, retry %d/%d in %.0fs" % (
+                subject, stage, message, attempt, retries - 1, delay), file=sys.stderr)
+            time.sleep(delay)
+
+    store.append_journal(subject, stage, "failed", attempt=retries, message=message, **event)
+    print("✗ %s %s: failed after %d attempts (%s)" % (subject, stage, retries, message),
+          file=sys.stderr)
+    if failed_runs(store.journal_records(subject)) >= QUARANTINE_AFTER:
+        store.append_journal(subject, stage, "quarantined",
+                             message="%d failed runs" % QUARANTINE_AFTER, **event)
+        print("⚠️  %s quarantined after %d failed runs" % (subject, QUARANTINE_AFTER),
+              file=sys.stderr)
+    return status
+
+
+def status_rows(records):
+    """Latest terminal state per (subject, stage), plus quarantine flags."""
+    rows, by_subject = {}, {}
+    for r in records:
+        by_subject.setdefault(r["subject"], []).append(r)
+        if r["status"] in TERMINAL:
+            rows[(r["subject"], r["stage"])] = r
+    out = []
+    for (subject, stage), r in sorted(rows.items()):
+        out.append((subject, stage, r["status"], r["run_id"] or "", r["attempt"] or 0,
+                    is_quarantined(by_subject[subject])))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journaled, resumable pipeline stages")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="run a stage (command after --) unless the journal "
+                                   "shows it done")
+    p.add_argument("subject")
+    p.add_argument("stage")
+    p.add_argument("--input", action="append", default=[], help="file the stage reads")
+    p.add_argument("--output", action="append", default=[], help="file the stage writes")
+    p.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                   help="setting the stage's result depends on")
+    p.add_argument("--retries", type=int, default=RETRIES)
+    p.add_argument("--backoff", type=float, default=BACKOFF)
+    p.add_argument("--run-id", default=os.environ.get("PIPELINE_RUN_ID"))
+    p = sub.add_parser("status", help="latest state of every subject/stage")
+    p.add_argument("--subject")
+    p = sub.add_parser("release", help="lift a subject's quarantine")
+    p.add_argument("subject")
+    p = sub.add_parser("reset", help="force stages to run again")
+    p.add_argument("subject")
+    p.add_argument("stage", nargs="?")
+    argv, command = sys.argv[1:], []
+    if "--" in argv:
+        argv, command = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+
+    with ResultsStore(args.db) as store:
+        if args.command == "run":
+            if not command:
+                parser.error("run needs a command after --")
+            if any("=" not in p for p in args.param):
+                parser.error("--param takes NAME=VALUE")
+            params = dict(p.split("=", 1) for p in args.param)
+            return run_stage(store, args.subject, args.stage, command, args.input,
+                             args.output, args.retries, args.backoff, args.run_id, params)
+        if args.command == "release":
+            store.append_journal(args.subject, "*", "released")
+            print("✓ %s released" % args.subject)
+        elif args.command == "reset":
+            stages = [args.stage] if args.stage else sorted(
+                {r["stage"] for r in store.journal_records(args.subject)} - {"*"})
+            for stage in stages:
+                store.append_journal(args.subject, stage, "reset")
+            print("✓ %s: %s will run again" % (args.subject, ", ".join(stages) or "nothing"))
+        else:
+            print("=== JOURNAL ===")
+            for subject, stage, state, run_id, attempt, quarantined in status_rows(
+                    store.journal_records(args.subject)):
+                print("%-8s %-12s %-7s run %-16s attempt %d%s" % (
+                    subject, stage, state, run_id, attempt, "  QUARANTINED" if quarantined else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
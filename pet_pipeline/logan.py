@@ -0,0 +1,206 @@
+"""
+Reference Logan graphical analysis: regional and voxelwise DVR from dynamic PET.
+
+For frames whose mid-time is after t*, the Logan plot with a reference
+region (no k2' term)
+
+  y_i = ∫0^t_i C(s) ds / C_i      x_i = ∫0^t_i Cref(s) ds / C_i
+
+is linear with slope DVR (1 + BP_ND). Integrals run from injection to the
+frame mid-time (earlier frames times their durations plus half the current
+frame), so the frames must cover the scan without gaps: timing that does not
+start at injection (0 s) or that has gaps or overlaps between frames is
+rejected. The reference TAC is the mean of the reference VOI (CerebGry by
+default) in each frame, or a precompiled TAC (--ref-tac, one value per frame).
+
+The 4D series is streamed (nifti.iter_frames) in a single pass. Every voxel
+keeps a running integral of its TAC and the running sums n, Σx, Σy, Σx²,
+Σxy of its Logan points, so the least-squares line of all voxels comes out
+of one vectorized closed-form solve at the end, without holding the series
+or looping over voxels. Regional TACs go through the same sums, one entry
+per VOI. Voxels with non-positive activity in a late frame drop that
+point; voxels left with fewer than MIN_FRAMES points get DVR 0.
+
+Writes the parametric map <SUBJ>_<tracer>_DVR_<ref>.nii.gz next to the
+static images and the regional DVRs to the dvr table of the results store.
+
+Usage:
+    python -m pet_pipeline.logan SUBJECT DYNAMIC.nii.gz [--t-star 35] [--reference CG]
+    python -m pet_pipeline.logan SUBJECT DYNAMIC.nii --durations 60 60 ... --ref-tac cg_tac.txt
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from . import config, nifti, trace
+from .dynamic import frame_timing
+from .extract import load_vois
+from .store import DB_PATH, ResultsStore
+
+T_STAR = 35.0           # minutes; start of the linear phase for PiB
+REFERENCE = "CG"
+MIN_FRAMES = 3          # Logan points needed for a fit
+TIMING_TOLERANCE = 1.0  # seconds; allowed gap/overlap between frames
+
+
+class LoganSums:
+    """Running least-squares sums of Logan points for an array of TACs."""
+
+    def __init__(self, shape):
+        self.n = np.zeros(shape, dtype=np.int32)
+        self.sx = np.zeros(shape, dtype=np.float64)
+        self.sy = np.zeros(shape, dtype=np.float64)
+        self.sxx = np.zeros(shape, dtype=np.float64)
+        self.sxy = np.zeros(shape, dtype=np.float64)
+
+    def add(self, ref_integral, integral, activity):
+        """Add one frame's points; activity <= 0 contributes nothing."""
+        valid = activity > 0
+        inv = np.divide(1.0, activity, out=np.zeros(np.shape(activity)), where=valid)
+        x = ref_integral * inv
+        y = integral * inv
+        self.n += valid
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+
+    def solve(self, min_frames=MIN_FRAMES):
+        """(slope, intercept) of every line; zeros where it cannot be fitted."""
+        n = self.n.astype(np.float64)
+        det = n * self.sxx - self.sx * self.sx
+        fit = (self.n >= min_frames) & (det > 1e-12 * np.maximum(n * self.sxx, 1e-300))
+        slope = np.divide(n * self.sxy - self.sx * self.sy, det, out=np.zeros(det.shape),
+                          where=fit)
+        intercept = np.divide(self.sy - slope * self.sx, n, out=np.zeros(det.shape), where=fit)
+        return slope, intercept
+
+
+def check_timing(starts, durations, tolerance=TIMING_TOLERANCE):
+    """Raise ValueError unless the frames run contiguously from 0 s."""
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = starts + np.asarray(durations, dtype=np.float64)
+    if abs(starts[0]) > tolerance:
+        raise ValueError("first frame starts at %g s, not at injection; the Logan "
+                         "integrals need the whole TAC from 0 s" % starts[0])
+    gaps = np.flatnonzero(np.abs(starts[1:] - ends[:-1]) > tolerance)
+    if gaps.size:
+        k = gaps[0]
+        raise ValueError("frame %d starts at %g s but frame %d ends at %g s; the Logan "
+                         "integrals need contiguous frames" % (k + 1, starts[k + 1], k, ends[k]))
+
+
+def logan_stream(path, starts, durations, masks, reference=REFERENCE, t_star=T_STAR,
+                 ref_tac=None, orient=config.STANDARD_ORIENTATION):
+    """Stream a 4D PET once; returns (DVR map, {region: (dvr, intercept s, points)}).
+
+    masks are the VOIs on the image grid; the reference VOI gives the
+    reference TAC unless ref_tac (one value per frame) is given.
+    """
+    header = nifti.read_header(path)
+    count = header.shape[3] if header.ndim > 3 else 1
+    if count != len(durations):
+        raise ValueError("%s: %d frames but timing for %d" % (path, count, len(durations)))
+    if ref_tac is not None and len(ref_tac) != count:
+        raise ValueError("reference TAC has %d values for %d frames" % (len(ref_tac), count))
+    check_timing(starts, durations)
+    mids = np.asarray(starts) + np.asarray(durations) / 2.0
+    late = mids >= t_star * 60.0
+    if late.sum() < MIN_FRAMES:
+        raise ValueError("%s: %d frames after t* = %g min, need %d" % (
+            path, late.sum(), t_star, MIN_FRAMES))
+    regions = [name for name in masks if name != reference]
+
+    voxels = regional = None
+    for index, frame in nifti.iter_frames(path, orient=orient):
+        if voxels is None:
+            if frame.shape != masks[reference].shape:
+                raise ValueError("%s: grid %s is not the VOI grid %s" % (
+                    path, frame.shape, masks[reference].shape))
+            integral = np.zeros(frame.size, dtype=np.float64)
+            region_integral = np.zeros(len(regions))
+            ref_integral = 0.0
+            voxels, regional = LoganSums(frame.size), LoganSums(len(regions))
+        activity = np.nan_to_num(frame, copy=False).ravel()
+        means = np.array([frame[masks[name]].mean() for name in regions])
+        ref = ref_tac[index] if ref_tac is not None else frame[masks[reference]].mean()
+        half = durations[index] / 2.0
+        # integrals to the frame mid-time, then to its end for the next frame
+        integral += half * activity
+        region_integral += half * means
+        ref_integral += half * ref
+        if late[index]:
+            voxels.add(ref_integral, integral, activity)
+            regional.add(ref_integral, region_integral, means)
+        integral += half * activity
+        region_integral += half * means
+        ref_integral += half * ref
+
+    slope, _ = voxels.solve()
+    dvr_map = slope.astype(np.float32).reshape(masks[reference].shape)
+    fitted = regional.solve()
+    results = {name: (float(fitted[0][k]), float(fitted[1][k]), int(regional.n[k]))
+               for k, name in enumerate(regions)}
+    return dvr_map, results
+
+
+def logan_subject(subject, path, durations=None, reference=REFERENCE, t_star=T_STAR,
+                  ref_tac=None, tracer=config.PET_BASE.split("_")[0], out=None,
+                  data_dir=config.DATA_DIR):
+    """Regional DVR rows and the parametric map path for one subject."""
+    starts, durations = frame_timing(path, durations)
+    masks = load_vois()
+    if reference not in masks:
+        raise FileNotFoundError("reference VOI %s not found" % reference)
+    with trace.step("logan", subject):
+        dvr_map, results = logan_stream(path, starts, durations, masks, reference, t_star,
+                                        ref_tac)
+    if out is None:
+        out = os.path.join(data_dir, subject, "pet", "%s_%s_DVR_%s.nii.gz" % (
+            subject, tracer, reference))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    header = nifti.read_header(path)
+    nifti.save(out, dvr_map, nifti.reoriented_affine(header, config.STANDARD_ORIENTATION),
+               template=header)
+    rows = [{"region": name, "dvr": dvr, "intercept": intercept, "frames": points}
+            for name, (dvr, intercept, points) in results.items()]
+    return rows, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference Logan DVR from dynamic PET")
+    parser.add_argument("subject")
+    parser.add_argument("dynamic", help="4D PET (.nii or .nii.gz) on the VOI grid")
+    parser.add_argument("--reference", default=REFERENCE, choices=sorted(config.VOI_FILES))
+    parser.add_argument("--ref-tac", help="reference TAC, one value per frame (text file)")
+    parser.add_argument("--t-star", type=float, default=T_STAR,
+                        help="minutes; frames with mid-time from here on are fitted")
+    parser.add_argument("--durations", type=float, nargs="+",
+                        help="frame durations in seconds (default: BIDS sidecar)")
+    parser.add_argument("--tracer", default=config.PET_BASE.split("_")[0])
+    parser.add_argument("--out", help="default: data/<SUBJ>/pet/<SUBJ>_<tracer>_DVR_<ref>.nii.gz")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    ref_tac = np.loadtxt(args.ref_tac, ndmin=1) if args.ref_tac else None
+    try:
+        rows, out = logan_subject(args.subject, args.dynamic, args.durations, args.reference,
+                                  args.t_star, ref_tac, args.tracer, args.out, args.data)
+    except (OSError, ValueError) as exc:
+        print("%-8s ⚠️  %s" % (args.subject, exc))
+        return 1
+    with ResultsStore(args.db) as store:
+        store.put_dvr(args.subject, args.reference, rows, args.t_star, out, args.dynamic)
+    print("=== LOGAN DVR (reference %s, t* %g min) ===" % (args.reference, args.t_star))
+    print("✓ %-8s %s" % (args.subject, "  ".join(
+        "%s %.3f" % (r["region"], r["dvr"]) for r in rows if r["frames"])))
+    print("  DVR map: %s" % out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
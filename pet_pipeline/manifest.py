@@ -0,0 +1,281 @@
+"""
+Cohort manifest: one walk of data/ instead of per-subject file probing.
+
+data/manifest.json records, for every subject directory, each image and
+transform with its variant (raw, MNI, MNI_thr, T1, MNI_norm, brain, ...),
+size, mtime, SHA-1 and (for NIfTI) header geometry, plus the subject's
+group and aliases such as the SPM team's sub-XX IDs. Rebuilding is
+incremental: unchanged files (same size and mtime) keep their hash and
+header without being re-read.
+
+Loading revalidates: data/ is walked again (directory listings and stat
+only) and new, changed or deleted files are updated before the manifest is
+used, so readers never get a path or SHA-1 that no longer matches the disk.
+Header-only readers (audit, viewer) pass hash_files=False; changed files
+then get geometry but no SHA-1, which the next reader that needs hashes
+fills in.
+
+The list/resolve/alias commands read manifest.json as it is (it is built
+when missing, and revalidated with --refresh): the scripts run
+`manifest build` once at the start and then query it, so a query costs no
+walk of data/. `list --resolve FOLDER` prints SUBJ<TAB>path for every
+listed subject (path empty when it has no such image), so a loop makes one
+call instead of one resolve per subject.
+
+Usage:
+    python -m pet_pipeline.manifest build
+    python -m pet_pipeline.manifest list [--group AD] [--has pet:raw --has anat:raw]
+    python -m pet_pipeline.manifest list --group AD --resolve pet [--variant MNI ...]
+    python -m pet_pipeline.manifest resolve AD01 pet [--variant MNI ...] [--refresh]
+    python -m pet_pipeline.manifest alias sub-01
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+from . import cache, config, nifti
+
+MANIFEST_PATH = os.path.join(config.DATA_DIR, "manifest.json")
+FORMAT_VERSION = 1
+FOLDERS = {"anat": config.T1_BASE, "pet": config.PET_BASE, "transform": None}
+
+
+def subject_group(subject):
+    """Group for a subject ID from config.ID_GROUPS, or 'NA'."""
+    for pattern, group in config.ID_GROUPS:
+        if re.match(pattern, subject):
+            return group
+    return "NA"
+
+
+def subject_aliases(subject):
+    """Alternative IDs (e.g. the SPM team's sub-01 for AD01)."""
+    aliases = []
+    for pattern, template in config.ID_ALIASES:
+        match = re.match(pattern, subject)
+        if match:
+            aliases.append(template.format(int(match.group(1))))
+    return aliases
+
+
+def classify(subject, folder, filename):
+    """Variant name of a file: 'raw' for the original, else the suffix."""
+    stem = re.sub(r"\.(nii\.gz|nii|mat)$", "", filename)
+    if folder == "transform":
+        return stem
+    prefix = "%s_%s" % (subject, FOLDERS[folder])
+    if stem == prefix:
+        return "raw"
+    if stem.startswith(prefix + "_"):
+        return stem[len(prefix) + 1:]
+    return stem
+
+
+def _geometry(path):
+    try:
+        h = nifti.read_header(path)
+    except (OSError, EOFError, ValueError):
+        return None
+    return {"shape": list(h.shape), "zooms": [round(z, 6) for z in h.zooms],
+            "datatype": h.datatype, "qform_code": h.qform_code,
+            "sform_code": h.sform_code, "orientation": "".join(nifti.orientation(h.affine))}
+
+
+def build(data_dir=config.DATA_DIR, previous=None, hash_files=True):
+    """Walk data_dir once and return the manifest dict."""
+    old = {}
+    for subject in (previous or {}).get("subjects", {}).values():
+        for entry in subject["files"]:
+            old[entry["path"]] = entry
+
+    subjects = {}
+    with os.scandir(data_dir) as top:
+        subject_dirs = sorted(e.name for e in top if e.is_dir() and not e.name.startswith("."))
+    for subject in subject_dirs:
+        files = []
+        for folder in FOLDERS:
+            directory = os.path.join(data_dir, subject, folder)
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as it:
+                entries = sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+            for e in entries:
+                if not e.name.endswith((".nii", ".nii.gz", ".mat")):
+                    continue
+                st = e.stat()
+                path = os.path.join(directory, e.name)
+                prior = old.get(path)
+                if prior and prior["size"] == st.st_size and prior["mtime_ns"] == st.st_mtime_ns:
+                    if hash_files and prior["sha1"] is None:
+                        prior = dict(prior, sha1=cache.file_digest(path))
+                    files.append(prior)
+                    continue
+                entry = {"path": path, "folder": folder,
+                         "variant": classify(subject, folder, e.name),
+                         "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                         "sha1": cache.file_digest(path) if hash_files else None}
+                if not e.name.endswith(".mat"):
+                    entry["geometry"] = _geometry(path)
+                files.append(entry)
+        subjects[subject] = {"group": subject_group(subject),
+                             "aliases": subject_aliases(subject), "files": files}
+    return {"version": FORMAT_VERSION, "data_dir": data_dir, "created": time.time(),
+            "subjects": subjects}
+
+
+class Manifest:
+    """Query interface over a built manifest."""
+
+    def __init__(self, data):
+        self.data = data
+        self.subjects = data["subjects"]
+        self._aliases = {a: s for s, info in self.subjects.items() for a in info["aliases"]}
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def load_or_build(cls, data_dir=config.DATA_DIR, path=None, refresh=False,
+                      hash_files=True):
+        """Read the manifest, revalidated against data/ (size and mtime).
+
+        Entries of files that changed are rebuilt, and the file is rewritten
+        only when something did. refresh=True re-reads every file.
+        hash_files=False skips SHA-1 for rebuilt entries (header-only users).
+        """
+        path = path or os.path.join(data_dir, "manifest.json")
+        previous = None
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+            if previous.get("version") != FORMAT_VERSION:
+                previous = None
+        if not os.path.isdir(data_dir):
+            return cls(previous or {"version": FORMAT_VERSION, "subjects": {}})
+        data = build(data_dir, None if refresh else previous, hash_files)
+        if previous is None or data["subjects"] != previous["subjects"]:
+            save(data, path)
+        else:
+            data = previous
+        return cls(data)
+
+    def canonical(self, subject_id):
+        """Map an alias (sub-01) to the subject directory name (AD01)."""
+        return subject_id if subject_id in self.subjects else self._aliases.get(subject_id)
+
+    def files(self, subject, folder=None, variant=None):
+        subject = self.canonical(subject)
+        if subject is None:
+            return []
+        return [f for f in self.subjects[subject]["files"]
+                if (folder is None or f["folder"] == folder)
+                and (variant is None or f["variant"] == variant)]
+
+    def image(self, subject, folder, variants):
+        """Path of the first available variant in preference order, or None."""
+        available = {f["variant"]: f["path"] for f in self.files(subject, folder)}
+        for variant in variants:
+            if variant in available:
+                return available[variant]
+        return None
+
+    def pet(self, subject, variants=None):
+        """MNI-space PET in the scripts' order (MNI, MNI_thr, T1, MNI_norm)."""
+        return self.image(subject, "pet", variants or config.PET_VARIANTS)
+
+    def list(self, group=None, has=()):
+        """Subject IDs, optionally filtered by group and required folder:variant."""
+        out = []
+        for subject, info in self.subjects.items():
+            if group and info["group"] != group:
+                continue
+            if all(self.files(subject, *req.split(":", 1)) for req in has):
+                out.append(subject)
+        return out
+
+
+def save(data, path=MANIFEST_PATH):
+    # per-process temporary name: several hosts may rebuild at once
+    tmp = "%s.%s.%d.tmp" % (path, socket.gethostname(), os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def default_variants(folder, variants=None):
+    """Preference order for resolve: the given variants, else the PET order or raw."""
+    return variants or (config.PET_VARIANTS if folder == "pet" else ["raw"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort manifest index")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="walk data/ and (re)write manifest.json")
+    p = sub.add_parser("list", help="print subject IDs, one per line")
+    p.add_argument("--group")
+    p.add_argument("--has", action="append", default=[], metavar="FOLDER:VARIANT")
+    p.add_argument("--resolve", choices=list(FOLDERS),
+                   help="print SUBJ<TAB>path of the preferred image instead")
+    p.add_argument("--variant", action="append", help="preference order (repeatable)")
+    p.add_argument("--refresh", action="store_true", help="revalidate against data/ first")
+    p = sub.add_parser("resolve", help="print the preferred image path")
+    p.add_argument("subject")
+    p.add_argument("folder", choices=list(FOLDERS))
+    p.add_argument("--variant", action="append", help="preference order (repeatable)")
+    p.add_argument("--refresh", action="store_true", help="revalidate against data/ first")
+    p = sub.add_parser("alias", help="map sub-XX <-> ADXX")
+    p.add_argument("subject")
+    p.add_argument("--refresh", action="store_true", help="revalidate against data/ first")
+    args = parser.parse_args()
+
+    path = os.path.join(args.data, "manifest.json")
+    if args.command == "build":
+        previous = None
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+        start = time.time()
+        data = build(args.data, previous)
+        save(data, path)
+        n_files = sum(len(s["files"]) for s in data["subjects"].values())
+        print("✓ Manifest: %d subjects, %d files (%.1fs) -> %s" % (
+            len(data["subjects"]), n_files, time.time() - start, path))
+        return 0
+
+    if args.refresh or not os.path.exists(path):
+        manifest = Manifest.load_or_build(args.data, path, hash_files=False)
+    else:
+        manifest = Manifest.load(path)
+    if args.command == "list":
+        for subject in manifest.list(args.group, args.has):
+            if not args.resolve:
+                print(subject)
+                continue
+            found = manifest.image(subject, args.resolve,
+                                   default_variants(args.resolve, args.variant))
+            print("%s\t%s" % (subject, found or ""))
+    elif args.command == "resolve":
+        found = manifest.image(args.subject, args.folder,
+                               default_variants(args.folder, args.variant))
+        if not found:
+            return 1
+        print(found)
+    elif args.command == "alias":
+        canonical = manifest.canonical(args.subject)
+        if canonical is None:
+            return 1
+        print(canonical if canonical != args.subject else
+              " ".join(manifest.subjects[canonical]["aliases"]) or canonical)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
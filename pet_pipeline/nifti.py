@@ -0,0 +1,366 @@
+"""
+Minimal NIfTI-1 reader/writer built on NumPy.
+
+Only what the pipeline needs: single-file .nii / .nii.gz images, header
+parsing without touching voxel data, and float32 output with a copied
+qform/sform. Uncompressed images are memory-mapped.
+"""
+
+import gzip
+import struct
+
+import numpy as np
+
+HEADER_SIZE = 348
+
+# NIfTI datatype code -> NumPy dtype
+DATATYPES = {
+    2: np.uint8,
+    4: np.int16,
+    8: np.int32,
+    16: np.float32,
+    64: np.float64,
+    256: np.int8,
+    512: np.uint16,
+    768: np.uint32,
+    1024: np.int64,
+    1280: np.uint64,
+}
+
+
+def _open(path, mode="rb"):
+    return gzip.open(path, mode) if str(path).endswith(".gz") else open(path, mode)
+
+
+class NiftiHeader:
+    """Parsed NIfTI-1 header fields."""
+
+    def __init__(self, raw):
+        if len(raw) < HEADER_SIZE:
+            raise ValueError("Truncated NIfTI header (%d bytes)" % len(raw))
+        endian = "<"
+        if struct.unpack("<i", raw[:4])[0] != HEADER_SIZE:
+            endian = ">"
+            if struct.unpack(">i", raw[:4])[0] != HEADER_SIZE:
+                raise ValueError("Not a NIfTI-1 file (bad sizeof_hdr)")
+        self.endian = endian
+        self.raw = bytes(raw[:HEADER_SIZE])
+
+        def unpack(fmt, offset):
+            return struct.unpack_from(endian + fmt, raw, offset)
+
+        self.dim = unpack("8h", 40)
+        self.intent_code = unpack("h", 68)[0]
+        self.datatype = unpack("h", 70)[0]
+        self.bitpix = unpack("h", 72)[0]
+        self.pixdim = unpack("8f", 76)
+        self.vox_offset = unpack("f", 108)[0]
+        self.scl_slope, self.scl_inter = unpack("2f", 112)
+        self.xyzt_units = raw[123]
+        self.qform_code, self.sform_code = unpack("2h", 252)
+        self.quatern = unpack("6f", 256)
+        self.srow = np.array(unpack("12f", 280), dtype=np.float64).reshape(3, 4)
+        self.magic = raw[344:348].rstrip(b"\x00")
+
+    @property
+    def ndim(self):
+        return self.dim[0]
+
+    @property
+    def shape(self):
+        return tuple(int(d) for d in self.dim[1:1 + self.dim[0]])
+
+    @property
+    def zooms(self):
+        return tuple(float(p) for p in self.pixdim[1:1 + self.dim[0]])
+
+    @property
+    def dtype(self):
+        if self.datatype not in DATATYPES:
+            raise ValueError("Unsupported NIfTI datatype %d" % self.datatype)
+        return np.dtype(DATATYPES[self.datatype]).newbyteorder(self.endian)
+
+    @property
+    def scaled(self):
+        """True when scl_slope/scl_inter change the stored values."""
+        return self.scl_slope not in (0.0, 1.0) or self.scl_inter != 0.0
+
+    def qform(self):
+        """Affine from the quaternion fields (method 2 in nifti1.h)."""
+        b, c, d, qx, qy, qz = self.quatern
+        a = 1.0 - (b * b + c * c + d * d)
+        a = np.sqrt(a) if a > 1e-7 else 0.0
+        if a == 0.0:
+            norm = np.sqrt(b * b + c * c + d * d)
+            b, c, d = b / norm, c / norm, d / norm
+        rot = np.array([
+            [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+            [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+            [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+        ])
+        qfac = -1.0 if self.pixdim[0] < 0 else 1.0
+        zooms = np.array([self.pixdim[1], self.pixdim[2], self.pixdim[3] * qfac])
+        affine = np.eye(4)
+        affine[:3, :3] = rot * zooms
+        affine[:3, 3] = (qx, qy, qz)
+        return affine
+
+    def sform(self):
+        affine = np.eye(4)
+        affine[:3] = self.srow
+        return affine
+
+    @property
+    def affine(self):
+        """Voxel-to-world affine: sform if set, else qform, else pixdim."""
+        if self.sform_code > 0:
+            return self.sform()
+        if self.qform_code > 0:
+            return self.qform()
+        return np.diag(list(self.pixdim[1:4]) + [1.0])
+
+
+def orientation(affine):
+    """Axis codes (e.g. ('L', 'A', 'S')) for the direction each voxel axis points.
+
+    Each voxel axis is assigned the world axis it is most aligned with; the
+    letter is the end of that world axis reached as the voxel index grows.
+    """
+    rzs = np.asarray(affine, dtype=np.float64)[:3, :3]
+    codes = []
+    for column in (rzs / np.sqrt((rzs ** 2).sum(axis=0))).T:
+        world = int(np.argmax(np.abs(column)))
+        positive = column[world] > 0
+        codes.append(("RAS" if positive else "LPI")[world])
+    return tuple(codes)
+
+
+def reorient_transform(affine, shape, target=("L", "A", "S")):
+    """What fslreorient2std does to an image, as index arithmetic.
+
+    Returns (axes, flips, voxel_map): output axis j is input axis axes[j],
+    reversed where flips[j]; voxel_map is the 4x4 matrix taking output voxel
+    indices to input voxel indices, so the reoriented affine is
+    ``affine @ voxel_map``.
+    """
+    current = orientation(affine)
+    opposite = {"L": "R", "R": "L", "A": "P", "P": "A", "S": "I", "I": "S"}
+    axes, flips = [], []
+    for code in target:
+        for k, c in enumerate(current):
+            if c in (code, opposite[code]):
+                axes.append(k)
+                flips.append(c != code)
+                break
+    if sorted(axes) != [0, 1, 2]:
+        raise ValueError("Cannot reorient %s to %s" % ("".join(current), "".join(target)))
+    voxel_map = np.zeros((4, 4))
+    voxel_map[3, 3] = 1.0
+    for j, (k, flip) in enumerate(zip(axes, flips)):
+        voxel_map[k, j] = -1.0 if flip else 1.0
+        voxel_map[k, 3] = shape[k] - 1 if flip else 0.0
+    return axes, flips, voxel_map
+
+
+def read_header(path):
+    """Read only the 348-byte header of a .nii or .nii.gz file."""
+    with _open(path) as f:
+        return NiftiHeader(f.read(HEADER_SIZE))
+
+
+class NiftiImage:
+    """Header plus (possibly memory-mapped) voxel array.
+
+    The array is in file order unless the image came from reorient(), in
+    which case dataobj, affine and zooms describe the reoriented view.
+    """
+
+    def __init__(self, header, dataobj, affine=None, zooms=None):
+        self.header = header
+        self.dataobj = dataobj
+        self.affine = header.affine if affine is None else affine
+        self._zooms = None if zooms is None else tuple(zooms)
+
+    @property
+    def shape(self):
+        return self.dataobj.shape
+
+    @property
+    def zooms(self):
+        return self.header.zooms if self._zooms is None else self._zooms
+
+    def get_fdata(self, dtype=np.float32):
+        """Voxel values with scl_slope/scl_inter applied."""
+        data = np.asarray(self.dataobj, dtype=dtype)
+        if self.header.scaled:
+            slope = self.header.scl_slope or 1.0
+            data = data * dtype(slope) + dtype(self.header.scl_inter)
+        return data
+
+
+def load(path, mmap=True, orient=None):
+    """Load a NIfTI-1 image; .nii files are memory-mapped when mmap=True.
+
+    With orient (e.g. ('L', 'A', 'S')) the image is returned as a
+    reorient() view in that orientation.
+    """
+    header = read_header(path)
+    offset = int(header.vox_offset)
+    shape = header.shape
+    dtype = header.dtype
+    if not str(path).endswith(".gz") and mmap:
+        data = np.memmap(path, dtype=dtype, mode="r", offset=offset,
+                         shape=shape, order="F")
+    else:
+        with _open(path) as f:
+            f.read(offset)
+            count = int(np.prod(shape))
+            buf = f.read(count * dtype.itemsize)
+        data = np.frombuffer(buf, dtype=dtype, count=count).reshape(shape, order="F")
+    image = NiftiImage(header, data)
+    return reorient(image, orient) if orient else image
+
+
+def iter_frames(path, frames=None, orient=None):
+    """Yield (index, frame) for the 3D frames of a 4D image, one at a time.
+
+    Frames are read sequentially into one reused buffer (also from .nii.gz,
+    which cannot be memory-mapped), so memory stays at a single frame; the
+    yielded float32 array (scaled, optionally a reoriented view) is
+    overwritten by the next frame. Frames not in `frames` are skipped and
+    reading stops after the last one wanted.
+    """
+    header = read_header(path)
+    shape = header.shape
+    spatial = shape[:3]
+    count = shape[3] if len(shape) > 3 else 1
+    dtype = header.dtype
+    nbytes = int(np.prod(spatial)) * dtype.itemsize
+    raw = bytearray(nbytes)
+    frame = np.empty(spatial, dtype=np.float32, order="F")
+    view = frame
+    if orient:
+        axes, flips, _ = reorient_transform(header.affine, spatial, orient)
+        view = np.transpose(frame, axes)[tuple(slice(None, None, -1) if flip else slice(None)
+                                               for flip in flips)]
+    with _open(path) as f:
+        f.seek(int(header.vox_offset))
+        last = count - 1 if frames is None else min(max(frames, default=-1), count - 1)
+        for index in range(last + 1):
+            if frames is not None and index not in frames:
+                f.seek(nbytes, 1)
+                continue
+            if f.readinto(raw) != nbytes:
+                raise ValueError("%s: truncated at frame %d" % (path, index))
+            np.copyto(frame, np.frombuffer(raw, dtype=dtype).reshape(spatial, order="F"),
+                      casting="unsafe")
+            if header.scaled:
+                frame *= np.float32(header.scl_slope or 1.0)
+                frame += np.float32(header.scl_inter)
+            yield index, view
+
+
+def reoriented_affine(header, target=("L", "A", "S")):
+    """Affine of an image's reorient() view, from its header alone."""
+    _, _, voxel_map = reorient_transform(header.affine, header.shape[:3], target)
+    return header.affine @ voxel_map
+
+
+def reorient(image, target=("L", "A", "S")):
+    """Zero-copy view of an image in the target orientation.
+
+    Equivalent to fslreorient2std: the voxel array is transposed and
+    flipped as a strided NumPy view (a memory-mapped file stays mapped and
+    is never read or copied) and the change is folded into the affine.
+    Returns the image itself when it is already in the target orientation.
+    """
+    shape = image.shape[:3]
+    axes, flips, voxel_map = reorient_transform(image.affine, shape, target)
+    if axes == [0, 1, 2] and not any(flips):
+        return image
+    data = np.transpose(image.dataobj, axes + list(range(3, image.dataobj.ndim)))
+    data = data[tuple(slice(None, None, -1) if flip else slice(None) for flip in flips)]
+    zooms = [image.zooms[k] for k in axes] + list(image.zooms[3:])
+    return NiftiImage(image.header, data, image.affine @ voxel_map, zooms)
+
+
+def _quaternion(affine):
+    """Quaternion parameters and qfac for the rotation part of an affine."""
+    rzs = affine[:3, :3]
+    zooms = np.sqrt((rzs ** 2).sum(axis=0))
+    rot = rzs / zooms
+    qfac = 1.0
+    if np.linalg.det(rot) < 0:
+        rot[:, 2] = -rot[:, 2]
+        qfac = -1.0
+    trace = rot[0, 0] + rot[1, 1] + rot[2, 2] + 1.0
+    if trace > 0.5:
+        a = 0.5 * np.sqrt(trace)
+        b = 0.25 * (rot[2, 1] - rot[1, 2]) / a
+        c = 0.25 * (rot[0, 2] - rot[2, 0]) / a
+        d = 0.25 * (rot[1, 0] - rot[0, 1]) / a
+    else:
+        xd = 1.0 + rot[0, 0] - (rot[1, 1] + rot[2, 2])
+        yd = 1.0 + rot[1, 1] - (rot[0, 0] + rot[2, 2])
+        zd = 1.0 + rot[2, 2] - (rot[0, 0] + rot[1, 1])
+        if xd > 1.0:
+            b = 0.5 * np.sqrt(xd)
+            c = 0.25 * (rot[0, 1] + rot[1, 0]) / b
+            d = 0.25 * (rot[0, 2] + rot[2, 0]) / b
+            a = 0.25 * (rot[2, 1] - rot[1, 2]) / b
+        elif yd > 1.0:
+            c = 0.5 * np.sqrt(yd)
+            b = 0.25 * (rot[0, 1] + rot[1, 0]) / c
+            d = 0.25 * (rot[1, 2] + rot[2, 1]) / c
+            a = 0.25 * (rot[0, 2] - rot[2, 0]) / c
+        else:
+            d = 0.5 * np.sqrt(zd)
+            b = 0.25 * (rot[0, 2] + rot[2, 0]) / d
+            c = 0.25 * (rot[1, 2] + rot[2, 1]) / d
+            a = 0.25 * (rot[1, 0] - rot[0, 1]) / d
+        if a < 0:
+            b, c, d = -b, -c, -d
+    return (b, c, d), zooms, qfac
+
+
+def save(path, data, affine, template=None, xform_code=None):
+    """Write data as a float32 NIfTI-1 image with the given affine.
+
+    qform and sform both carry the affine; their codes are copied from the
+    template header when given (default: 4 = MNI152, as flirt writes).
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if xform_code is None:
+        xform_code = (template.sform_code or template.qform_code) if template else 4
+    (b, c, d), zooms, qfac = _quaternion(np.asarray(affine, dtype=np.float64))
+    dims = [data.ndim] + list(data.shape) + [1] * (7 - data.ndim)
+    pixdim = [qfac] + list(zooms) + [1.0] * (7 - 3)
+    if template is not None and data.ndim > 3:
+        pixdim[4:4 + data.ndim - 3] = template.pixdim[4:4 + data.ndim - 3]
+
+    # Start from the template so descrip/aux fields survive; big-endian
+    # templates are not byte-swapped field by field, so start blank instead.
+    if template is not None and template.endian == "<":
+        raw = bytearray(template.raw)
+    else:
+        raw = bytearray(HEADER_SIZE)
+    struct.pack_into("<i", raw, 0, HEADER_SIZE)
+    struct.pack_into("<8h", raw, 40, *dims)
+    struct.pack_into("<h", raw, 68, 0)
+    struct.pack_into("<2h", raw, 70, 16, 32)
+    struct.pack_into("<8f", raw, 76, *pixdim)
+    struct.pack_into("<f", raw, 108, 352.0)
+    struct.pack_into("<2f", raw, 112, 1.0, 0.0)
+    struct.pack_into("<2f", raw, 124, float(np.nanmax(data)) if data.size else 0.0,
+                     float(np.nanmin(data)) if data.size else 0.0)
+    if not raw[123]:
+        raw[123] = 10  # mm + sec
+    struct.pack_into("<2h", raw, 252, xform_code, xform_code)
+    struct.pack_into("<6f", raw, 256, b, c, d, *affine[:3, 3])
+    struct.pack_into("<12f", raw, 280, *np.asarray(affine[:3], dtype=np.float64).ravel())
+    raw[344:348] = b"n+1\x00"
+
+    with _open(path, "wb") as f:
+        f.write(bytes(raw[:HEADER_SIZE]))
+        f.write(b"\x00" * 4)
+        f.write(data.astype("<f4").tobytes(order="F"))
@@ -0,0 +1,100 @@
+"""
+Lazy intensity normalization.
+
+Instead of writing a rescaled copy (``fslmaths -mul $SCALE ..._MNI_norm``),
+the scale factor target/cerebellar_mean is recorded in the results store
+(intensity_scale table) and applied when values are read: extraction scales
+the regional summaries, and SUVR, being a ratio, needs no scaling at all.
+QC rendering windows each volume on its own percentiles, so it is unaffected.
+
+Each factor is stored with the cutoff (--above) that produced it. A subject
+whose mean is under the cutoff only loses a factor recorded with that same
+cutoff, so runs with different rules (fix_intensity_scaling.sh uses 5, the
+default is config.NORMALIZE_ABOVE) do not undo each other.
+
+Usage (same rule as normalize_pet.sh: rescale when CG mean > 10):
+    python -m pet_pipeline.normalize [SUBJECT ...] [--above 10] --target 3.5
+"""
+
+import argparse
+import os
+import sys
+
+from . import config, nifti, trace
+from .extract import load_vois, regional_stats
+from .manifest import Manifest
+from .store import DB_PATH, ResultsStore
+
+DEFAULT_TARGET = 3.5      # typical cerebellar gray mean of good subjects (AD01)
+DEFAULT_ABOVE = config.NORMALIZE_ABOVE
+REFERENCE = "CG"
+
+
+def reference_mean(pet_path, region=REFERENCE):
+    """Non-zero mean of the PET inside a reference VOI (fslstats -k -M)."""
+    image = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+    masks = {k: m for k, m in load_vois([region]).items() if m.shape == image.shape[:3]}
+    if not masks:
+        return None
+    volume = image.get_fdata() if image.header.scaled else image.dataobj
+    return regional_stats(volume, masks)[region]["mean_nonzero"]
+
+
+def normalize_subject(store, subject, pet_path, above=DEFAULT_ABOVE, target=DEFAULT_TARGET):
+    """Record (or clear) the subject's scale factor; returns (ref_mean, factor)."""
+    with trace.step("normalize", subject):
+        ref_mean = reference_mean(pet_path)
+    if ref_mean is None or ref_mean <= 0:
+        return ref_mean, None
+    if ref_mean > above:
+        factor = target / ref_mean
+        store.put_scale(subject, factor, REFERENCE, ref_mean, target, pet_path, above)
+        return ref_mean, factor
+    store.clear_scale(subject, REFERENCE, above)
+    return ref_mean, 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record lazy intensity scale factors")
+    parser.add_argument("subjects", nargs="*", help="default: every subject with a PET")
+    parser.add_argument("--pet", help="PET file (only with a single subject)")
+    parser.add_argument("--group", help="restrict to one group (AD/YC)")
+    parser.add_argument("--variant", default="MNI", help="PET variant to measure")
+    parser.add_argument("--above", type=float, default=DEFAULT_ABOVE,
+                        help="rescale when the cerebellar mean exceeds this")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET)
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.pet:
+        if len(args.subjects) != 1:
+            parser.error("--pet needs exactly one subject")
+        jobs = [(args.subjects[0], args.pet)]
+    else:
+        manifest = Manifest.load_or_build(args.data, hash_files=False)
+        subjects = args.subjects or manifest.list(args.group, ["pet:" + args.variant])
+        jobs = [(s, manifest.image(s, "pet", [args.variant])) for s in subjects]
+
+    status = 0
+    with ResultsStore(args.db) as store:
+        for subject, pet_path in jobs:
+            print("--- %s ---" % subject)
+            if not pet_path or not os.path.exists(pet_path):
+                print("  No %s PET file, skipping" % args.variant)
+                continue
+            ref_mean, factor = normalize_subject(store, subject, pet_path,
+                                                 args.above, args.target)
+            if factor is None:
+                print("  ⚠️  Could not extract cerebellar value")
+                status = 1
+            elif factor != 1.0:
+                print("  ⚠️  Cerebellar mean %.3f > %g: scale factor %.6f recorded"
+                      % (ref_mean, args.above, factor))
+            else:
+                print("  ✓ Cerebellar mean %.3f looks OK" % ref_mean)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Synthetic amyloid PET phantoms on the GAAIN 2mm MNI grid.
+
+The GAAIN data cannot be redistributed, so benchmarks and checks run on
+piecewise-constant phantoms built from the bundled VOIs. Every voxel gets
+the activity of one tissue class of pet_pipeline.pvc (relative to
+cerebellar grey = 1):
+
+  rest       1.2   ellipsoid around the VOIs (white/grey matter mix)
+  ctx        SUVR  voi_ctx (AD-like 2.4, YC-like 1.1 by default)
+  CG         1.0   voi_CerebGry
+  cbl_white  1.3   voi_WhlCbl outside cerebellar grey
+  brainstem  1.4   voi_WhlCblBrnStm outside the cerebellum and pons
+  Pons       1.5   voi_Pons
+
+times the reference activity (default 3.5, the cerebellar grey mean of the
+good subjects). Noise is multiplicative log-normal with mean 1, so images
+stay positive and regional means are unbiased; a scale factor reproduces
+the AD02 x50 intensity case; a shift/rotation misaligns the activity from
+the VOIs; a PSF FWHM blurs it like a scanner (before the noise).
+
+Because the unblurred phantom is piecewise constant, the SUVR each reference region
+should give is known analytically from the voxel counts of every class
+inside its VOI (expected_suvrs), independent of noise and scale.
+
+Usage:
+    python -m pet_pipeline.phantom OUT_DIR [--ad 25] [--yc 25] [--noise 0.1] \\
+        [--corrupt AD02=50] [--misalign AD04=4,0,0]
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+from scipy import ndimage
+
+from . import config, nifti
+from .extract import load_vois
+from .harmonize import convolve, sigma_voxels
+from .pvc import CLASSES, label_map
+
+LEVELS = {"background": 0.0, "rest": 1.2, "CG": 1.0, "cbl_white": 1.3, "brainstem": 1.4,
+          "Pons": 1.5}
+GROUP_SUVR = {"AD": 2.4, "YC": 1.1}
+REF_ACTIVITY = 3.5
+NOISE = 0.1             # log-normal coefficient of variation per voxel
+BRAIN_CENTER = (0.0, -18.0, 8.0)       # MNI mm
+BRAIN_RADII = (70.0, 95.0, 70.0)
+
+_GRID = {}
+
+
+def grid():
+    """(labels, affine, header) of the phantom grid (cached per process);
+    the brain is an ellipsoid, label_map(..., labels > 0) recovers it."""
+    if "labels" not in _GRID:
+        masks = load_vois()
+        missing = [n for n in ("ctx", "CG", "WC", "WCBS", "Pons") if n not in masks]
+        if missing:
+            raise FileNotFoundError("VOIs not found: %s" % ", ".join(missing))
+        header = nifti.read_header(config.voi_path("ctx"))
+        shape = masks["ctx"].shape
+        vox = np.indices(shape).reshape(3, -1)
+        world = header.affine[:3, :3] @ vox + header.affine[:3, 3:4]
+        radius = sum(((world[i] - BRAIN_CENTER[i]) / BRAIN_RADII[i]) ** 2 for i in range(3))
+
+        labels = label_map(masks, (radius <= 1.0).reshape(shape))
+        _GRID.update(labels=labels, affine=header.affine, header=header)
+    return _GRID["labels"], _GRID["affine"], _GRID["header"]
+
+
+def levels(suvr):
+    """Activity per class index (cerebellar grey = 1)."""
+    values = dict(LEVELS, ctx=suvr)
+    return np.array([values[c] for c in CLASSES], dtype=np.float32)
+
+
+def misalign_labels(labels, shift_mm=(0.0, 0.0, 0.0), rotate_deg=0.0, voxel_mm=2.0):
+    """Labels moved by a shift (mm, voxel axes) and an in-plane rotation
+    about the grid centre (nearest neighbour, so classes stay crisp)."""
+    if not any(shift_mm) and not rotate_deg:
+        return labels
+    theta = np.deg2rad(rotate_deg)
+    rot = np.array([[np.cos(theta), -np.sin(theta), 0.0],
+                    [np.sin(theta), np.cos(theta), 0.0],
+                    [0.0, 0.0, 1.0]])
+    centre = (np.array(labels.shape) - 1) / 2.0
+    shift = np.asarray(shift_mm, dtype=np.float64) / voxel_mm
+    # output voxel o samples input rot.T @ (o - centre - shift) + centre
+    offset = centre - rot.T @ (centre + shift)
+    return ndimage.affine_transform(labels, rot.T, offset=offset, order=0, mode="constant")
+
+
+def make_phantom(suvr, ref_activity=REF_ACTIVITY, noise=NOISE, scale=1.0,
+                 shift_mm=(0.0, 0.0, 0.0), rotate_deg=0.0, seed=0, fwhm=0.0):
+    """float32 phantom volume on the VOI grid."""
+    labels, _, header = grid()
+    labels = misalign_labels(labels, shift_mm, rotate_deg)
+    volume = levels(suvr)[labels] * np.float32(ref_activity * scale)
+    if fwhm:
+        volume = np.maximum(convolve(volume[None], sigma_voxels(fwhm, header.zooms))[0], 0)
+    if noise:
+        rng = np.random.default_rng(seed)
+        sigma = np.sqrt(np.log1p(noise * noise))
+        # log-normal with mean 1: exp(N(-sigma^2/2, sigma^2))
+        volume *= np.exp(rng.standard_normal(labels.shape, dtype=np.float32) * np.float32(sigma)
+                         - np.float32(sigma * sigma / 2))
+    return volume
+
+
+def region_means(suvr, regions):
+    """{region: non-zero mean of an aligned, noiseless phantom} relative to
+    the reference activity, from the class counts inside each VOI."""
+    labels, _, _ = grid()
+    level = levels(suvr).astype(np.float64)
+    means = {}
+    for name, mask in load_vois(list(regions)).items():
+        counts = np.bincount(labels[mask], minlength=len(CLASSES))
+        counts[CLASSES.index("background")] = 0       # zeros drop out of fslstats -M
+        means[name] = float(counts @ level / counts.sum())
+    return means
+
+
+def expected_suvrs(suvr, target=config.TARGET_REGION, references=config.REFERENCE_REGIONS):
+    """{reference: SUVR} an aligned phantom gives for target / reference."""
+    means = region_means(suvr, [target] + list(references))
+    return {ref: means[target] / means[ref] for ref in references if ref in means}
+
+
+def parse_overrides(items, parse):
+    out = {}
+    for item in items or []:
+        subject, _, value = item.partition("=")
+        out[subject] = parse(value)
+    return out
+
+
+def cohort_specs(n_ad=25, n_yc=25, noise=NOISE, corrupt=None, misalign=None, seed=0,
+                 spread=0.1, fwhm=0.0):
+    """Subject specs: AD01.. / YC101.. as in the GAAIN set, with SUVRs spread
+    +/- spread around the group level."""
+    rng = np.random.default_rng(seed)
+    corrupt, misalign = corrupt or {}, misalign or {}
+    subjects = ([("AD%02d" % (i + 1), "AD") for i in range(n_ad)]
+                + [("YC%d" % (101 + i), "YC") for i in range(n_yc)])
+    specs = []
+    for index, (subject, group) in enumerate(subjects):
+        suvr = GROUP_SUVR[group] * (1.0 + spread * rng.uniform(-1.0, 1.0))
+        shift = misalign.get(subject, (0.0, 0.0, 0.0))
+        specs.append({"subject": subject, "group": group, "suvr": round(float(suvr), 4),
+                      "noise": noise, "scale": corrupt.get(subject, 1.0),
+                      "shift_mm": tuple(shift[:3]),
+                      "rotate_deg": shift[3] if len(shift) > 3 else 0.0,
+                      "seed": seed * 100003 + index, "fwhm": fwhm})
+    return specs
+
+
+def pet_file(data_dir, subject, compress=False):
+    return os.path.join(data_dir, subject, "pet", "%s_%s_MNI.nii%s" % (
+        subject, config.PET_BASE, ".gz" if compress else ""))
+
+
+def write_phantom(spec, data_dir, compress=False):
+    """Write one subject's phantom in the data/<SUBJ>/pet layout; returns the path."""
+    _, affine, header = grid()
+    path = pet_file(data_dir, spec["subject"], compress)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    volume = make_phantom(spec["suvr"], noise=spec["noise"], scale=spec["scale"],
+                          shift_mm=spec["shift_mm"], rotate_deg=spec["rotate_deg"],
+                          seed=spec["seed"], fwhm=spec.get("fwhm", 0.0))
+    nifti.save(path, volume, affine, template=header)
+    return path
+
+
+TRUTH_FIELDS = ["subject", "group", "suvr", "noise", "fwhm", "scale", "shift_mm", "rotate_deg",
+                "aligned"] + ["suvr_%s" % ref for ref in config.REFERENCE_REGIONS]
+
+
+def truth_row(spec):
+    row = {k: spec[k] for k in ("subject", "group", "suvr", "noise", "fwhm", "scale",
+                                "rotate_deg")}
+    row["shift_mm"] = ",".join("%g" % s for s in spec["shift_mm"])
+    row["aligned"] = "no" if any(spec["shift_mm"]) or spec["rotate_deg"] else "yes"
+    for ref, value in expected_suvrs(spec["suvr"]).items():
+        row["suvr_%s" % ref] = "%.6f" % value
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic PET phantoms")
+    parser.add_argument("out", help="data directory to create (data/<SUBJ>/pet layout)")
+    parser.add_argument("--ad", type=int, default=25)
+    parser.add_argument("--yc", type=int, default=25)
+    parser.add_argument("--noise", type=float, default=NOISE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fwhm", type=float, default=0.0, help="PSF blur in mm (0: none)")
+    parser.add_argument("--corrupt", nargs="*", metavar="SUBJ=FACTOR",
+                        help="intensity scale corruption, e.g. AD02=50")
+    parser.add_argument("--misalign", nargs="*", metavar="SUBJ=DX,DY,DZ[,DEG]",
+                        help="shift in mm (and rotation in degrees)")
+    parser.add_argument("--gzip", action="store_true", help="write .nii.gz")
+    args = parser.parse_args()
+
+    specs = cohort_specs(args.ad, args.yc, args.noise,
+                         parse_overrides(args.corrupt, float),
+                         parse_overrides(args.misalign,
+                                         lambda v: [float(x) for x in v.split(",")]),
+                         args.seed, fwhm=args.fwhm)
+    print("=== PHANTOMS (%d subjects) → %s ===" % (len(specs), args.out))
+    for spec in specs:
+        write_phantom(spec, args.out, args.gzip)
+    truth = os.path.join(args.out, "phantom_truth.csv")
+    with open(truth, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TRUTH_FIELDS)
+        writer.writeheader()
+        writer.writerows(truth_row(spec) for spec in specs)
+    print("✓ Truth: %s" % truth)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Opt-in phase timers and profiles for the analysis and figure scripts.
+
+A script marks its phases in order::
+
+    from pet_pipeline import profiling
+    profile = profiling.start("create_aaic_figures")
+    profile.phase("load data", "loading")
+    ...
+    profile.phase("figure 1", "rendering")
+
+Each phase() call ends the previous phase. Nothing is measured unless
+profiling is enabled, with ``--profile[=MODE]`` on the script's command
+line (removed from sys.argv) or $PIPELINE_PROFILE=MODE:
+
+  timers    wall / CPU time per phase (the default mode)
+  cprofile  also a cProfile per phase: <phase>.prof (pstats, snakeviz)
+            plus collapsed stacks rebuilt from the call graph
+  sample    also a sampling profiler (every SAMPLE_INTERVAL s) recording
+            the main thread's exact stacks as collapsed stacks
+
+On exit the per-phase table is printed and written to
+logs/profile/<name>_<time>/ (or $PIPELINE_PROFILE_DIR) as phases.csv, with
+stacks.collapsed for flamegraph.pl, speedscope or inferno.
+"""
+
+import atexit
+import cProfile
+import csv
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from . import config
+
+PROFILE_ENV = "PIPELINE_PROFILE"
+MODES = ("timers", "cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+MAX_DEPTH = 64
+
+
+def _frame_name(code):
+    return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                           code.co_firstlineno)
+
+
+def _func_name(func):
+    filename, line, name = func
+    if filename == "~":             # built-ins: ('~', 0, "<method 'x' of ...>")
+        return name
+    return "%s (%s:%d)" % (name, os.path.basename(filename), line)
+
+
+def pstats_collapsed(stats, prefix):
+    """Collapsed stacks (microseconds) rebuilt from a cProfile call graph.
+
+    cProfile keeps caller -> callee edges, not whole stacks: a function's
+    time is split between its callers in proportion to the cumulative time
+    of each edge, which is exact for trees and the usual approximation
+    otherwise. Recursion is cut at the first repeated function.
+    """
+    children = {}
+    for func, (_, _, _, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            share = edge[3] / ct if ct else 0.0
+            children.setdefault(caller, []).append((func, share))
+    roots = [func for func, value in stats.items() if not value[4]]
+    out = Counter()
+
+    def walk(func, path, share):
+        if len(path) >= MAX_DEPTH or share <= 0:
+            return
+        path = path + [func]
+        self_us = int(stats[func][2] * share * 1e6)
+        if self_us:
+            out[";".join([prefix] + [_func_name(f) for f in path])] += self_us
+        for child, child_share in children.get(func, ()):
+            if child not in path:
+                walk(child, path, share * child_share)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return out
+
+
+class _Sampler(threading.Thread):
+    """Samples the main thread's stack every interval seconds."""
+
+    def __init__(self, session, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.session = session
+        self.interval = interval
+        self.target = threading.main_thread().ident
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            label = self.session.current_label()
+            if label and names:
+                # sample counts scaled to microseconds like the cProfile stacks
+                self.session.stacks[";".join([label] + names[::-1])] += int(self.interval * 1e6)
+
+
+class Session:
+    """Phase timers for one script run; a no-op unless enabled."""
+
+    def __init__(self, name, mode=None, out_dir=None):
+        self.name = name
+        self.mode = mode
+        self.enabled = mode is not None
+        self.out_dir = out_dir
+        self.rows = []
+        self.stacks = Counter()
+        self._current = None
+        self._profiler = None
+        self._sampler = None
+        self._lock = threading.Lock()
+        if self.enabled:
+            if mode == "sample":
+                self._sampler = _Sampler(self)
+                self._sampler.start()
+            atexit.register(self.finish)
+
+    def current_label(self):
+        with self._lock:
+            return self._current["label"] if self._current else None
+
+    def phase(self, name, category=""):
+        """End the running phase (if any) and start the next."""
+        if not self.enabled:
+            return
+        self._end()
+        label = "%s:%s" % (category, name) if category else name
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+        with self._lock:
+            self._current = {"phase": name, "category": category, "label": label,
+                             "wall": time.perf_counter(), "cpu": time.process_time()}
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def _end(self):
+        if self._current is None:
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+        with self._lock:
+            current, self._current = self._current, None
+        self.rows.append({"phase": current["phase"], "category": current["category"],
+                          "wall": time.perf_counter() - current["wall"],
+                          "cpu": time.process_time() - current["cpu"]})
+        if self._profiler is not None:
+            stats = pstats.Stats(self._profiler)
+            os.makedirs(self.out_dir, exist_ok=True)
+            stats.dump_stats(os.path.join(self.out_dir, "%02d_%s.prof" % (
+                len(self.rows), "".join(c if c.isalnum() else "_" for c in current["phase"]))))
+            self.stacks.update(pstats_collapsed(stats.stats, current["label"]))
+            self._profiler = None
+
+    def finish(self):
+        """Close the last phase, print the table and write the files (once)."""
+        if not self.enabled or (self._current is None and not self.rows):
+            return
+        self._end()
+        if self._sampler is not None:
+            self._sampler.stop.set()
+            self._sampler.join()
+        total = sum(r["wall"] for r in self.rows) or 1.0
+        print("\n=== PROFILE %s (%s) ===" % (self.name, self.mode))
+        print("%-36s %-10s %9s %9s %6s" % ("phase", "category", "wall s", "cpu s", "%"))
+        for r in self.rows:
+            print("%-36s %-10s %9.3f %9.3f %5.1f%%" % (
+                r["phase"][:36], r["category"], r["wall"], r["cpu"], 100 * r["wall"] / total))
+        by_category = Counter()
+        for r in self.rows:
+            by_category[r["category"] or "-"] += r["wall"]
+        print("by category: " + ", ".join("%s %.2fs" % kv for kv in by_category.most_common()))
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, "phases.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["phase", "category", "wall", "cpu"])
+            writer.writeheader()
+            writer.writerows(self.rows)
+        if self.stacks:
+            with open(os.path.join(self.out_dir, "stacks.collapsed"), "w") as f:
+                for stack, value in sorted(self.stacks.items()):
+                    f.write("%s %d\n" % (stack, value))
+        print("✓ Profile: %s" % self.out_dir)
+        self.rows = []
+
+
+def parse_mode(value):
+    if value in (None, "", "0", "off"):
+        return None
+    if value in ("1", "on", "true"):
+        return "timers"
+    if value not in MODES:
+        raise ValueError("profile mode must be one of %s" % ", ".join(MODES))
+    return value
+
+
+def start(name, argv=None):
+    """Session from --profile[=MODE] (removed from argv) or $PIPELINE_PROFILE."""
+    argv = sys.argv if argv is None else argv
+    mode = parse_mode(os.environ.get(PROFILE_ENV))
+    for arg in list(argv[1:]):
+        if arg == "--profile" or arg.startswith("--profile="):
+            mode = parse_mode(arg.partition("=")[2] or "timers")
+            argv.remove(arg)
+    out_dir = os.environ.get("PIPELINE_PROFILE_DIR") or os.path.join(
+        config.LOG_DIR, "profile", "%s_%s" % (name, time.strftime("%Y%m%d_%H%M%S")))
+    return Session(name, mode, out_dir)
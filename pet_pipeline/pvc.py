@@ -0,0 +1,261 @@
+"""
+Partial-volume correction: geometric transfer matrix (GTM) and Müller-Gärtner.
+
+The image is modelled as piecewise constant over tissue classes built from
+the GAAIN VOIs (later classes win where VOIs overlap):
+
+  background  outside the brain mask
+  rest        brain mask outside the VOIs (mostly white matter)
+  brainstem   voi_WhlCblBrnStm outside the cerebellum and pons
+  cbl_white   voi_WhlCbl outside cerebellar grey
+  CG          voi_CerebGry
+  Pons        voi_Pons
+  ctx         voi_ctx
+
+blurred by a Gaussian scanner PSF. Each class indicator is convolved with
+the PSF once (pet_pipeline.harmonize.convolve: FFT, zero-padded so nothing
+wraps around) and GTM[i, j] = mean over class i of the spread of class j; the observed class
+means t then satisfy t = GTM @ c and the corrected means are c = GTM⁻¹ t.
+The matrix, the labels and the spread images depend only on the VOI files,
+the brain mask and the PSF, so they are cached (qc/pvc/) and a subject
+costs one pass over its PET for the class means and a 7x7 solve.
+
+Corrected VOI means are the voxel-count weighted means of the corrected
+classes inside each VOI, so WC and WCBS get PVC values too. With --mg the
+voxelwise Müller-Gärtner image of the cortex is also written:
+
+  ctx_mg = (PET - sum over other classes j of c_j * spread_j) / spread_ctx
+
+on cortical voxels whose spread_ctx is at least MG_MIN.
+
+The brain mask is config.MNI_BRAIN_MASK (or --brain-mask) and is required.
+With --hull the VOIs' union, closed and hole-filled, stands in for it; that
+hull puts too little brain in the "rest" class and biases the corrected
+SUVRs upward (by about 0.1-0.25 on phantoms), so it is a last resort. The
+mask used is recorded with every row of the pvc table.
+
+Usage:
+    python -m pet_pipeline.pvc [SUBJECT ...] [--fwhm 8] [--mg] [--brain-mask MASK | --hull]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from scipy import linalg, ndimage
+
+from . import cache, config, nifti, trace
+from .extract import load_vois
+from .harmonize import convolve, sigma_voxels
+from .manifest import Manifest
+from .store import DB_PATH, ResultsStore
+
+CLASSES = ["background", "rest", "brainstem", "cbl_white", "CG", "Pons", "ctx"]
+# class -> VOI it is cut from, in the order later classes overwrite earlier ones
+CLASS_VOIS = [("brainstem", "WCBS"), ("cbl_white", "WC"), ("CG", "CG"), ("Pons", "Pons"),
+              ("ctx", "ctx")]
+PSF_FWHM = 8.0          # mm, isotropic; GAAIN PiB images are at about 8 mm
+MG_MIN = 0.25           # lowest cortical spread kept in the Müller-Gärtner image
+GTM_VERSION = 1
+CACHE_DIR = os.path.join(config.QC_DIR, "pvc")
+
+
+def label_map(masks, brain):
+    """uint8 class index per voxel (see CLASSES) from VOI masks and a brain mask."""
+    labels = np.zeros(brain.shape, dtype=np.uint8)
+    labels[brain] = CLASSES.index("rest")
+    for cls, voi in CLASS_VOIS:
+        labels[masks[voi]] = CLASSES.index(cls)
+    return labels
+
+
+def hull_brain(masks):
+    """Brain mask from the VOIs alone: their union, closed and hole-filled."""
+    union = np.zeros(next(iter(masks.values())).shape, dtype=bool)
+    for mask in masks.values():
+        union |= mask
+    closed = ndimage.binary_closing(union, iterations=3)
+    return ndimage.binary_fill_holes(ndimage.binary_fill_holes(closed) | union)
+
+
+class TransferModel:
+    """Cached GTM, class labels and spread images for one VOI set and PSF."""
+
+    def __init__(self, fwhm=PSF_FWHM, brain_mask=config.MNI_BRAIN_MASK, cache_dir=CACHE_DIR,
+                 hull=False):
+        """brain_mask must exist unless hull=True, which uses hull_brain instead
+        (self.brain_mask is then "hull")."""
+        voi_paths = [config.voi_path(voi) for _, voi in CLASS_VOIS]
+        if None in voi_paths:
+            raise FileNotFoundError("GAAIN VOIs not found in %s" % ", ".join(config.VOI_DIRS))
+        if not hull and not (brain_mask and os.path.exists(brain_mask)):
+            raise FileNotFoundError("brain mask %s not found (pass --brain-mask, or --hull to "
+                                    "use the VOI hull)" % brain_mask)
+        self.header = nifti.read_header(voi_paths[-1])
+        self.fwhm = fwhm
+        use_mask = not hull
+        self.brain_mask = brain_mask if use_mask else "hull"
+        signature = [GTM_VERSION, "%r" % (fwhm,)] + [cache.file_digest(p) for p in voi_paths]
+        signature.append(cache.file_digest(brain_mask) if use_mask else "hull")
+        key = cache.cache_key(*signature)
+        matrix_path = cache.cache_path(cache_dir, key, ".npz")
+        spread_path = cache.cache_path(cache_dir, key, "_spread.npy")
+        if os.path.exists(matrix_path) and os.path.exists(spread_path):
+            self.cached = True
+        else:
+            self.cached = False
+            self._build(brain_mask if use_mask else None, matrix_path, spread_path)
+        with np.load(matrix_path) as data:
+            self.labels = data["labels"]
+            self.gtm = data["gtm"]
+            self.voi_counts = {name: data["count_" + name] for name in config.VOI_FILES
+                               if "count_" + name in data}
+        self.spread = np.load(spread_path, mmap_mode="r")
+        self.lu = linalg.lu_factor(self.gtm)
+
+    def _build(self, brain_mask, matrix_path, spread_path):
+        masks = load_vois()
+        if brain_mask:
+            brain = nifti.load(brain_mask, orient=config.STANDARD_ORIENTATION).get_fdata() > 0
+        else:
+            brain = hull_brain(masks)
+        labels = label_map(masks, brain)
+        indicators = np.stack([labels == k for k in range(len(CLASSES))])
+        spread = convolve(indicators, sigma_voxels(self.fwhm, self.header.zooms))
+        flat_labels = labels.ravel()
+        counts = np.bincount(flat_labels, minlength=len(CLASSES)).astype(np.float64)
+        gtm = np.empty((len(CLASSES), len(CLASSES)))
+        for j in range(len(CLASSES)):
+            gtm[:, j] = np.bincount(flat_labels, spread[j].ravel(),
+                                    minlength=len(CLASSES)) / np.maximum(counts, 1)
+        voi_counts = {"count_" + name: np.bincount(labels[mask], minlength=len(CLASSES))
+                      for name, mask in masks.items()}
+        tmp = "%s.%d.tmp" % (spread_path, os.getpid())
+        with open(tmp, "wb") as f:
+            np.save(f, spread)
+        os.replace(tmp, spread_path)
+        tmp = "%s.%d.tmp" % (matrix_path, os.getpid())
+        with open(tmp, "wb") as f:
+            np.savez(f, labels=labels, gtm=gtm, **voi_counts)
+        os.replace(tmp, matrix_path)
+
+    def class_means(self, volume):
+        """Observed mean of every class (non-finite voxels count as zero)."""
+        values = np.nan_to_num(np.asarray(volume, dtype=np.float64)).ravel()
+        flat = self.labels.ravel()
+        counts = np.bincount(flat, minlength=len(CLASSES))
+        return np.bincount(flat, values, minlength=len(CLASSES)) / np.maximum(counts, 1)
+
+    def correct(self, volume):
+        """(observed, corrected) class means."""
+        observed = self.class_means(volume)
+        return observed, linalg.lu_solve(self.lu, observed)
+
+    def voi_means(self, class_values):
+        """{VOI: count-weighted mean of class values inside it}."""
+        return {name: float(counts @ class_values / counts.sum())
+                for name, counts in self.voi_counts.items() if counts.sum()}
+
+    def muller_gartner(self, volume, corrected, target="ctx", min_spread=MG_MIN):
+        """Voxelwise Müller-Gärtner image of the target class (zero elsewhere)."""
+        t = CLASSES.index(target)
+        image = np.nan_to_num(np.asarray(volume, dtype=np.float32)).copy()
+        for j in range(len(CLASSES)):
+            if j != t:
+                image -= np.float32(corrected[j]) * self.spread[j]
+        keep = (self.labels == t) & (self.spread[t] >= min_spread)
+        out = np.zeros(image.shape, dtype=np.float32)
+        out[keep] = image[keep] / self.spread[t][keep]
+        return out
+
+
+def pvc_subject(model, subject, pet_path, target=config.TARGET_REGION,
+                references=config.REFERENCE_REGIONS, mg_path=None):
+    """PVC SUVR rows for one subject; writes the Müller-Gärtner image if asked."""
+    with trace.step("pvc", subject):
+        image = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+        if image.shape[:3] != model.labels.shape:
+            raise ValueError("%s: grid %s is not the VOI grid %s" % (
+                pet_path, image.shape[:3], model.labels.shape))
+        volume = image.get_fdata()
+        observed, corrected = model.correct(volume)
+        if mg_path:
+            nifti.save(mg_path, model.muller_gartner(volume, corrected), image.affine,
+                       template=image.header)
+    before, after = model.voi_means(observed), model.voi_means(corrected)
+    rows = []
+    for ref in references:
+        if ref not in after or target not in after or after[ref] <= 0:
+            continue
+        rows.append({"reference": ref, "cortical_mean": after[target], "ref_mean": after[ref],
+                     "suvr": after[target] / after[ref],
+                     "suvr_uncorrected": before[target] / before[ref]})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GTM / Müller-Gärtner partial-volume correction")
+    parser.add_argument("subjects", nargs="*", help="default: every subject with an MNI PET")
+    parser.add_argument("--pet", help="PET file (only with a single subject)")
+    parser.add_argument("--fwhm", type=float, nargs="+", default=[PSF_FWHM],
+                        help="scanner PSF FWHM in mm (one value or x y z)")
+    parser.add_argument("--brain-mask", default=config.MNI_BRAIN_MASK)
+    parser.add_argument("--hull", action="store_true",
+                        help="no brain mask: use the VOIs' hull (biases corrected SUVRs up)")
+    parser.add_argument("--mg", action="store_true",
+                        help="also write <PET>_mg.nii.gz (Müller-Gärtner cortex image)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+    if len(args.fwhm) not in (1, 3):
+        parser.error("--fwhm takes one value or three")
+    fwhm = args.fwhm[0] if len(args.fwhm) == 1 else tuple(args.fwhm)
+
+    if args.pet:
+        if len(args.subjects) != 1:
+            parser.error("--pet needs exactly one subject")
+        jobs = [(args.subjects[0], args.pet)]
+    else:
+        manifest = Manifest.load_or_build(args.data, hash_files=False)
+        subjects = args.subjects or sorted(manifest.list(has=["pet:MNI"]))
+        jobs = [(manifest.canonical(s) or s, manifest.pet(manifest.canonical(s) or s, ["MNI"]))
+                for s in subjects]
+
+    try:
+        model = TransferModel(fwhm, args.brain_mask, args.cache_dir, args.hull)
+    except FileNotFoundError as exc:
+        print("⚠️  %s" % exc)
+        return 1
+    print("=== PARTIAL-VOLUME CORRECTION (PSF %s mm, GTM %s) ===" % (
+        "x".join("%g" % f for f in np.atleast_1d(fwhm)), "cached" if model.cached else "built"))
+    if args.hull:
+        print("⚠️  no brain mask: using the VOI hull, corrected SUVRs are biased upward")
+    else:
+        print("  brain mask: %s" % model.brain_mask)
+    with ResultsStore(args.db) as store:
+        for subject, pet_path in jobs:
+            if not pet_path or not os.path.exists(pet_path):
+                print("%-8s ⚠️  no MNI-space PET, skipping" % subject)
+                continue
+            mg_path = None
+            if args.mg:
+                base = pet_path[:-len(".gz")] if pet_path.endswith(".gz") else pet_path
+                mg_path = base[:-len(".nii")] + "_mg.nii.gz"
+            try:
+                rows = pvc_subject(model, subject, pet_path, mg_path=mg_path)
+            except ValueError as exc:
+                print("%-8s ⚠️  %s" % (subject, exc))
+                continue
+            store.put_pvc(subject, rows, fwhm, pet_path, model.brain_mask)
+            print("✓ %-8s %s" % (subject, "  ".join(
+                "%s %.3f → %.3f" % (r["reference"], r["suvr_uncorrected"], r["suvr"])
+                for r in rows)))
+            if mg_path:
+                print("  MG image: %s" % mg_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
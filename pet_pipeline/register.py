@@ -0,0 +1,334 @@
+"""
+Warm-started FLIRT registration.
+
+Every T1_to_MNI / PET_to_T1 result is recorded in the results store
+(registration table) with its cost, the input's SHA-1 and a header
+signature (dims, voxel size, datatype: in practice, the scanner protocol).
+A new registration is initialised (-init) from the best prior, in order:
+
+  cached   same subject, identical input, same reference and settings:
+           the stored matrix is reused and flirt only resamples -out
+  subject  the subject's previous matrix (input changed, e.g. new bet)
+  scanner  mean matrix of subjects whose inputs share the signature
+  cohort   mean matrix of all subjects
+  moments  rigid centre-of-mass/principal-axes alignment (pet_pipeline.moments),
+           also tried when the prior above gives a poor cost
+
+and searched over +-NARROW_SEARCH degrees instead of the full range. If the
+resulting cost is worse than the prior's (the subject's own cost, or the
+90th percentile of the pool) by more than COST_TOLERANCE, or there is no
+prior cost to compare with, the full search from identity is run as well
+and the better result is kept. When costs cannot be measured (no FSLDIR
+for the measurecost schedule) the full search result is used, as flirt
+alone would give; a race then runs every setting to completion.
+
+With --race (problem subjects), the alternative configurations in
+RACE_CONFIGS (another cost function, a wider search; never more DOF than
+requested) are started at once on idle cores instead of being retried one
+after another. Each result is measured with the requested cost function as
+it finishes, and the remaining runs are killed as soon as one is acceptable
+against the prior; otherwise the lowest cost wins. Raced results are
+recorded under "<kind>:race" with the winning setting's own cost function,
+DOF and search, so they never stand in for a normal registration.
+
+Usage (drop-in for the flirt calls in the processing scripts):
+    python -m pet_pipeline.register T1_to_MNI AD01 IN REF OMAT \\
+        [--out OUT] [--dof 12] [--search 30] [--cost corratio] [--race]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import cache, nifti, trace
+from .moments import moment_init
+from .resample import read_flirt_mat, write_flirt_mat
+from .store import DB_PATH, ResultsStore
+
+NARROW_SEARCH = 5
+COST_TOLERANCE = 0.05
+POOL_PERCENTILE = 90
+
+# Alternatives raced against the requested settings (overrides of
+# cost / dof / search), in launch order; dof is capped at the requested one
+RACE_CONFIGS = [{}, {"cost": "corratio"}, {"cost": "mutualinfo"}, {"cost": "normmi"},
+                {"search": 90}]
+RACE_KIND = "%s:race"
+POLL_INTERVAL = 0.2
+
+
+def signature(path):
+    """Header signature shared by scans from the same protocol."""
+    h = nifti.read_header(path)
+    return "%s/%s/%d" % ("x".join(str(d) for d in h.shape[:3]),
+                         "x".join("%.3g" % z for z in h.zooms[:3]), h.datatype)
+
+
+def parse_matrix(text):
+    return np.array([float(v) for v in text.split()]).reshape(4, 4)
+
+
+def mean_affine(matrices, rigid=False):
+    """Element-wise mean affine; projected back to a rotation when rigid."""
+    mean = np.mean(matrices, axis=0)
+    if rigid:
+        u, _, vt = np.linalg.svd(mean[:3, :3])
+        mean[:3, :3] = u @ vt
+    mean[3] = (0, 0, 0, 1)
+    return mean
+
+
+def warm_start(records, subject, digest, sig, ref_path, dof, cost_function):
+    """(matrix, source, reference cost) for a new registration; matrix None = no prior."""
+    for r in records:
+        if r["subject"] == subject:
+            # rows written by --race before it had its own kind are never reused
+            same = (r["input_sha1"] == digest and r["ref_file"] == ref_path
+                    and r["dof"] == dof and r["cost_function"] == cost_function
+                    and not (r["init_source"] or "").startswith("race:"))
+            return parse_matrix(r["matrix"]), "cached" if same else "subject", r["cost"]
+    pool = [r for r in records if r["signature"] == sig]
+    source = "scanner"
+    if not pool:
+        pool, source = records, "cohort"
+    if not pool:
+        return None, "identity", None
+    costs = [r["cost"] for r in pool if r["cost"] is not None]
+    ref_cost = float(np.percentile(costs, POOL_PERCENTILE)) if costs else None
+    return mean_affine([parse_matrix(r["matrix"]) for r in pool], rigid=dof <= 6), source, ref_cost
+
+
+def search_args(degrees):
+    d = "%g" % degrees
+    return ["-searchrx", "-" + d, d, "-searchry", "-" + d, d, "-searchrz", "-" + d, d]
+
+
+def flirt_command(in_path, ref_path, omat, dof, cost_function, search, init=None, extra=()):
+    cmd = ["flirt", "-in", in_path, "-ref", ref_path, "-omat", omat,
+           "-dof", str(dof), "-cost", cost_function] + search_args(search) + list(extra)
+    if init is not None:
+        cmd += ["-init", init]
+    return cmd
+
+
+def run_flirt(in_path, ref_path, omat, dof, cost_function, search, init=None, extra=()):
+    subprocess.run(flirt_command(in_path, ref_path, omat, dof, cost_function, search, init,
+                                 extra), check=True, stdout=subprocess.DEVNULL)
+    return read_flirt_mat(omat)
+
+
+def measure_cost(in_path, ref_path, mat_path, cost_function):
+    """FLIRT cost of an existing matrix (measurecost1 schedule), or None."""
+    schedule = os.path.join(os.environ.get("FSLDIR", ""), "etc", "flirtsch", "measurecost1.sch")
+    if not os.path.exists(schedule):
+        return None
+    result = subprocess.run(["flirt", "-in", in_path, "-ref", ref_path, "-init", mat_path,
+                             "-schedule", schedule, "-cost", cost_function],
+                            check=True, capture_output=True, text=True)
+    try:
+        return float(result.stdout.split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def acceptable(cost, ref_cost):
+    """Whether a warm-started result can be kept without a full search."""
+    if cost is None:
+        return False    # no FSLDIR to measure with: nothing shows the start was good
+    return ref_cost is not None and cost <= ref_cost * (1 + COST_TOLERANCE)
+
+
+def register(store, kind, subject, in_path, ref_path, omat, out=None, dof=12, search=30,
+             cost_function="corratio", extra=()):
+    """Warm-started flirt; writes omat (and out) and records the result."""
+    with trace.step("register:" + kind, subject) as info:
+        result = _register(store, kind, subject, in_path, ref_path, omat, out, dof, search,
+                           cost_function, extra)
+        info["cache"] = "hit" if result[1] == "cached" else "miss"
+    return result
+
+
+def _register(store, kind, subject, in_path, ref_path, omat, out, dof, search,
+              cost_function, extra):
+    start = time.time()
+    digest, sig = cache.file_digest(in_path), signature(in_path)
+    init, source, ref_cost = warm_start(store.registration_records(kind=kind), subject,
+                                        digest, sig, ref_path, dof, cost_function)
+    if source == "cached":
+        matrix, cost, used_search = init, ref_cost, 0
+        write_flirt_mat(omat, matrix)
+    else:
+        candidates = [(init, source)] if init is not None else []
+        try:
+            candidates.append((moment_init(in_path, ref_path)[0], "moments"))
+        except ValueError:
+            pass
+        matrix = cost = None
+        with tempfile.TemporaryDirectory() as tmp:
+            init_path, trial = os.path.join(tmp, "init.mat"), os.path.join(tmp, "trial.mat")
+            for candidate, candidate_source in candidates:
+                write_flirt_mat(init_path, candidate)
+                result = run_flirt(in_path, ref_path, trial, dof, cost_function,
+                                   NARROW_SEARCH, init_path, extra)
+                result_cost = measure_cost(in_path, ref_path, trial, cost_function)
+                if matrix is None or (result_cost is not None
+                                      and (cost is None or result_cost < cost)):
+                    matrix, cost, source = result, result_cost, candidate_source
+                if result_cost is None or acceptable(result_cost, ref_cost):
+                    break   # unmeasurable costs cannot rank the other candidates
+            used_search = NARROW_SEARCH
+            if matrix is None or not acceptable(cost, ref_cost):
+                if matrix is not None:
+                    print("⚠️  %s %s: warm start cost %s (prior %s), running full search"
+                          % (subject, kind, "%.4f" % cost if cost is not None else "unmeasured",
+                             "%.4f" % ref_cost if ref_cost is not None else "none"),
+                          file=sys.stderr)
+                full = run_flirt(in_path, ref_path, trial, dof, cost_function, search,
+                                 extra=extra)
+                full_cost = measure_cost(in_path, ref_path, trial, cost_function)
+                used_search = search
+                # without a cost to compare, the full search is what flirt alone gives
+                if matrix is None or cost is None or (full_cost is not None
+                                                      and full_cost < cost):
+                    matrix, cost, source = full, full_cost, "identity"
+        write_flirt_mat(omat, matrix)
+    if out:
+        subprocess.run(["flirt", "-in", in_path, "-ref", ref_path, "-out", out,
+                        "-applyxfm", "-init", omat], check=True)
+    elapsed = time.time() - start
+    store.put_registration(subject, kind, matrix, cost=cost, cost_function=cost_function,
+                           dof=dof, init_source=source, search=used_search, signature=sig,
+                           input_sha1=digest, input_file=in_path, ref_file=ref_path,
+                           elapsed=elapsed)
+    return matrix, source, cost, elapsed
+
+
+def race_configs(dof, search, cost_function, configs=RACE_CONFIGS):
+    """Distinct (cost, dof, search) settings: the requested one plus overrides.
+
+    A raced setting never has more DOF than requested: a 12 DOF affine
+    nearly always has the lowest cost and would win a rigid race.
+    """
+    out = []
+    for override in configs:
+        setting = (override.get("cost", cost_function), min(override.get("dof", dof), dof),
+                   max(override.get("search", search), search))
+        if setting not in out:
+            out.append(setting)
+    return out
+
+
+def race(store, kind, subject, in_path, ref_path, omat, out=None, dof=12, search=30,
+         cost_function="corratio", extra=(), workers=None):
+    """Speculative flirt: run alternative settings concurrently, keep the first acceptable."""
+    with trace.step("race:" + kind, subject):
+        return _race(store, kind, subject, in_path, ref_path, omat, out, dof, search,
+                     cost_function, extra, workers)
+
+
+def _race(store, kind, subject, in_path, ref_path, omat, out, dof, search, cost_function,
+          extra, workers):
+    start = time.time()
+    digest, sig = cache.file_digest(in_path), signature(in_path)
+    _, _, ref_cost = warm_start(store.registration_records(kind=kind), subject, digest, sig,
+                                ref_path, dof, cost_function)
+    pending = race_configs(dof, search, cost_function)
+    rank = {trial: k for k, trial in enumerate(pending)}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    matrix = cost = setting = None
+    running = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            while pending or running:
+                while pending and len(running) < workers:
+                    trial = pending.pop(0)
+                    mat = os.path.join(tmp, "%s_%d_%g.mat" % trial)
+                    proc = subprocess.Popen(flirt_command(in_path, ref_path, mat, trial[1],
+                                                          trial[0], trial[2], extra=extra),
+                                            stdout=subprocess.DEVNULL)
+                    running[proc] = (trial, mat)
+                done = [p for p in running if p.poll() is not None]
+                if not done:
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                for proc in done:
+                    trial, mat = running.pop(proc)
+                    if proc.returncode != 0:
+                        print("⚠️  %s %s: flirt %s/%d dof/%g deg failed" % ((subject, kind) + trial),
+                              file=sys.stderr)
+                        continue
+                    trial_cost = measure_cost(in_path, ref_path, mat, cost_function)
+                    # measured costs rank the runs; unmeasured ones (no FSLDIR)
+                    # all finish and the earliest setting in RACE_CONFIGS wins
+                    if (matrix is None
+                            or (trial_cost is not None and (cost is None or trial_cost < cost))
+                            or (trial_cost is None and cost is None
+                                and rank[trial] < rank[setting])):
+                        matrix, cost, setting = read_flirt_mat(mat), trial_cost, trial
+                    if acceptable(trial_cost, ref_cost):
+                        pending = []
+                        break
+                if matrix is not None and not pending and acceptable(cost, ref_cost):
+                    break
+        finally:
+            for proc in running:
+                proc.kill()
+                proc.wait()
+    if matrix is None:
+        raise RuntimeError("%s %s: every raced flirt run failed" % (subject, kind))
+    write_flirt_mat(omat, matrix)
+    if out:
+        subprocess.run(["flirt", "-in", in_path, "-ref", ref_path, "-out", out,
+                        "-applyxfm", "-init", omat], check=True)
+    elapsed = time.time() - start
+    # the row describes the run that produced the matrix, cost included
+    recorded_cost = cost
+    if setting[0] != cost_function:
+        recorded_cost = measure_cost(in_path, ref_path, omat, setting[0])
+    store.put_registration(subject, RACE_KIND % kind, matrix, cost=recorded_cost,
+                           cost_function=setting[0], dof=setting[1],
+                           init_source="race:%s/%d" % setting[:2], search=setting[2],
+                           signature=sig, input_sha1=digest, input_file=in_path,
+                           ref_file=ref_path, elapsed=elapsed)
+    return matrix, "race:%s/%d/%g" % setting, cost, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-started FLIRT registration")
+    parser.add_argument("kind", help="T1_to_MNI, PET_to_T1, ...")
+    parser.add_argument("subject")
+    parser.add_argument("in_file")
+    parser.add_argument("ref_file")
+    parser.add_argument("omat")
+    parser.add_argument("--out", help="resampled output image")
+    parser.add_argument("--dof", type=int, default=12)
+    parser.add_argument("--search", type=float, default=30,
+                        help="full search range in degrees (used without a prior)")
+    parser.add_argument("--cost", default="corratio")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--race", action="store_true",
+                        help="run alternative cost/DOF/search settings concurrently")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent runs with --race")
+    args, extra = parser.parse_known_args()
+
+    with ResultsStore(args.db) as store:
+        if args.race:
+            _, source, cost, elapsed = race(store, args.kind, args.subject, args.in_file,
+                                            args.ref_file, args.omat, args.out, args.dof,
+                                            args.search, args.cost, extra, args.workers)
+        else:
+            _, source, cost, elapsed = register(store, args.kind, args.subject, args.in_file,
+                                                args.ref_file, args.omat, args.out, args.dof,
+                                                args.search, args.cost, extra)
+    print("✓ %s %s: init=%s cost=%s (%.1fs)" % (
+        args.subject, args.kind, source, "%.4f" % cost if cost is not None else "n/a", elapsed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
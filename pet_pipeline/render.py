@@ -0,0 +1,152 @@
+"""
+Slice rendering for QC images without matplotlib.
+
+Volumes on the 2mm MNI grid are stored LAS, so slices are shown in FSL's
+radiological convention (subject's right on the left of the image, anterior
+or superior at the top). Output is encoded straight to PNG with zlib.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+# VOI overlay colours (RGB), matching the fsleyes commands in the scripts:
+# cortex in red, cerebellum in green
+OVERLAY_COLOURS = {
+    "ctx": (255, 0, 0),
+    "CG": (0, 255, 0),
+    "WC": (0, 160, 255),
+    "WCBS": (0, 160, 255),
+    "Pons": (255, 0, 255),
+}
+
+
+def hot_lut():
+    """256-entry 'hot' colour map (black-red-yellow-white) as uint8 RGB."""
+    x = np.linspace(0.0, 1.0, 256)
+    r = np.clip(x / 0.365, 0, 1)
+    g = np.clip((x - 0.365) / 0.381, 0, 1)
+    b = np.clip((x - 0.746) / 0.254, 0, 1)
+    return (np.stack([r, g, b], axis=1) * 255).round().astype(np.uint8)
+
+
+HOT = hot_lut()
+GREY = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+
+
+def robust_range(volume, lower=1.0, upper=99.5):
+    """Display window from percentiles of the non-zero, finite voxels."""
+    values = volume[np.isfinite(volume) & (volume != 0)]
+    if values.size == 0:
+        return 0.0, 1.0
+    lo, hi = np.percentile(values, [lower, upper])
+    return float(lo), float(hi if hi > lo else lo + 1.0)
+
+
+def to_uint8(image, lo, hi):
+    scaled = (np.nan_to_num(image, nan=lo) - lo) * (255.0 / (hi - lo))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def plane(volume, axis, index):
+    """2D display slice (rows top-to-bottom) along axis 0=sag, 1=cor, 2=ax."""
+    if axis == 0:
+        sl = volume[index, :, :]        # (y, z): anterior to the right
+    elif axis == 1:
+        sl = volume[:, index, :]        # (x, z)
+    else:
+        sl = volume[:, :, index]        # (x, y)
+    return np.ascontiguousarray(sl.T[::-1])
+
+
+def downsample(volume, factor):
+    """Block-average downsampling by an integer factor (edges cropped)."""
+    if factor <= 1:
+        return volume
+    shape = [s // factor * factor for s in volume.shape]
+    v = volume[:shape[0], :shape[1], :shape[2]]
+    return v.reshape(shape[0] // factor, factor, shape[1] // factor, factor,
+                     shape[2] // factor, factor).mean(axis=(1, 3, 5))
+
+
+def downsample_labels(labels, factor):
+    """Label volume on the same blocks as downsample: the most common label
+    of each block, ties going to the higher label (drawn on top)."""
+    if factor <= 1:
+        return labels
+    shape = [s // factor * factor for s in labels.shape]
+    v = labels[:shape[0], :shape[1], :shape[2]]
+    blocks = v.reshape(shape[0] // factor, factor, shape[1] // factor, factor,
+                       shape[2] // factor, factor)
+    out = np.zeros(blocks[:, 0, :, 0, :, 0].shape, dtype=labels.dtype)
+    best = np.full(out.shape, -1)
+    for label in np.unique(v):
+        count = (blocks == label).sum(axis=(1, 3, 5))
+        wins = count >= best
+        out[wins], best[wins] = label, count[wins]
+    return out
+
+
+def blend(rgb, mask, colour, alpha=0.35, outline=True):
+    """Blend a binary mask into an RGB slice; outline keeps the PET visible."""
+    if outline:
+        edge = mask.copy()
+        edge[1:-1, 1:-1] = mask[1:-1, 1:-1] & ~(
+            mask[:-2, 1:-1] & mask[2:, 1:-1] & mask[1:-1, :-2] & mask[1:-1, 2:])
+        mask, alpha = edge, max(alpha, 0.8)
+    out = rgb.astype(np.float32)
+    out[mask] = out[mask] * (1 - alpha) + np.asarray(colour, np.float32) * alpha
+    return out.astype(np.uint8)
+
+
+def triplanar(volume, masks=None, window=None, lut=HOT, centre=None, gap=2):
+    """Sagittal, coronal and axial slices side by side as one RGB array.
+
+    masks maps VOI names to boolean volumes on the same grid; each is drawn
+    as an outline in its OVERLAY_COLOURS colour.
+    """
+    masks = masks or {}
+    if window is None:
+        window = robust_range(volume)
+    if centre is None:
+        centre = [s // 2 for s in volume.shape]
+    panels = []
+    for axis in (0, 1, 2):
+        rgb = lut[to_uint8(plane(volume, axis, centre[axis]), *window)]
+        for name, mask in masks.items():
+            rgb = blend(rgb, plane(mask, axis, centre[axis]),
+                        OVERLAY_COLOURS.get(name, (255, 255, 0)))
+        panels.append(rgb)
+    height = max(p.shape[0] for p in panels)
+    width = sum(p.shape[1] for p in panels) + gap * (len(panels) - 1)
+    sheet = np.zeros((height, width, 3), dtype=np.uint8)
+    x = 0
+    for p in panels:
+        top = (height - p.shape[0]) // 2
+        sheet[top:top + p.shape[0], x:x + p.shape[1]] = p
+        x += p.shape[1] + gap
+    return sheet
+
+
+def encode_png(image, level=6):
+    """Encode a uint8 greyscale (H, W), RGB or RGBA (H, W, 3|4) array as PNG."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    colour_type = {1: 0, 3: 2, 4: 6}[channels]
+    rows = image.reshape(height, -1)
+    raw = np.hstack([np.zeros((height, 1), np.uint8), rows]).tobytes()
+
+    def chunk(tag, payload):
+        body = tag + payload
+        return struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, colour_type, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", zlib.compress(raw, level)) + chunk(b"IEND", b""))
+
+
+def write_png(path, image):
+    with open(path, "wb") as f:
+        f.write(encode_png(image))
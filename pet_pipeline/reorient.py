@@ -0,0 +1,54 @@
+"""
+Lazy reorientation to the standard (MNI, LAS) layout.
+
+Python stages read images through nifti.reorient(), a strided view with
+the axis permutation/flip folded into the affine, so nothing is rewritten
+for them. FSL binaries (bet, flirt) still need a file: this command prints
+the path they should read, which is the original image when it is already
+in standard orientation (the usual case, decided from the header alone)
+and otherwise a reoriented working copy written next to it. The original
+is never modified, moved or backed up.
+
+Usage (in place of fslreorient2std + mv):
+    T1_INPUT=$(python -m pet_pipeline.reorient "$T1_FILE")
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from . import config, nifti, trace
+
+
+def working_copy_path(path):
+    return re.sub(r"\.nii(\.gz)?$", "", path) + "_reoriented.nii.gz"
+
+
+def standard_input(path):
+    """Path of a standard-orientation version of path (itself if already so)."""
+    with trace.step("reorient") as info:
+        header = nifti.read_header(path)
+        if nifti.orientation(header.affine) == config.STANDARD_ORIENTATION:
+            info["cache"] = "hit"
+            return path
+        out = working_copy_path(path)
+        if os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(path):
+            info["cache"] = "hit"
+            return out
+        info["cache"] = "miss"
+        view = nifti.load(path, orient=config.STANDARD_ORIENTATION)
+        nifti.save(out, view.get_fdata(), view.affine, template=header)
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a standard-orientation input path")
+    parser.add_argument("image")
+    args = parser.parse_args()
+    print(standard_input(args.image))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
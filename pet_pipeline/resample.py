@@ -0,0 +1,137 @@
+"""
+Fused PET output stage: one resample of the raw PET, one write.
+
+The scripts used to rewrite a PET up to five times (fslreorient2std moved
+over the original, fslmaths -div 50 in place, flirt -applyxfm, fslmaths
+-thr, fslmaths -mul). Here the reorientation, the FLIRT PET_to_MNI matrix,
+an intensity scale factor and an optional threshold are composed into a
+single voxel mapping, the raw PET is interpolated once (trilinear, like
+flirt's default) and a single MNI-space image is written.
+
+FLIRT matrices map between "FSL scaled voxel" coordinates: voxel index
+times pixdim, with the x axis reversed when the image affine has a
+positive determinant (neurological storage). The matrix is expected to
+have been estimated on the reoriented PET (pet_pipeline.reorient or
+fslreorient2std output), as in
+complete_pipeline_with_reorient.sh; the raw file is never rewritten.
+
+Usage:
+    python -m pet_pipeline.resample RAW_PET PET_TO_MNI.mat OUT.nii.gz \\
+        [--ref MNI152_T1_2mm.nii.gz] [--scale 0.02] [--threshold 0.001]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from scipy import ndimage
+
+from . import config, nifti, trace
+
+
+def read_flirt_mat(path):
+    matrix = np.loadtxt(path)
+    if matrix.shape != (4, 4):
+        raise ValueError("%s is not a 4x4 FLIRT matrix" % path)
+    return matrix
+
+
+def write_flirt_mat(path, matrix):
+    np.savetxt(path, np.asarray(matrix).reshape(4, 4), fmt="%.10f", delimiter="  ")
+
+
+def fsl_scaled_voxels(affine, shape, zooms):
+    """4x4 matrix from voxel indices to FSL scaled-voxel (mm) coordinates."""
+    scaled = np.diag([zooms[0], zooms[1], zooms[2], 1.0])
+    if np.linalg.det(np.asarray(affine)[:3, :3]) > 0:
+        flip = np.eye(4)
+        flip[0, 0], flip[0, 3] = -1.0, shape[0] - 1
+        scaled = scaled @ flip
+    return scaled
+
+
+def reference_grid(ref_path=None):
+    """(shape, affine, zooms, header) of the output grid; 2mm MNI by default."""
+    if ref_path and os.path.exists(ref_path):
+        header = nifti.read_header(ref_path)
+        return header.shape[:3], header.affine, header.zooms[:3], header
+    affine = np.asarray(config.MNI_2MM_AFFINE, dtype=np.float64)
+    zooms = tuple(np.sqrt((affine[:3, :3] ** 2).sum(axis=0)))
+    return config.MNI_2MM_SHAPE, affine, zooms, None
+
+
+def output_to_input(image, flirt_mat, ref_affine, ref_shape, ref_zooms):
+    """4x4 matrix from output (reference) voxels to the image's voxels."""
+    src = fsl_scaled_voxels(image.affine, image.shape[:3], image.zooms[:3])
+    ref = fsl_scaled_voxels(ref_affine, ref_shape, ref_zooms)
+    return np.linalg.inv(src) @ np.linalg.inv(flirt_mat) @ ref
+
+
+def resample(volume, matrix, out_shape, padding=1.0, order=1, slab=16):
+    """Interpolate volume at matrix @ (i, j, k, 1) for every output voxel.
+
+    Points up to `padding` voxels outside the input take the edge value
+    (flirt -paddingsize); points further out are 0.
+    """
+    out = np.zeros(out_shape, dtype=np.float32)
+    limit = np.array(volume.shape[:3], dtype=np.float64) - 1
+    i, j = np.meshgrid(np.arange(out_shape[0]), np.arange(out_shape[1]), indexing="ij")
+    for z in range(0, out_shape[2], slab):
+        k = np.arange(z, min(z + slab, out_shape[2]))
+        grid = np.stack([np.broadcast_to(i[..., None], i.shape + k.shape),
+                         np.broadcast_to(j[..., None], j.shape + k.shape),
+                         np.broadcast_to(k, i.shape + k.shape)]).reshape(3, -1)
+        coords = matrix[:3, :3] @ grid + matrix[:3, 3:4]
+        inside = np.all((coords >= -padding) & (coords <= limit[:, None] + padding), axis=0)
+        values = ndimage.map_coordinates(volume, coords[:, inside], order=order,
+                                         mode="nearest", prefilter=False)
+        block = np.zeros(grid.shape[1], dtype=np.float32)
+        block[inside] = values
+        out[:, :, z:z + len(k)] = block.reshape(out_shape[0], out_shape[1], len(k))
+    return out
+
+
+def fused_output(pet_path, mat_path, out_path, ref_path=config.MNI_TEMPLATE, scale=1.0,
+                 threshold=None, reorient=True, padding=1.0):
+    """Reorient + applyxfm + scale + threshold the raw PET in one write."""
+    with trace.step("resample"):
+        return _fused_output(pet_path, mat_path, out_path, ref_path, scale, threshold,
+                             reorient, padding)
+
+
+def _fused_output(pet_path, mat_path, out_path, ref_path, scale, threshold, reorient, padding):
+    image = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION if reorient else None)
+    ref_shape, ref_affine, ref_zooms, ref_header = reference_grid(ref_path)
+    matrix = output_to_input(image, read_flirt_mat(mat_path), ref_affine, ref_shape, ref_zooms)
+    out = resample(image.get_fdata(), matrix, ref_shape, padding)
+    if scale != 1.0:
+        out *= np.float32(scale)
+    if threshold is not None:
+        out[out < threshold] = 0
+    nifti.save(out_path, out, ref_affine, template=ref_header)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused single-resample PET output")
+    parser.add_argument("pet_file", help="raw (not reoriented, not scaled) PET")
+    parser.add_argument("mat", help="FLIRT PET_to_MNI matrix (estimated on the reoriented PET)")
+    parser.add_argument("out")
+    parser.add_argument("--ref", default=config.MNI_TEMPLATE,
+                        help="reference grid (default: 2mm MNI152, built in if missing)")
+    parser.add_argument("--scale", type=float, default=1.0, help="intensity factor, e.g. 0.02")
+    parser.add_argument("--threshold", type=float, help="zero output voxels below this")
+    parser.add_argument("--no-reorient", action="store_true",
+                        help="the matrix was estimated on the raw PET")
+    parser.add_argument("--padding", type=float, default=1.0, help="flirt -paddingsize")
+    args = parser.parse_args()
+
+    fused_output(args.pet_file, args.mat, args.out, args.ref, args.scale,
+                 args.threshold, not args.no_reorient, args.padding)
+    print("✓ %s" % args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
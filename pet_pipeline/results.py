@@ -0,0 +1,56 @@
+"""
+Read access to the SUVR results tables written by the shell scripts.
+
+The scripts write results/summary_YYYYMMDD.csv (and variants such as
+all_suvr_results.csv); the most recent summary is treated as current.
+"""
+
+import csv
+import glob
+import os
+import re
+
+from . import config
+
+
+def to_float(value):
+    """Parse a bc-style number (' .87', '2.45 ') or return None."""
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def latest_summary(results_dir=config.RESULTS_DIR):
+    """Path of the newest summary_*.csv, or None."""
+    paths = sorted(glob.glob(os.path.join(results_dir, "summary_*.csv")))
+    for path in reversed(paths):
+        if os.path.getsize(path) and load_summary(path):
+            return path
+    return paths[-1] if paths else None
+
+
+def load_summary(path):
+    """Rows of a results CSV keyed by subject, with stripped string values."""
+    with open(path, newline="") as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return {}
+    # Some summaries were written with a tab after 'Subject' in the header
+    header = [h.strip() for h in re.split(r"[,\t]", lines[0])]
+    rows = {}
+    for record in csv.reader(lines[1:]):
+        if not record:
+            continue
+        row = dict(zip(header, (v.strip() for v in record)))
+        if row.get("Subject"):
+            rows[row["Subject"]] = row
+    return rows
+
+
+def subject_status(row):
+    """(SUVR, status text) for a summary row from any of the result layouts."""
+    suvr = to_float(row.get("SUVR_CG", row.get("SUVR")))
+    status = row.get("Status") or row.get("QC_Status") or ""
+    note = row.get("Note") or row.get("Notes") or ""
+    return suvr, " ".join(s for s in (status, note.rstrip("_")) if s)
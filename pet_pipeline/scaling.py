@@ -0,0 +1,240 @@
+"""
+Scaling benchmark: how extraction and reporting grow with cohort size.
+
+For each cohort size (default 50, 500, 5,000 and 10,000 subjects) three
+stages run against a fresh results store, each in its own interpreter so
+its peak RSS is its own:
+
+  extract     pet_pipeline.extract over every subject, results into the
+              store as run_complete_pipeline.sh does. Subjects are streamed:
+              their PETs come from a pool of POOL phantoms per group
+              (pet_pipeline.phantom) so disk use does not grow with the
+              cohort, and every result is checked against the phantom's
+              known SUVR.
+  statistics  group mean / SD / SEM / median / range per reference region
+              and the AD vs YC Welch t and Cohen's d, computed in one batch
+              from the store by pet_pipeline.stats (what
+              run_statistical_analysis.sh reports)
+  figure_data stats_results/figure_data.csv and group_summary.csv, streamed
+              from the store by pet_pipeline.stats (what
+              create_figure_data.sh writes)
+
+Wall time, peak RSS and bytes read/written (/proc/self/io; memory-mapped
+PET reads do not show there, store and CSV traffic does) are recorded per
+stage and size. The run fails (exit 1) when a stage grows faster than
+size ** MAX_EXPONENT between two sizes (once it takes over MIN_WALL
+seconds, so fixed start-up costs do not count), when a stage's peak RSS
+exceeds the memory budget, or when an extracted SUVR is wrong.
+
+Usage:
+    python -m pet_pipeline.scaling [--sizes 50 500 5000 10000] [--budget-mb 1024]
+"""
+
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import config, phantom, stats
+from .benchmark import TOLERANCE, _rss_mb
+from .store import ResultsStore
+from .trace import _io
+
+SIZES = [50, 500, 5000, 10000]
+STAGES = ["extract", "statistics", "figure_data"]
+POOL = 16               # distinct phantoms per group
+MAX_EXPONENT = 1.2      # allowed growth exponent between sizes
+MIN_WALL = 1.0          # seconds; below this timing noise dominates
+BUDGET_MB = 1024.0
+FIELDS = ["size", "stage", "wall", "per_subject_ms", "peak_rss_mb", "read_mb", "write_mb",
+          "exponent", "errors"]
+
+
+def write_pool(pool_dir, n=POOL, noise=phantom.NOISE, seed=0):
+    """{group: [(path, expected {reference: SUVR})]} of n phantoms per group."""
+    specs = phantom.cohort_specs(n, n, noise, seed=seed)
+    pool = {}
+    for spec in specs:
+        path = phantom.write_phantom(spec, pool_dir)
+        pool.setdefault(spec["group"], []).append((path, phantom.expected_suvrs(spec["suvr"])))
+    return pool
+
+
+def cohort(size):
+    """(subject, group, pool index) for a cohort, half AD and half YC."""
+    n_ad = size // 2
+    for i in range(size):
+        if i < n_ad:
+            yield "AD%02d" % (i + 1), "AD", i
+        else:
+            yield "YC%d" % (101 + i - n_ad), "YC", i - n_ad
+
+
+# ----------------------------------------------------------------------
+# Stages
+# ----------------------------------------------------------------------
+
+def stage_extract(size, db, pool, work_dir):
+    from .extract import extract_subject
+    errors = 0
+    with ResultsStore(db) as store:
+        for subject, group, index in cohort(size):
+            path, expected = pool[group][index % len(pool[group])]
+            rows, _ = extract_subject(subject, path, group, store=store, scale=1.0)
+            for r in rows:
+                if abs(r["suvr"] - expected[r["reference"]]) > TOLERANCE * expected[r["reference"]]:
+                    errors += 1
+    return errors
+
+
+def stage_statistics(size, db, pool, work_dir):
+    with ResultsStore(db) as store:
+        references, groups, _, suvr = stats.suvr_arrays(store)
+    results = {ref: stats.group_statistics(suvr[references == ref], groups[references == ref])
+               for ref in np.unique(references)}
+    return 0 if results else 1
+
+
+def stage_figure_data(size, db, pool, work_dir, reference="CG"):
+    with ResultsStore(db) as store:
+        sums = stats.write_figure_data(store, os.path.join(work_dir, "stats_results"), reference)
+    return 0 if sums else 1
+
+
+RUNNERS = {"extract": stage_extract, "statistics": stage_statistics,
+           "figure_data": stage_figure_data}
+
+
+def _run_stage(stage, size, db, pool, work_dir, conn):
+    read_before, written_before = _io()
+    start = time.perf_counter()
+    errors = RUNNERS[stage](size, db, pool, work_dir)
+    wall = time.perf_counter() - start
+    read_after, written_after = _io()
+    conn.send({"wall": wall, "errors": errors,
+               "peak_rss_mb": _rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+               "read_mb": (read_after - read_before) / 1e6,
+               "write_mb": (written_after - written_before) / 1e6})
+    conn.close()
+
+
+def run_stage(stage, size, db, pool, work_dir):
+    """Measurements of one stage run in a fresh interpreter."""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    proc = context.Process(target=_run_stage, args=(stage, size, db, pool, work_dir, child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = None
+    proc.join()
+    if result is None:
+        raise RuntimeError("%s stage exited with status %s" % (stage, proc.exitcode))
+    return result
+
+
+def growth_exponent(size_a, wall_a, size_b, wall_b):
+    """Exponent k of wall ~ size ** k between two measurements."""
+    if wall_a <= 0 or size_a == size_b:
+        return None
+    return math.log(wall_b / wall_a) / math.log(size_b / size_a)
+
+
+def check(rows, max_exponent=MAX_EXPONENT, budget_mb=BUDGET_MB, min_wall=MIN_WALL):
+    """Failure messages for super-linear growth, memory over budget or wrong results."""
+    failures = []
+    by_stage = {}
+    for row in rows:
+        by_stage.setdefault(row["stage"], []).append(row)
+        if row["peak_rss_mb"] > budget_mb:
+            failures.append("%s at %d subjects: peak RSS %.0f MB over the %.0f MB budget" % (
+                row["stage"], row["size"], row["peak_rss_mb"], budget_mb))
+        if row["errors"]:
+            failures.append("%s at %d subjects: %d wrong results" % (
+                row["stage"], row["size"], row["errors"]))
+    for stage, stage_rows in by_stage.items():
+        stage_rows.sort(key=lambda r: r["size"])
+        for a, b in zip(stage_rows, stage_rows[1:]):
+            b["exponent"] = growth_exponent(a["size"], a["wall"], b["size"], b["wall"])
+            if b["exponent"] is not None and b["wall"] >= min_wall and b["exponent"] > max_exponent:
+                failures.append("%s: %d → %d subjects grew as size^%.2f (limit %.2f)" % (
+                    stage, a["size"], b["size"], b["exponent"], max_exponent))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark on synthetic cohorts")
+    parser.add_argument("--sizes", nargs="*", type=int, default=SIZES)
+    parser.add_argument("--stages", nargs="*", choices=STAGES, default=STAGES)
+    parser.add_argument("--budget-mb", type=float, default=BUDGET_MB,
+                        help="peak RSS allowed for any stage")
+    parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT)
+    parser.add_argument("--pool", type=int, default=POOL, help="distinct phantoms per group")
+    parser.add_argument("--noise", type=float, default=phantom.NOISE)
+    parser.add_argument("--keep", help="work directory to keep (default: a temporary one)")
+    parser.add_argument("--out", default=os.path.join(config.RESULTS_DIR, "benchmark_scaling.csv"))
+    args = parser.parse_args()
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="pet_scaling_")
+    rows = []
+    try:
+        pool = write_pool(os.path.join(work_dir, "pool"), args.pool, args.noise)
+        print("=== SCALING BENCHMARK (sizes %s, %d phantoms per group) ===" % (
+            ", ".join(str(s) for s in args.sizes), args.pool))
+        print("%-12s %7s %9s %10s %9s %9s %9s" % (
+            "stage", "size", "wall s", "ms/subj", "peak MB", "read MB", "write MB"))
+        for size in sorted(args.sizes):
+            size_dir = os.path.join(work_dir, "n%d" % size)
+            os.makedirs(size_dir, exist_ok=True)
+            db = os.path.join(size_dir, "pipeline.db")
+            for stage in args.stages:
+                result = run_stage(stage, size, db, pool, size_dir)
+                result.update(size=size, stage=stage, exponent=None)
+                rows.append(result)
+                print("%-12s %7d %9.2f %10.3f %9.0f %9.1f %9.1f" % (
+                    stage, size, result["wall"], 1000 * result["wall"] / size,
+                    result["peak_rss_mb"], result["read_mb"], result["write_mb"]))
+            if not args.keep:
+                shutil.rmtree(size_dir, ignore_errors=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    failures = check(rows, args.max_exponent, args.budget_mb)
+    print("")
+    print("=== GROWTH (wall ~ size^k) ===")
+    for row in rows:
+        if row["exponent"] is not None:
+            print("%-12s → %6d  k = %.2f" % (row["stage"], row["size"], row["exponent"]))
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({"size": row["size"], "stage": row["stage"],
+                             "wall": "%.3f" % row["wall"],
+                             "per_subject_ms": "%.3f" % (1000 * row["wall"] / row["size"]),
+                             "peak_rss_mb": "%.1f" % row["peak_rss_mb"],
+                             "read_mb": "%.2f" % row["read_mb"],
+                             "write_mb": "%.2f" % row["write_mb"],
+                             "exponent": "" if row["exponent"] is None else "%.3f" % row["exponent"],
+                             "errors": row["errors"]})
+    print("✓ Results: %s" % args.out)
+    for failure in failures:
+        print("✗ %s" % failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Registration-quality scoring and per-subject choice of VOI alignment.
+
+Every candidate template -> PET alignment of a subject is scored:
+
+  original  identity (PET already in MNI space, GAAIN VOIs used as is)
+  <name>    each vois/MNI_to_<SUBJ>_<name>.mat (pet_pipeline.align writes
+            _aligned; earlier fixes left _improved / _final)
+
+by three measures taken on a strided grid of PET voxels:
+
+  nmi       normalized mutual information of the PET with the template
+            warped through the candidate (pet_pipeline.align.nmi)
+  dice      overlap of the warped template brain mask with the PET
+            foreground (> BRAIN_FRACTION of the PET's robust maximum)
+  cg_pons   cerebellar grey / pons mean uptake through the warped VOIs;
+            plausible inside CG_PONS_RANGE (PiB binds the pons white
+            matter non-specifically, so it reads above cerebellar grey)
+
+The sample points of all (subject, candidate) pairs in a batch are warped
+together: one interpolation of the template, brain mask and VOI labels,
+and one grouped bincount for all joint histograms, Dice counts and
+regional sums. Per subject, the plausible candidate with the highest
+(nmi - 1) * dice is selected; its ctx/CG VOIs are written onto the PET grid
+as vois/voi_<name>_<SUBJ>_selected.nii.gz and the scores go to
+results/alignment_scores.csv.
+
+Usage:
+    python -m pet_pipeline.score [SUBJECT ...] [--template T1_2mm.nii.gz]
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+
+import numpy as np
+from scipy import ndimage
+
+from . import config, nifti
+from .align import bin_positions, joint_histogram, nmi, resample_voi
+from .extract import load_vois
+from .manifest import Manifest
+from .moments import flirt_to_world
+from .resample import read_flirt_mat
+
+STRIDE = 2              # sample every STRIDE-th PET voxel along each axis
+BRAIN_FRACTION = 0.2    # foreground cut, fraction of the robust maximum
+CG_PONS_RANGE = (0.4, 1.2)
+BATCH = 32              # subjects warped together
+FIELDS = ["subject", "variant", "matrix", "nmi", "dice", "cg_pons", "plausible", "score",
+          "selected"]
+
+
+def find_variants(subject, voi_dir="vois"):
+    """{variant: FLIRT matrix path}, 'original' (identity) first with path None."""
+    variants = {"original": None}
+    prefix = "MNI_to_%s_" % subject
+    for path in sorted(glob.glob(os.path.join(voi_dir, prefix + "*.mat"))):
+        variants[os.path.basename(path)[len(prefix):-len(".mat")]] = path
+    return variants
+
+
+def pet_to_template(matrix_path, pet, template):
+    """World transform PET -> template of a template -> PET FLIRT matrix."""
+    if matrix_path is None:
+        return np.eye(4)
+    return np.linalg.inv(flirt_to_world(read_flirt_mat(matrix_path), template, pet))
+
+
+def _robust_max(values):
+    finite = values[np.isfinite(values)]
+    return float(np.percentile(finite, 99.5)) if finite.size else 1.0
+
+
+class TemplateSpace:
+    """Template intensities, brain mask and CG/Pons labels, sampled at world points."""
+
+    def __init__(self, template_path=config.MNI_TEMPLATE, brain_mask=config.MNI_BRAIN_MASK):
+        self.image = nifti.load(template_path)
+        self.data = np.nan_to_num(self.image.get_fdata())
+        self.range = (0.0, _robust_max(self.data))
+        if brain_mask and os.path.exists(brain_mask):
+            mask = nifti.load(brain_mask)
+            self.brain, self.brain_affine = mask.get_fdata() > 0, mask.affine
+        else:
+            # no FSL brain mask: head outline of the template (only compared
+            # between candidates of the same subject, so the scale is moot)
+            self.brain = ndimage.binary_fill_holes(self.data > BRAIN_FRACTION * self.range[1])
+            self.brain_affine = self.image.affine
+        masks = load_vois(["CG", "Pons"])
+        self.labels = np.zeros(next(iter(masks.values())).shape if masks else (1, 1, 1),
+                               dtype=np.float32)
+        for label, name in enumerate(("CG", "Pons"), start=1):
+            if name in masks:
+                self.labels[masks[name]] = label
+        self.labels_affine = (nifti.read_header(config.voi_path("CG")).affine
+                              if "CG" in masks else np.eye(4))
+
+    @staticmethod
+    def _sample(volume, affine, world, order):
+        vox = np.linalg.inv(affine)[:3] @ world
+        return ndimage.map_coordinates(np.asarray(volume, dtype=np.float32), vox, order=order,
+                                       mode="constant", cval=0.0, prefilter=False)
+
+    def sample(self, world):
+        """(template values, brain mask, VOI labels) at homogeneous world points (4, N)."""
+        return (self._sample(self.data, self.image.affine, world, 1),
+                self._sample(self.brain, self.brain_affine, world, 0) > 0.5,
+                np.rint(self._sample(self.labels, self.labels_affine, world, 0)).astype(np.intp))
+
+
+def score_batch(space, subjects, stride=STRIDE, threshold=config.PET_THRESHOLD):
+    """Score rows for [(subject, pet_path, variants)], all candidates warped together."""
+    rows, values, worlds, fg_cut = [], [], [], []
+    for subject, pet_path, variants in subjects:
+        pet = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+        sub = np.nan_to_num(pet.get_fdata()[::stride, ::stride, ::stride])
+        vox = np.indices(sub.shape).reshape(3, -1) * stride
+        world = np.vstack([pet.affine[:3, :3] @ vox + pet.affine[:3, 3:4],
+                           np.ones(vox.shape[1])])
+        pet_values = sub.ravel()
+        pet_max = _robust_max(pet_values)
+        for variant, path in variants.items():
+            worlds.append(pet_to_template(path, pet, space.image) @ world)
+            values.append(pet_values)
+            fg_cut.append(pet_max)
+            rows.append({"subject": subject, "variant": variant, "matrix": path or ""})
+    if not rows:
+        return rows
+
+    n = len(rows)
+    sizes = [v.size for v in values]
+    pair = np.repeat(np.arange(n), sizes)
+    pet_values = np.concatenate(values)
+    scale = np.repeat(np.asarray(fg_cut), sizes)
+    t_values, brain, labels = space.sample(np.hstack(worlds))
+
+    hist = joint_histogram(bin_positions(pet_values / scale, 0.0, 1.0),
+                           bin_positions(t_values, *space.range), groups=pair, n_groups=n)
+    nmis = nmi(hist)
+
+    foreground = pet_values > BRAIN_FRACTION * scale
+    overlap = np.bincount(pair, brain & foreground, n)
+    dice = 2 * overlap / np.maximum(np.bincount(pair, brain, n) + np.bincount(pair, foreground, n), 1)
+
+    valid = (pet_values > threshold) if threshold is not None else (pet_values != 0)
+    means = []
+    for label in (1, 2):
+        inside = valid & (labels == label)
+        count = np.bincount(pair, inside, n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means.append(np.bincount(pair, np.where(inside, pet_values, 0), n) / count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = means[0] / means[1]
+    plausible = (ratio >= CG_PONS_RANGE[0]) & (ratio <= CG_PONS_RANGE[1])
+
+    for row, m, d, r, ok in zip(rows, nmis, dice, ratio, plausible):
+        row.update(nmi=float(m), dice=float(d), cg_pons=float(r), plausible=bool(ok),
+                   score=float((m - 1) * d))
+    return rows
+
+
+def select(rows):
+    """Mark the best candidate per subject: plausible first, then highest score."""
+    best = {}
+    for row in rows:
+        key = (row["plausible"], row["score"])
+        if row["subject"] not in best or key > best[row["subject"]][0]:
+            best[row["subject"]] = (key, row)
+    for row in rows:
+        row["selected"] = best[row["subject"]][1] is row
+    return {subject: row for subject, (_, row) in best.items()}
+
+
+def write_selected_vois(row, pet_path, template, vois=("ctx", "CG"), voi_dir="vois"):
+    pet = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+    transform = pet_to_template(row["matrix"] or None, pet, template)
+    for name in vois:
+        path = config.voi_path(name)
+        if path is None:
+            continue
+        out = os.path.join(voi_dir, "voi_%s_%s_selected.nii.gz" % (name, row["subject"]))
+        nifti.save(out, resample_voi(nifti.load(path), pet, transform), pet.affine,
+                   template=pet.header)
+
+
+def format_row(row):
+    return {k: ("%.4f" % v if isinstance(v, float) else
+                ("yes" if v else "no") if isinstance(v, bool) else v)
+            for k, v in row.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score alignment candidates and pick one per subject")
+    parser.add_argument("subjects", nargs="*", help="default: every subject with an MNI PET")
+    parser.add_argument("--template", default=config.MNI_TEMPLATE)
+    parser.add_argument("--brain-mask", default=config.MNI_BRAIN_MASK)
+    parser.add_argument("--vois", nargs="*", default=["ctx", "CG"],
+                        help="VOIs to write for the selected alignment")
+    parser.add_argument("--voi-dir", default="vois")
+    parser.add_argument("--stride", type=int, default=STRIDE)
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--out", default=os.path.join(config.RESULTS_DIR, "alignment_scores.csv"))
+    args = parser.parse_args()
+
+    manifest = Manifest.load_or_build(args.data, hash_files=False)
+    subjects = args.subjects or sorted(manifest.list(has=["pet:MNI"]))
+    jobs = []
+    for subject in subjects:
+        subject = manifest.canonical(subject) or subject
+        pet = manifest.pet(subject, ["MNI"])
+        if not pet:
+            print("%-8s ⚠️  no MNI-space PET, skipping" % subject)
+            continue
+        jobs.append((subject, pet, find_variants(subject, args.voi_dir)))
+
+    print("=== ALIGNMENT SCORING (%d subjects, %d candidates) ===" % (
+        len(jobs), sum(len(v) for _, _, v in jobs)))
+    space = TemplateSpace(args.template, args.brain_mask)
+    pets = {subject: pet for subject, pet, _ in jobs}
+    rows = []
+    for start in range(0, len(jobs), args.batch):
+        rows.extend(score_batch(space, jobs[start:start + args.batch], args.stride))
+    chosen = select(rows)
+
+    os.makedirs(args.voi_dir, exist_ok=True)
+    for subject, row in chosen.items():
+        write_selected_vois(row, pets[subject], space.image, args.vois, args.voi_dir)
+        mark = "✓" if row["plausible"] else "⚠️ "
+        note = "" if row["plausible"] else "  (no candidate has a plausible CG/Pons ratio)"
+        print("%s %-8s %-10s NMI %.4f  Dice %.3f  CG/Pons %.2f%s" % (
+            mark, subject, row["variant"], row["nmi"], row["dice"], row["cg_pons"], note))
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(format_row(r) for r in rows)
+    print("✓ Scores: %s" % args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
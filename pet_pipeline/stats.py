@@ -0,0 +1,158 @@
+"""
+Group statistics and figure data from the results store.
+
+Reads the suvr table of results/pipeline.db (written by
+pet_pipeline.extract) for one reference region, CG by default; these are
+the statistics and figure_data stages the scaling benchmark times:
+
+  report       per-group mean ± SD (sample SD), range, SEM and median, and
+               the AD vs YC Welch t with its Welch-Satterthwaite df and
+               Cohen's d; the subject table is written to <out>/suvr_data.csv
+  figure-data  <out>/figure_data.csv (one row per subject) and
+               <out>/group_summary.csv (mean, SD, SEM, n), streamed from the
+               store in one pass
+
+Every subject in the store is included. run_statistical_analysis.sh and
+create_figure_data.sh still report the abstract's curated subset (population
+SD, pooled t) and do not call this module.
+
+Usage:
+    python -m pet_pipeline.stats report [--reference CG] [--out stats_results]
+    python -m pet_pipeline.stats figure-data [--reference CG] [--out stats_results]
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+
+import numpy as np
+
+from .store import DB_PATH, ResultsStore
+
+REFERENCE = "CG"
+OUT_DIR = "stats_results"
+
+
+def suvr_arrays(store, reference=None):
+    """(references, groups, subjects, suvr) arrays of the suvr table."""
+    query, params = "SELECT reference, grp, subject, suvr FROM suvr", ()
+    if reference:
+        query, params = query + " WHERE reference = ?", (reference,)
+    rows = store.conn.execute(query + " ORDER BY grp, subject", params).fetchall()
+    return (np.array([r[0] for r in rows]), np.array([r[1] for r in rows]),
+            np.array([r[2] for r in rows]),
+            np.array([r[3] if r[3] is not None else np.nan for r in rows], dtype=np.float64))
+
+
+def group_statistics(suvr, groups):
+    """Per-group descriptives and the AD vs YC Welch t (with its
+    Welch-Satterthwaite df) and Cohen's d of one reference region, from
+    parallel arrays."""
+    out = {}
+    for group in sorted(set(groups.tolist())):
+        values = suvr[groups == group]
+        values = values[np.isfinite(values)]
+        n = values.size
+        sd = float(values.std(ddof=1)) if n > 1 else 0.0
+        out[group] = {"n": n, "mean": float(values.mean()) if n else float("nan"), "sd": sd,
+                      "sem": sd / math.sqrt(n) if n else float("nan"),
+                      "median": float(np.median(values)) if n else float("nan"),
+                      "min": float(values.min()) if n else float("nan"),
+                      "max": float(values.max()) if n else float("nan")}
+    if "AD" in out and "YC" in out and out["AD"]["n"] > 1 and out["YC"]["n"] > 1:
+        a, b = out["AD"], out["YC"]
+        va, vb = a["sd"] ** 2 / a["n"], b["sd"] ** 2 / b["n"]
+        pooled = math.sqrt(((a["n"] - 1) * a["sd"] ** 2 + (b["n"] - 1) * b["sd"] ** 2)
+                           / (a["n"] + b["n"] - 2))
+        difference = a["mean"] - b["mean"]
+        df = ((va + vb) ** 2 / (va * va / (a["n"] - 1) + vb * vb / (b["n"] - 1))
+              if va + vb else float("nan"))
+        out["comparison"] = {"t": difference / math.sqrt(va + vb) if va + vb else float("inf"),
+                             "df": df,
+                             "cohen_d": difference / pooled if pooled else float("inf")}
+    return out
+
+
+def write_figure_data(store, out_dir=OUT_DIR, reference=REFERENCE):
+    """figure_data.csv and group_summary.csv; returns {group: (n, sum, sum of squares)}."""
+    os.makedirs(out_dir, exist_ok=True)
+    sums = {}
+    with open(os.path.join(out_dir, "figure_data.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Group", "Subject", "SUVR"])
+        cursor = store.conn.execute("SELECT grp, subject, suvr FROM suvr WHERE reference = ?"
+                                    " AND suvr IS NOT NULL ORDER BY grp, subject", (reference,))
+        for group, subject, suvr in cursor:
+            writer.writerow([group, subject, "%.3f" % suvr])
+            n, total, squares = sums.get(group, (0, 0.0, 0.0))
+            sums[group] = (n + 1, total + suvr, squares + suvr * suvr)
+    with open(os.path.join(out_dir, "group_summary.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Group", "Mean", "SD", "SEM", "n"])
+        for group, (n, total, squares) in sorted(sums.items()):
+            mean = total / n
+            sd = math.sqrt(max(squares - n * mean * mean, 0.0) / (n - 1)) if n > 1 else 0.0
+            writer.writerow([group, "%.3f" % mean, "%.3f" % sd, "%.3f" % (sd / math.sqrt(n)), n])
+    return sums
+
+
+def report(store, out_dir=OUT_DIR, reference=REFERENCE):
+    """Print the group statistics and write suvr_data.csv; returns them."""
+    _, groups, subjects, suvr = suvr_arrays(store, reference)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "suvr_data.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Subject", "Group", "SUVR"])
+        for subject, group, value in zip(subjects, groups, suvr):
+            writer.writerow([subject, group, "%.3f" % value])
+    print("Data saved: %s" % path)
+    stats = group_statistics(suvr, groups)
+    print("")
+    print("=== GROUP STATISTICS (%s reference) ===" % reference)
+    for group, s in stats.items():
+        if group == "comparison":
+            continue
+        print("")
+        print("%s (n=%d):" % (group, s["n"]))
+        print("  Mean ± SD: %.3f ± %.3f" % (s["mean"], s["sd"]))
+        print("  Range: %.3f - %.3f" % (s["min"], s["max"]))
+        print("  SEM: %.3f" % s["sem"])
+        print("  Median: %.3f" % s["median"])
+    if "comparison" in stats:
+        a, b = stats["AD"], stats["YC"]
+        print("")
+        print("=== GROUP COMPARISON ===")
+        print("  Welch t(%.1f) = %.3f" % (stats["comparison"]["df"], stats["comparison"]["t"]))
+        print("  Cohen's d = %.3f" % stats["comparison"]["cohen_d"])
+        print("  SUVR difference: %.3f" % (a["mean"] - b["mean"]))
+        print("  Percent increase: %.1f%%" % (100 * (a["mean"] - b["mean"]) / b["mean"]))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group statistics and figure data")
+    parser.add_argument("command", choices=["report", "figure-data"])
+    parser.add_argument("--reference", default=REFERENCE)
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "report":
+            stats = report(store, args.out, args.reference)
+        else:
+            stats = write_figure_data(store, args.out, args.reference)
+            print("Figure data created:")
+            print("1. Individual points: %s" % os.path.join(args.out, "figure_data.csv"))
+            print("2. Group summary: %s" % os.path.join(args.out, "group_summary.csv"))
+    if not stats:
+        print("⚠️  no %s SUVRs in %s" % (args.reference, args.db))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
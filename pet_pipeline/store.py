@@ -0,0 +1,341 @@
+"""
+SQLite results store (results/pipeline.db).
+
+Holds the structured outputs of the native stages so QC and reporting tools
+can query them instead of parsing per-subject text files. The CSV summaries
+written by the shell scripts are unchanged; this sits alongside them.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+
+from . import config
+
+DB_PATH = os.path.join(config.RESULTS_DIR, "pipeline.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suvr (
+    subject TEXT NOT NULL,
+    grp TEXT,
+    reference TEXT NOT NULL,
+    cortical_mean REAL,
+    ref_mean REAL,
+    suvr REAL,
+    qc_status TEXT,
+    pet_file TEXT,
+    created REAL,
+    threshold REAL,
+    PRIMARY KEY (subject, reference)
+);
+CREATE TABLE IF NOT EXISTS qc_stats (
+    subject TEXT NOT NULL,
+    region TEXT NOT NULL,
+    n_voxels INTEGER,
+    nonzero INTEGER,
+    nan_count INTEGER,
+    min REAL,
+    max REAL,
+    mean REAL,
+    sd REAL,
+    skewness REAL,
+    kurtosis REAL,
+    mean_nonzero REAL,
+    pet_file TEXT,
+    created REAL,
+    threshold REAL,
+    PRIMARY KEY (subject, region)
+);
+CREATE TABLE IF NOT EXISTS intensity_scale (
+    subject TEXT PRIMARY KEY,
+    factor REAL NOT NULL,
+    ref_region TEXT,
+    ref_mean REAL,
+    target REAL,
+    pet_file TEXT,
+    created REAL
+);
+CREATE TABLE IF NOT EXISTS registration (
+    subject TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    matrix TEXT NOT NULL,
+    cost REAL,
+    cost_function TEXT,
+    dof INTEGER,
+    init_source TEXT,
+    search REAL,
+    signature TEXT,
+    input_sha1 TEXT,
+    input_file TEXT,
+    ref_file TEXT,
+    elapsed REAL,
+    created REAL,
+    PRIMARY KEY (subject, kind)
+);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    subject TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempt INTEGER,
+    inputs TEXT,
+    outputs TEXT,
+    stdout TEXT,
+    message TEXT,
+    host TEXT,
+    pid INTEGER,
+    elapsed REAL,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS journal_subject ON journal (subject, stage);
+CREATE TABLE IF NOT EXISTS pvc (
+    subject TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    cortical_mean REAL,
+    ref_mean REAL,
+    suvr REAL,
+    suvr_uncorrected REAL,
+    fwhm TEXT,
+    pet_file TEXT,
+    created REAL,
+    PRIMARY KEY (subject, reference)
+);
+CREATE TABLE IF NOT EXISTS dvr (
+    subject TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    region TEXT NOT NULL,
+    dvr REAL,
+    intercept REAL,
+    t_star REAL,
+    frames INTEGER,
+    dvr_map TEXT,
+    pet_file TEXT,
+    created REAL,
+    PRIMARY KEY (subject, reference, region)
+);
+"""
+
+# Columns added after the first release: table -> [(column, type)]
+MIGRATIONS = {
+    "suvr": [("threshold", "REAL"), ("smoothing", "TEXT")],
+    "qc_stats": [("threshold", "REAL"), ("smoothing", "TEXT")],
+    "intensity_scale": [("above", "REAL")],
+    "pvc": [("brain_mask", "TEXT")],
+}
+
+QC_FIELDS = ["n_voxels", "nonzero", "nan_count", "min", "max", "mean", "sd",
+             "skewness", "kurtosis", "mean_nonzero"]
+
+
+def _fwhm_text(fwhm):
+    """'x y z' text of a smoothing FWHM (mm, one value or x y z), None when not
+    smoothed."""
+    if isinstance(fwhm, (int, float)):
+        fwhm = (fwhm,) * 3
+    if fwhm is None or not any(fwhm):
+        return None
+    return " ".join("%.3g" % v for v in fwhm)
+
+
+class ResultsStore:
+    """Thin wrapper around the results database; one row per subject/key."""
+
+    def __init__(self, path=DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns missing from databases created by older versions.
+
+        The columns are checked and added under the write lock, so workers
+        opening the same database at once do not add a column twice.
+        """
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for table, columns in MIGRATIONS.items():
+                existing = {r["name"] for r in self.conn.execute("PRAGMA table_info(%s)" % table)}
+                for name, kind in columns:
+                    if name not in existing:
+                        self.conn.execute("ALTER TABLE %s ADD COLUMN %s %s" % (table, name, kind))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put_suvr(self, subject, group, rows, pet_file=None, threshold=None, smoothing=None):
+        """rows: iterable of dicts with reference/cortical_mean/ref_mean/suvr/qc_status."""
+        now = time.time()
+        smoothing = _fwhm_text(smoothing)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO suvr (subject, grp, reference, cortical_mean, ref_mean,"
+                " suvr, qc_status, pet_file, created, threshold, smoothing)"
+                " VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                [(subject, group, r["reference"], r["cortical_mean"], r["ref_mean"],
+                  r["suvr"], r["qc_status"], pet_file, now, threshold, smoothing) for r in rows])
+
+    def put_qc_stats(self, subject, stats, pet_file=None, threshold=None, smoothing=None):
+        """stats: {region: {field: value}} as produced by extract.RegionMoments."""
+        now = time.time()
+        smoothing = _fwhm_text(smoothing)
+        columns = ["subject", "region"] + QC_FIELDS + ["pet_file", "created", "threshold",
+                                                       "smoothing"]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO qc_stats (%s) VALUES (%s)" % (
+                    ", ".join(columns), ",".join("?" * len(columns))),
+                [(subject, region, *[s.get(k) for k in QC_FIELDS], pet_file, now, threshold,
+                  smoothing)
+                 for region, s in stats.items()])
+
+    def put_scale(self, subject, factor, ref_region=None, ref_mean=None, target=None,
+                  pet_file=None, above=None):
+        """Record a lazy intensity scale factor (applied at read time).
+
+        above is the reference mean cutoff of the rule that produced it.
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO intensity_scale (subject, factor, ref_region, ref_mean,"
+                " target, pet_file, created, above) VALUES (?,?,?,?,?,?,?,?)",
+                (subject, factor, ref_region, ref_mean, target, pet_file, time.time(), above))
+
+    def get_scale(self, subject):
+        """Scale factor for a subject's PET, 1.0 when none is recorded."""
+        row = self.conn.execute("SELECT factor FROM intensity_scale WHERE subject = ?",
+                                (subject,)).fetchone()
+        return row["factor"] if row else 1.0
+
+    def clear_scale(self, subject, ref_region=None, above=None):
+        """Drop the subject's factor; with ref_region/above, only one recorded
+        by that same rule (a factor from another cutoff is left alone)."""
+        query, params = "DELETE FROM intensity_scale WHERE subject = ?", [subject]
+        if ref_region is not None:
+            query += " AND ref_region = ?"
+            params.append(ref_region)
+        if above is not None:
+            query += " AND above = ?"
+            params.append(above)
+        with self.conn:
+            self.conn.execute(query, params)
+
+    def put_pvc(self, subject, rows, fwhm, pet_file=None, brain_mask=None):
+        """rows: partial-volume corrected SUVRs as produced by pet_pipeline.pvc;
+        brain_mask is the mask path of the model, or "hull"."""
+        now = time.time()
+        fwhm = _fwhm_text(fwhm)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pvc (subject, reference, cortical_mean, ref_mean, suvr,"
+                " suvr_uncorrected, fwhm, pet_file, created, brain_mask)"
+                " VALUES (?,?,?,?,?,?,?,?,?,?)",
+                [(subject, r["reference"], r["cortical_mean"], r["ref_mean"], r["suvr"],
+                  r["suvr_uncorrected"], fwhm, pet_file, now, brain_mask) for r in rows])
+
+    def put_dvr(self, subject, reference, rows, t_star, dvr_map=None, pet_file=None):
+        """rows: regional Logan DVRs as produced by pet_pipeline.logan."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dvr VALUES (?,?,?,?,?,?,?,?,?,?)",
+                [(subject, reference, r["region"], r["dvr"], r["intercept"], t_star,
+                  r["frames"], dvr_map, pet_file, now) for r in rows])
+
+    def put_registration(self, subject, kind, matrix, **fields):
+        """Record a registration result (matrix: 4x4 FLIRT matrix)."""
+        row = dict(fields, subject=subject, kind=kind, created=time.time(),
+                   matrix=" ".join("%.10g" % v for v in matrix.ravel()))
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO registration (%s) VALUES (%s)" % (
+                ", ".join(row), ",".join("?" * len(row))), list(row.values()))
+
+    def append_journal(self, subject, stage, status, **fields):
+        """Append a journal event (the table is never updated in place)."""
+        row = dict(fields, subject=subject, stage=stage, status=status, created=time.time())
+        with self.conn:
+            self.conn.execute("INSERT INTO journal (%s) VALUES (%s)" % (
+                ", ".join(row), ",".join("?" * len(row))), list(row.values()))
+
+    def journal_records(self, subject=None, stage=None):
+        """Journal events in the order they were written."""
+        clauses = [(k, v) for k, v in (("subject", subject), ("stage", stage)) if v is not None]
+        sql = "SELECT * FROM journal"
+        if clauses:
+            sql += " WHERE " + " AND ".join("%s = ?" % k for k, _ in clauses)
+        return [dict(r) for r in self.conn.execute(sql + " ORDER BY id",
+                                                   [v for _, v in clauses])]
+
+    def _select(self, table, **filters):
+        clauses = [(k, v) for k, v in filters.items() if v is not None]
+        sql = "SELECT * FROM %s" % table
+        if clauses:
+            sql += " WHERE " + " AND ".join("%s = ?" % k for k, _ in clauses)
+        sql += " ORDER BY subject"
+        return [dict(r) for r in self.conn.execute(sql, [v for _, v in clauses])]
+
+    def suvr_records(self, subject=None, reference=None):
+        return self._select("suvr", subject=subject, reference=reference)
+
+    def qc_records(self, subject=None, region=None):
+        return self._select("qc_stats", subject=subject, region=region)
+
+    def scale_records(self, subject=None):
+        return self._select("intensity_scale", subject=subject)
+
+    def registration_records(self, subject=None, kind=None):
+        return self._select("registration", subject=subject, kind=kind)
+
+    def pvc_records(self, subject=None, reference=None):
+        return self._select("pvc", subject=subject, reference=reference)
+
+    def dvr_records(self, subject=None, reference=None):
+        return self._select("dvr", subject=subject, reference=reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the results database")
+    parser.add_argument("table", choices=["suvr", "qc", "scale", "registration", "journal",
+                                          "pvc", "dvr"])
+    parser.add_argument("--subject")
+    parser.add_argument("--region", help="VOI name (qc) or reference region (suvr, pvc, dvr)")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.table == "qc":
+            rows = store.qc_records(args.subject, args.region)
+        elif args.table == "scale":
+            rows = store.scale_records(args.subject)
+        elif args.table == "registration":
+            rows = store.registration_records(args.subject)
+        elif args.table == "journal":
+            rows = store.journal_records(args.subject)
+        elif args.table == "pvc":
+            rows = store.pvc_records(args.subject, args.region)
+        elif args.table == "dvr":
+            rows = store.dvr_records(args.subject, args.region)
+        else:
+            rows = store.suvr_records(args.subject, args.region)
+    if rows:
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
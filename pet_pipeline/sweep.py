@@ -0,0 +1,133 @@
+"""
+Threshold sensitivity of regional SUVR.
+
+One read of each MNI-space PET keeps every VOI's voxel values sorted with
+prefix sums (extract.SortedValues), after which the fslstats-style non-zero
+mean above any intensity threshold, and hence the SUVR, is a binary search.
+The whole curve for a subject costs one pass over the image, not one
+fslmaths -thr / fslstats run per threshold.
+
+Thresholds are in image units, before any lazy intensity scale (the same
+convention as extract.py --threshold). The extraction threshold
+(config.PET_THRESHOLD, 0 when disabled) is always swept: it is the
+baseline each curve's change is reported against.
+
+Usage:
+    python -m pet_pipeline.sweep [SUBJECT ...] [--thresholds 0:0.5:0.005]
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from . import config, nifti
+from .extract import load_vois, regional_stats
+from .manifest import Manifest
+
+FIELDS = ["subject", "group", "threshold", "reference", "cortical_mean", "ref_mean", "suvr"]
+DEFAULT_THRESHOLDS = "0:0.5:0.005"
+
+
+def parse_thresholds(text):
+    """'a:b:step' ranges and/or single values, comma separated."""
+    values = []
+    for part in text.split(","):
+        if ":" in part:
+            start, stop, step = (float(x) for x in part.split(":"))
+            values.extend(np.arange(start, stop + step / 2, step))
+        else:
+            values.append(float(part))
+    values.append(baseline_threshold())
+    return np.unique(np.round(values, 9))
+
+
+def baseline_threshold():
+    """The extraction threshold, 0.0 when thresholding is disabled."""
+    return config.PET_THRESHOLD if config.PET_THRESHOLD is not None else 0.0
+
+
+def sweep_image(pet_path, thresholds, target=config.TARGET_REGION,
+                references=config.REFERENCE_REGIONS):
+    """{reference: (cortical_means, ref_means, suvrs)} arrays over thresholds."""
+    image = nifti.load(pet_path, orient=config.STANDARD_ORIENTATION)
+    masks = {k: m for k, m in load_vois([target] + list(references)).items()
+             if m.shape == image.shape[:3]}
+    if target not in masks:
+        return {}
+    volume = image.get_fdata() if image.header.scaled else image.dataobj
+    _, values = regional_stats(volume, masks, keep_values=True)
+    cortical = values[target].mean_above(thresholds)
+    curves = {}
+    for ref in references:
+        if ref not in values:
+            continue
+        ref_mean = values[ref].mean_above(thresholds)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            suvr = np.where(ref_mean > 0, cortical / ref_mean, np.nan)
+        curves[ref] = (cortical, ref_mean, suvr)
+    return curves
+
+
+def curve_rows(subject, group, thresholds, curves):
+    rows = []
+    for ref, (cortical, ref_mean, suvr) in curves.items():
+        for t, c, r, s in zip(thresholds, cortical, ref_mean, suvr):
+            rows.append({"subject": subject, "group": group, "threshold": "%g" % t,
+                         "reference": ref, "cortical_mean": "%.6f" % c,
+                         "ref_mean": "%.6f" % r, "suvr": "%.6f" % s})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SUVR threshold-sensitivity curves")
+    parser.add_argument("subjects", nargs="*", help="default: every subject with a PET")
+    parser.add_argument("--group", help="restrict to one group (AD/YC)")
+    parser.add_argument("--thresholds", type=parse_thresholds,
+                        default=parse_thresholds(DEFAULT_THRESHOLDS),
+                        help="'start:stop:step' and/or values, comma separated")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--out", default=os.path.join(config.RESULTS_DIR, "threshold_sweep.csv"))
+    args = parser.parse_args()
+
+    manifest = Manifest.load_or_build(args.data, hash_files=False)
+    subjects = args.subjects or sorted(manifest.list(args.group))
+    thresholds = args.thresholds
+    base = np.flatnonzero(thresholds == round(baseline_threshold(), 9))
+    if not base.size:
+        print("⚠️  baseline threshold %g is not among the thresholds" % baseline_threshold())
+        return 1
+    base = int(base[0])
+
+    print("=== SUVR THRESHOLD SWEEP ===")
+    print("%d thresholds from %g to %g" % (len(thresholds), thresholds[0], thresholds[-1]))
+    rows = []
+    for subject in subjects:
+        subject = manifest.canonical(subject) or subject
+        pet_path = manifest.pet(subject)
+        if not pet_path:
+            print("%-8s ⚠️  no MNI-space PET, skipping" % subject)
+            continue
+        group = manifest.subjects[subject]["group"]
+        curves = sweep_image(pet_path, thresholds)
+        rows.extend(curve_rows(subject, group, thresholds, curves))
+        for ref, (_, _, suvr) in curves.items():
+            at_base = suvr[base]
+            spread = np.nanmax(np.abs(suvr - at_base)) / at_base * 100 if at_base else np.nan
+            print("%-8s %-4s SUVR %.4f at %g, range %.4f-%.4f (max change %.2f%%)" % (
+                subject, ref, at_base, thresholds[base], np.nanmin(suvr),
+                np.nanmax(suvr), spread))
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print("✓ Curves: %s" % args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Per-step timing and resource records (JSON lines) and their report.
+
+Every step appends one line to the trace file with its run, subject,
+stage, start, wall and CPU seconds, peak RSS, bytes read/written, exit
+status and (where the step has a cache) hit/miss:
+
+  external  ``python -m pet_pipeline.trace run --stage flirt -- flirt ...``;
+            scripts/trace_fsl.sh routes every bet/flirt/convert_xfm/
+            fslmaths/fslstats/fslreorient2std call through it. Resources
+            are the child's own (wait4 rusage, /proc/<pid>/io).
+  native    ``with trace.step("extract", subject) as info:`` around the
+            Python engine steps; recorded only when $PIPELINE_TRACE is set.
+            Peak RSS is the process peak so far.
+
+The trace file is $PIPELINE_TRACE (default logs/trace.jsonl), the run
+tag is $PIPELINE_RUN_ID and steps that are not given a subject take
+$PIPELINE_SUBJECT. Each record is written with one O_APPEND write,
+so concurrent processes and hosts can share a file.
+
+``report`` aggregates per-stage percentiles and the critical path of each
+run: the subject whose last step finished last, with its steps in order
+and their share of that subject's time.
+
+This module avoids numpy so the per-call FSL shim starts quickly.
+
+Usage:
+    python -m pet_pipeline.trace run --stage fslstats --subject AD01 -- fslstats IMG -M
+    python -m pet_pipeline.trace report [TRACE.jsonl] [--run RUN]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from . import config
+
+TRACE_ENV = "PIPELINE_TRACE"
+DEFAULT_TRACE = os.path.join(config.LOG_DIR, "trace.jsonl")
+PERCENTILES = (50, 90, 99)
+
+
+def trace_path():
+    return os.environ.get(TRACE_ENV) or DEFAULT_TRACE
+
+
+def write_record(record, path=None):
+    """Append one JSON line (a single write, safe with concurrent writers)."""
+    path = path or trace_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = (json.dumps(record, sort_keys=True) + "\n").encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _io(pid="self"):
+    """(bytes read, bytes written) from /proc/<pid>/io, zeros if unavailable."""
+    try:
+        with open("/proc/%s/io" % pid) as f:
+            fields = dict(line.split(":") for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _rss_mb(maxrss):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+
+
+def base_record(stage, subject=None, kind="native"):
+    subject = subject or os.environ.get("PIPELINE_SUBJECT")
+    return {"run": os.environ.get("PIPELINE_RUN_ID"), "subject": subject or None,
+            "stage": stage, "kind": kind, "host": socket.gethostname(), "pid": os.getpid(),
+            "start": time.time()}
+
+
+def run_command(command, stage, subject=None, cache=None, path=None):
+    """Run an external command, record its resources; returns its exit status."""
+    record = base_record(stage, subject, "external")
+    record["command"] = os.path.basename(command[0])
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(command)
+    except OSError as exc:
+        print("%s: %s" % (command[0], exc), file=sys.stderr)
+        record.update(wall=time.perf_counter() - start, status=127, cache=cache)
+        write_record(record, path)
+        return 127
+    read_bytes = written = 0
+    try:
+        # wait without reaping so the exited child's /proc/<pid>/io is still readable
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        read_bytes, written = _io(proc.pid)
+    except (AttributeError, ChildProcessError, OSError):
+        pass
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    record.update(wall=time.perf_counter() - start, cpu=usage.ru_utime + usage.ru_stime,
+                  rss_mb=_rss_mb(usage.ru_maxrss), read_bytes=read_bytes,
+                  write_bytes=written, status=proc.returncode, cache=cache)
+    write_record(record, path)
+    return proc.returncode
+
+
+@contextlib.contextmanager
+def step(stage, subject=None):
+    """Record a native step when $PIPELINE_TRACE is set; yields a dict for extra
+    fields (e.g. info["cache"] = "hit")."""
+    info = {}
+    if not os.environ.get(TRACE_ENV):
+        yield info
+        return
+    record = base_record(stage, subject)
+    start, cpu = time.perf_counter(), time.process_time()
+    read_before, written_before = _io()
+    status = 0
+    try:
+        yield info
+    except BaseException:
+        status = 1
+        raise
+    finally:
+        read_after, written_after = _io()
+        record.update(wall=time.perf_counter() - start, cpu=time.process_time() - cpu,
+                      rss_mb=_rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+                      read_bytes=read_after - read_before,
+                      write_bytes=written_after - written_before, status=status,
+                      cache=None)
+        record.update(info)
+        write_record(record)
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+
+def load_records(path, run=None):
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue    # a line cut short by a crash
+            if run is None or r.get("run") == run:
+                records.append(r)
+    return records
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a non-empty list."""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def stage_summary(records):
+    """Per-stage counts, wall-time percentiles, CPU, RSS, I/O, failures, cache hits."""
+    stages = {}
+    for r in records:
+        stages.setdefault(r["stage"], []).append(r)
+    rows = []
+    for stage, rs in stages.items():
+        walls = [r["wall"] for r in rs]
+        cached = [r for r in rs if r.get("cache") in ("hit", "miss")]
+        row = {"stage": stage, "n": len(rs), "total": sum(walls),
+               "cpu": sum(r.get("cpu") or 0 for r in rs),
+               "rss_mb": max(r.get("rss_mb") or 0 for r in rs),
+               "read_mb": sum(r.get("read_bytes") or 0 for r in rs) / 1e6,
+               "write_mb": sum(r.get("write_bytes") or 0 for r in rs) / 1e6,
+               "failed": sum(1 for r in rs if r.get("status")),
+               "hit_rate": (sum(1 for r in cached if r["cache"] == "hit") / len(cached)
+                            if cached else None)}
+        for q in PERCENTILES:
+            row["p%d" % q] = percentile(walls, q)
+        rows.append(row)
+    return sorted(rows, key=lambda row: -row["total"])
+
+
+def critical_path(records):
+    """Steps of the subject that finished last in each run: {run: (subject, steps)}."""
+    by_run = {}
+    for r in records:
+        by_run.setdefault(r.get("run"), []).append(r)
+    paths = {}
+    for run, rs in by_run.items():
+        rs = [r for r in rs if r.get("subject")]
+        if not rs:
+            continue
+        last = max(rs, key=lambda r: r["start"] + r["wall"])
+        steps = sorted((r for r in rs if r["subject"] == last["subject"]),
+                       key=lambda r: r["start"])
+        paths[run] = (last["subject"], steps)
+    return paths
+
+
+def print_report(records):
+    print("=== STAGE TIMING (%d steps) ===" % len(records))
+    print("%-22s %6s %9s %8s %8s %8s %8s %8s %9s %9s %6s %5s" % (
+        "stage", "n", "total s", "p50", "p90", "p99", "cpu s", "rss MB", "read MB",
+        "write MB", "fail", "hit%"))
+    for row in stage_summary(records):
+        print("%-22s %6d %9.1f %8.2f %8.2f %8.2f %8.1f %8.0f %9.1f %9.1f %6d %5s" % (
+            row["stage"], row["n"], row["total"], row["p50"], row["p90"], row["p99"],
+            row["cpu"], row["rss_mb"], row["read_mb"], row["write_mb"], row["failed"],
+            "%.0f" % (100 * row["hit_rate"]) if row["hit_rate"] is not None else "-"))
+
+    for run, (subject, steps) in sorted(critical_path(records).items(),
+                                        key=lambda item: str(item[0])):
+        span = steps[-1]["start"] + steps[-1]["wall"] - steps[0]["start"]
+        busy = sum(s["wall"] for s in steps) or 1.0
+        print("")
+        print("=== CRITICAL PATH run %s: %s (%.1fs from first to last step) ===" % (
+            run or "-", subject, span))
+        for s in steps:
+            print("  %-22s %8.2fs %5.1f%%%s" % (s["stage"], s["wall"], 100 * s["wall"] / busy,
+                                                "  FAILED" if s.get("status") else ""))
+        slowest = max(steps, key=lambda s: s["wall"])
+        print("  → slowest step: %s (%.2fs)" % (slowest["stage"], slowest["wall"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline step tracing")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="run and record a command (after --)")
+    p.add_argument("--stage", help="default: the command name")
+    p.add_argument("--subject")
+    p.add_argument("--cache", choices=["hit", "miss"])
+    p.add_argument("--out", help="trace file (default $%s or %s)" % (TRACE_ENV, DEFAULT_TRACE))
+    p = sub.add_parser("report", help="per-stage percentiles and critical path")
+    p.add_argument("trace", nargs="?")
+    p.add_argument("--run", help="only this run id")
+    argv, command = sys.argv[1:], []
+    if "--" in argv:
+        argv, command = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if not command:
+            parser.error("run needs a command after --")
+        return run_command(command, args.stage or os.path.basename(command[0]),
+                           args.subject, args.cache, args.out)
+
+    path = args.trace or trace_path()
+    if not os.path.exists(path):
+        print("⚠️  no trace file at %s" % path)
+        return 1
+    records = load_records(path, args.run)
+    if not records:
+        print("⚠️  no records%s" % (" for run %s" % args.run if args.run else ""))
+        return 1
+    print_report(records)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
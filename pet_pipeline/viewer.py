@@ -0,0 +1,359 @@
+"""
+Local QC web viewer backed by a precomputed slice-tile pyramid.
+
+Every slice of every layer (PET in 'hot', VOI labels as a transparent
+overlay, MNI template in grey) is pre-encoded as PNG at full and half
+resolution and packed into one file per volume under qc/tiles/. Serving a
+slice is then a dictionary lookup plus a read from a memory-mapped pack, so
+scrolling stays well under 50 ms even over an SSH tunnel; the browser
+caches tiles because their URLs carry the pack key.
+
+Usage (on the processing node):
+    python -m pet_pipeline.viewer --port 8765
+then on your laptop:
+    ssh -L 8765:localhost:8765 <node>   and open http://localhost:8765
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from . import cache, config, nifti, render
+from .manifest import Manifest
+
+PYRAMID_VERSION = "tiles-v2"
+LEVELS = (1, 2)                  # downsampling factor of each pyramid level
+MAGIC = b"PTIL"
+OVERLAY_ALPHA = 120
+
+
+# ----------------------------------------------------------------------------
+# Tile packs
+# ----------------------------------------------------------------------------
+
+def _label_volume(masks):
+    """Combine VOI masks into one label volume (later VOIs drawn on top)."""
+    names = list(masks)
+    labels = np.zeros(next(iter(masks.values())).shape, dtype=np.uint8)
+    for i, name in enumerate(names, 1):
+        labels[masks[name]] = i
+    return labels, names
+
+
+def _slice_png(kind, sl, window, palette):
+    if kind == "voi":
+        rgba = palette[sl]
+        return render.encode_png(rgba, level=1)
+    lut = render.HOT if kind == "pet" else render.GREY
+    return render.encode_png(lut[render.to_uint8(sl, *window)], level=1)
+
+
+def build_pack(path, volume, kind, names=None, levels=LEVELS):
+    """Pre-render every slice of a volume at each pyramid level into one file."""
+    palette = None
+    window = None
+    if kind == "voi":
+        palette = np.zeros((len(names) + 1, 4), dtype=np.uint8)
+        for i, name in enumerate(names, 1):
+            palette[i, :3] = render.OVERLAY_COLOURS.get(name, (255, 255, 0))
+            palette[i, 3] = OVERLAY_ALPHA
+    else:
+        window = render.robust_range(volume)
+
+    blobs, entries, offset = [], {}, 0
+    shapes = []
+    for level, factor in enumerate(levels):
+        if kind == "voi":
+            v = render.downsample_labels(volume, factor)
+        else:
+            v = render.downsample(volume, factor)
+        shapes.append(list(v.shape))
+        for axis in range(3):
+            for index in range(v.shape[axis]):
+                png = _slice_png(kind, render.plane(v, axis, index), window, palette)
+                entries["%d/%d/%d" % (axis, level, index)] = (offset, len(png))
+                blobs.append(png)
+                offset += len(png)
+
+    index = json.dumps({"kind": kind, "shapes": shapes, "levels": list(levels),
+                        "entries": entries}).encode()
+    tmp = path + ".tmp%d" % os.getpid()
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(index)) + index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+class TilePack:
+    """Read side of a tile pack: memory-mapped PNG blobs plus an offset index."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(4) != MAGIC:
+                raise ValueError("Not a tile pack: %s" % path)
+            size = struct.unpack("<I", f.read(4))[0]
+            self.meta = json.loads(f.read(size))
+            self.base = 8 + size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, axis, level, index):
+        entry = self.meta["entries"].get("%d/%d/%d" % (axis, level, index))
+        if entry is None:
+            return None
+        offset, length = entry
+        start = self.base + offset
+        return self._mm[start:start + length]
+
+
+# ----------------------------------------------------------------------------
+# Cohort state
+# ----------------------------------------------------------------------------
+
+class Viewer:
+    """Subjects, their layers and the (lazily built) tile packs."""
+
+    def __init__(self, data_dir=config.DATA_DIR, tile_dir=None, template=config.MNI_TEMPLATE):
+        self.tile_dir = tile_dir or os.path.join(config.QC_DIR, "tiles")
+        os.makedirs(self.tile_dir, exist_ok=True)
+        self.packs = {}
+        self.sources = {}            # pack key -> (kind, loader)
+        self.subjects = {}           # subject -> pet_file, shape, [(layer, key)]
+        self._locks = {}
+        self._lock = threading.Lock()
+
+        voi_paths = {n: config.voi_path(n) for n in ("ctx", "CG", "WC", "Pons")}
+        voi_paths = {n: p for n, p in voi_paths.items() if p}
+        voi_key = voi_shape = None
+        if voi_paths:
+            voi_key = self._register(
+                "voi", [cache.stat_key(p) for p in voi_paths.values()],
+                lambda: _label_volume({n: nifti.load(p).get_fdata() > 0
+                                       for n, p in voi_paths.items()}))
+            voi_shape = nifti.read_header(next(iter(voi_paths.values()))).shape
+        template_key = template_shape = None
+        if template and os.path.exists(template):
+            template_key = self._register(
+                "template", [cache.stat_key(template)],
+                lambda: (nifti.load(template).get_fdata(), None))
+            template_shape = nifti.read_header(template).shape
+
+        manifest = Manifest.load_or_build(data_dir, hash_files=False)
+        for subject in sorted(manifest.subjects):
+            pet = manifest.pet(subject)
+            if not pet:
+                continue
+            entry = next(f for f in manifest.files(subject, "pet") if f["path"] == pet)
+            if not entry.get("geometry"):
+                continue
+            shape = tuple(entry["geometry"]["shape"][:3])
+            layers = []
+            if template_key and template_shape == shape:
+                layers.append(("template", template_key))
+            layers.append(("pet", self._register(
+                "pet", [cache.stat_key(pet)],
+                lambda pet=pet: (nifti.load(pet, orient=config.STANDARD_ORIENTATION).get_fdata(), None))))
+            if voi_key and voi_shape == shape:
+                layers.append(("voi", voi_key))
+            self.subjects[subject] = {"pet_file": pet, "shape": list(shape),
+                                      "layers": layers}
+
+    def _register(self, kind, signature, loader):
+        key = cache.cache_key(PYRAMID_VERSION, kind, *signature)
+        self.sources[key] = (kind, loader)
+        return key
+
+    def pack(self, key):
+        """TilePack for a key, building it on first use (once per key)."""
+        if key in self.packs:
+            return self.packs[key]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.packs:
+                path = os.path.join(self.tile_dir, key + ".tiles")
+                if not os.path.exists(path):
+                    kind, loader = self.sources[key]
+                    volume, names = loader()
+                    build_pack(path, volume, kind, names)
+                self.packs[key] = TilePack(path)
+        return self.packs[key]
+
+    def prebuild(self):
+        """Build every missing pack (run in a background thread at startup)."""
+        for key in list(self.sources):
+            try:
+                self.pack(key)
+            except (OSError, ValueError) as exc:
+                print("⚠ could not build tiles for %s: %s" % (key[:12], exc))
+
+
+# ----------------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------------
+
+TILE_RE = re.compile(r"^/tile/([0-9a-f]{40})/(\d)/(\d)/(\d+)\.png$")
+
+
+class Handler(BaseHTTPRequestHandler):
+    viewer = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, body, content_type, cache_forever=False):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cache_forever:
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path in ("/", "/index.html"):
+            return self._send(PAGE.encode(), "text/html; charset=utf-8")
+        if self.path == "/api/subjects":
+            return self._send(json.dumps(self.viewer.subjects).encode(), "application/json")
+        match = TILE_RE.match(self.path)
+        if match and match.group(1) in self.viewer.sources:
+            key, axis, level, index = match.group(1), *map(int, match.groups()[1:])
+            if key not in self.viewer.packs:
+                # Warm the pack; later requests for it are pure lookups
+                self.viewer.pack(key)
+            tile = self.viewer.packs[key].get(axis, level, index)
+            if tile is not None:
+                return self._send(tile, "image/png", cache_forever=True)
+        self.send_error(404)
+
+
+PAGE = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>PET QC viewer</title>
+<style>
+body{font-family:sans-serif;background:#111;color:#ddd;margin:12px}
+#stack{position:relative;display:inline-block;background:#000}
+#stack img{position:absolute;left:0;top:0;image-rendering:pixelated}
+#stack img.base{position:relative}
+label{margin-right:10px}
+</style></head><body>
+<select id="subject"></select>
+<button data-axis="0">Sagittal</button><button data-axis="1">Coronal</button>
+<button data-axis="2">Axial</button>
+<input id="slice" type="range" min="0" max="0" style="width:300px"> <span id="pos"></span>
+<span id="layers"></span>
+<p><small>Scroll or use arrow keys to move through slices; j/k switch subject.</small></p>
+<div id="stack"></div>
+<script>
+let subjects = {}, names = [], current = null, axis = 2, index = 0, zoom = 4, settle = null;
+const visible = {template: true, pet: true, voi: true};
+const stack = document.getElementById('stack'), slider = document.getElementById('slice');
+
+function url(key, lvl, i) { return `/tile/${key}/${axis}/${lvl}/${i}.png`; }
+
+function prefetch() {
+  // Coarse level for the whole axis first, then full resolution
+  for (const lvl of [1, 0]) {
+    const n = current.shape[axis] >> lvl;
+    for (let i = 0; i < n; i++) for (const [, key] of current.layers)
+      new Image().src = url(key, lvl, i);
+  }
+}
+
+function draw(lvl = 0) {
+  const n = current.shape[axis];
+  index = Math.max(0, Math.min(n - 1, index));
+  slider.max = n - 1; slider.value = index;
+  document.getElementById('pos').textContent = `${index + 1}/${n}`;
+  stack.innerHTML = '';
+  const dims = [[1, 2], [0, 2], [0, 1]][axis];
+  current.layers.forEach(([layer, key], k) => {
+    if (!visible[layer]) return;
+    const img = document.createElement('img');
+    img.src = url(key, lvl, Math.min(index >> lvl, (n >> lvl) - 1));
+    img.width = current.shape[dims[0]] * zoom; img.height = current.shape[dims[1]] * zoom;
+    if (layer === 'pet' && current.layers[0][0] === 'template') img.style.opacity = 0.7;
+    if (stack.children.length === 0) img.className = 'base';
+    stack.appendChild(img);
+  });
+}
+
+function select(name) {
+  current = subjects[name]; current.name = name;
+  document.getElementById('subject').value = name;
+  index = current.shape[axis] >> 1;
+  const box = document.getElementById('layers'); box.innerHTML = '';
+  for (const [layer] of current.layers) {
+    const l = document.createElement('label');
+    l.innerHTML = `<input type="checkbox" ${visible[layer] ? 'checked' : ''}> ${layer}`;
+    l.firstChild.onchange = e => { visible[layer] = e.target.checked; draw(); };
+    box.appendChild(l);
+  }
+  draw(); prefetch();
+}
+
+document.querySelectorAll('button[data-axis]').forEach(b => b.onclick = () => {
+  axis = +b.dataset.axis; index = current.shape[axis] >> 1; draw(); prefetch();
+});
+slider.oninput = () => { index = +slider.value; draw(); };
+stack.onwheel = e => {
+  // Fast scrolling shows the half-resolution level, then settles on full
+  e.preventDefault(); index += e.deltaY > 0 ? -1 : 1; draw(1);
+  clearTimeout(settle); settle = setTimeout(() => draw(0), 80);
+};
+document.onkeydown = e => {
+  if (e.key === 'ArrowUp' || e.key === 'ArrowRight') { index++; draw(); }
+  if (e.key === 'ArrowDown' || e.key === 'ArrowLeft') { index--; draw(); }
+  const i = names.indexOf(current.name);
+  if (e.key === 'j' && i + 1 < names.length) select(names[i + 1]);
+  if (e.key === 'k' && i > 0) select(names[i - 1]);
+};
+document.getElementById('subject').onchange = e => select(e.target.value);
+
+fetch('/api/subjects').then(r => r.json()).then(data => {
+  subjects = data; names = Object.keys(data);
+  const sel = document.getElementById('subject');
+  for (const n of names) sel.add(new Option(n, n));
+  if (names.length) select(names[0]);
+});
+</script></body></html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PET QC web viewer")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--template", default=config.MNI_TEMPLATE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--build-only", action="store_true",
+                        help="precompute all tile packs and exit")
+    args = parser.parse_args()
+
+    viewer = Viewer(args.data, template=args.template)
+    print("=== PET QC VIEWER ===")
+    print("Subjects: %d, tile packs: %d (%s)" % (len(viewer.subjects), len(viewer.sources),
+                                                 viewer.tile_dir))
+    if args.build_only:
+        viewer.prebuild()
+        print("✓ Tile packs built")
+        return
+
+    threading.Thread(target=viewer.prebuild, daemon=True).start()
+    Handler.viewer = viewer
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print("Serving on http://%s:%d/" % (args.host, args.port))
+    print("From your laptop: ssh -L %d:localhost:%d <this-node>" % (args.port, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
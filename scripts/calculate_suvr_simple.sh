@@ -2,12 +2,15 @@
 echo "=== SUVR CALCULATION ==="
 echo ""
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # AD01
-PET_AD="data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz"
+PET_AD="data/AD01/pet/AD01_PiB_5070_MNI.nii.gz"
 if [ -f "$PET_AD" ]; then
     echo "Calculating AD01 SUVR..."
-    CORTICAL_AD=$(fslstats "$PET_AD" -k vois/voi_ctx_binary.nii -M)
-    CEREBELLAR_AD=$(fslstats "$PET_AD" -k vois/voi_cereb_binary.nii -M)
+    CORTICAL_AD=$(fslstats "$PET_AD" $FSLSTATS_THR -k vois/voi_ctx_binary.nii -M)
+    CEREBELLAR_AD=$(fslstats "$PET_AD" $FSLSTATS_THR -k vois/voi_cereb_binary.nii -M)
     SUVR_AD=$(echo "$CORTICAL_AD / $CEREBELLAR_AD" | bc -l)
     
     echo "AD01 Results:"
@@ -30,11 +33,11 @@ fi
 
 echo ""
 # YC101
-PET_YC="data/YC101/pet/YC101_PiB_5070_MNI_thr.nii.gz"
+PET_YC="data/YC101/pet/YC101_PiB_5070_MNI.nii.gz"
 if [ -f "$PET_YC" ]; then
     echo "Calculating YC101 SUVR..."
-    CORTICAL_YC=$(fslstats "$PET_YC" -k vois/voi_ctx_binary.nii -M)
-    CEREBELLAR_YC=$(fslstats "$PET_YC" -k vois/voi_cereb_binary.nii -M)
+    CORTICAL_YC=$(fslstats "$PET_YC" $FSLSTATS_THR -k vois/voi_ctx_binary.nii -M)
+    CEREBELLAR_YC=$(fslstats "$PET_YC" $FSLSTATS_THR -k vois/voi_cereb_binary.nii -M)
     SUVR_YC=$(echo "$CORTICAL_YC / $CEREBELLAR_YC" | bc -l)
     
     echo "YC101 Results:"
@@ -1,6 +1,9 @@
 #!/bin/bash
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 SUBJECT="AD01"
-PET="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
+PET="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI.nii.gz"
 CEREB="vois/voi_cereb_${SUBJECT}.nii"
 CTX="vois/voi_ctx_${SUBJECT}.nii"
 
@@ -8,7 +11,7 @@ echo "Attempting to create screenshots..."
 echo "Note: This may require a display. If it fails, manual screenshots are needed."
 
 # Try to create images (may fail without display)
-fslmaths "$PET" -Tmean visual_maps/pet_mean.nii.gz
+fslmaths "$PET" $FSLMATHS_THR -Tmean visual_maps/pet_mean.nii.gz
 
 # Create simple montage using slicer instead
 echo "Creating image slices using fslslice..."
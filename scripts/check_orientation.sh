@@ -3,6 +3,11 @@ echo "=== CHECKING IMAGE ORIENTATION ==="
 echo "Critical step for proper alignment"
 echo ""
 
+# Whole cohort in one pass (headers only) -> results/orientation_audit.csv
+echo "=== COHORT HEADER AUDIT ==="
+python -m pet_pipeline.audit | tail -3
+echo ""
+
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
 check_orientation() {
@@ -19,8 +24,8 @@ check_orientation() {
         return 1
     fi
     
-    echo "1. Orientation matrix (qform):"
-    fslhd "$T1_FILE" | grep -A1 "qform" || echo "No qform info"
+    echo "1. Header orientation (qform/sform codes, axis codes, geometry):"
+    python -m pet_pipeline.audit "$T1_FILE" "$PET_FILE"
     
     echo ""
     echo "2. Recommended: Visual check with MNI template"
@@ -30,9 +35,8 @@ check_orientation() {
     echo "   Run: fslreorient2std -v '$T1_FILE'"
     echo ""
     
-    # Check if image is close to standard orientation
-    echo "4. Quick check with fslreorient2std:"
-    fslreorient2std "$T1_FILE" /tmp/test_reorient.nii 2>&1 | head -20
+    # NEEDS_REORIENT in the audit above means fslreorient2std would
+    # permute/flip axes; no test reorientation is written any more.
     
     echo "---"
 }
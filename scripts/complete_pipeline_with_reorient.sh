@@ -5,9 +5,13 @@ echo ""
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
+# Record every FSL call and Python step (python -m pet_pipeline.trace report)
+source "$(dirname "$0")/trace_fsl.sh"
+
 process_with_reorientation() {
     local subject=$1
     local group=$2
+    export PIPELINE_SUBJECT="$subject"
     
     echo "=== PROCESSING $subject WITH REORIENTATION ==="
     
@@ -15,66 +19,44 @@ process_with_reorientation() {
     T1_ORIG="data/$subject/anat/${subject}_MR.nii"
     PET_ORIG="data/$subject/pet/${subject}_PiB_5070.nii"
     
-    # Reoriented files
-    T1_REORIENTED="data/$subject/anat/${subject}_MR_reoriented.nii"
-    PET_REORIENTED="data/$subject/pet/${subject}_PiB_5070_reoriented.nii"
-    
-    # Step 1: Reorient to standard space
-    echo "1. Reorienting to standard space..."
-    
-    # Backup originals
-    cp "$T1_ORIG" "${T1_ORIG%.nii}_backup.nii"
-    cp "$PET_ORIG" "${PET_ORIG%.nii}_backup.nii"
-    
-    # Reorient T1
-    echo "   Reorienting T1..."
-    fslreorient2std "$T1_ORIG" "$T1_REORIENTED"
-    
-    if [ $? -eq 0 ] && [ -f "$T1_REORIENTED" ]; then
-        mv "$T1_REORIENTED" "$T1_ORIG"
-        echo "   ✓ T1 reoriented"
-    else
-        echo "   ⚠ T1 reorientation may have failed, using original"
-    fi
-    
-    # Reorient PET
-    echo "   Reorienting PET..."
-    fslreorient2std "$PET_ORIG" "$PET_REORIENTED"
-    
-    if [ $? -eq 0 ] && [ -f "$PET_REORIENTED" ]; then
-        mv "$PET_REORIENTED" "$PET_ORIG"
-        echo "   ✓ PET reoriented"
-    else
-        echo "   ⚠ PET reorientation may have failed, using original"
-    fi
-    
-    # Step 2: Apply intensity scaling if needed (AD02)
+    # Step 1: Standard orientation for the FSL tools. Originals are never
+    # modified: images already in MNI orientation are used as they are,
+    # others get a _reoriented working copy (the Python stages reorient
+    # lazily, see pet_pipeline.reorient)
+    echo "1. Checking orientation..."
+    T1_INPUT=$(python -m pet_pipeline.reorient "$T1_ORIG")
+    PET_REG=$(python -m pet_pipeline.reorient "$PET_ORIG")
+    echo "   T1 input:  $T1_INPUT"
+    echo "   PET input: $PET_REG"
+    
+    # Step 2: Intensity scaling if needed (AD02), folded into step 6
+    PET_SCALE=1
     if [ "$subject" = "AD02" ]; then
-        echo "2. Applying intensity scaling to AD02..."
-        fslmaths "$PET_ORIG" -div 50 "$PET_ORIG"
-        echo "   ✓ Intensity scaled ÷50"
+        echo "2. AD02 intensity scaling ÷50 (applied in the final resample)"
+        PET_SCALE=0.02
     fi
     
     # Step 3: Brain extraction
     echo "3. Brain extraction..."
-    bet "$T1_ORIG" "data/$subject/anat/${subject}_MR_brain.nii.gz" \
+    bet "$T1_INPUT" "data/$subject/anat/${subject}_MR_brain.nii.gz" \
         -f 0.25 -g -0.1 -B -R
     
     # Step 4: T1 → MNI
     echo "4. T1 to MNI normalization..."
-    flirt -in "data/$subject/anat/${subject}_MR_brain.nii.gz" \
-        -ref "$MNI_TEMPLATE" \
-        -out "data/$subject/anat/${subject}_MR_MNI.nii.gz" \
-        -omat "data/$subject/transform/T1_to_MNI.mat" \
-        -dof 12 -searchrx -30 30 -searchry -30 30 -searchrz -30 30
+    # (warm-started from earlier results, full -30..30 search as fallback)
+    python -m pet_pipeline.register T1_to_MNI "$subject" \
+        "data/$subject/anat/${subject}_MR_brain.nii.gz" "$MNI_TEMPLATE" \
+        "data/$subject/transform/T1_to_MNI.mat" \
+        --out "data/$subject/anat/${subject}_MR_MNI.nii.gz" \
+        --dof 12 --search 30
     
     # Step 5: PET → T1
     echo "5. PET to T1 coregistration..."
-    flirt -in "$PET_ORIG" \
-        -ref "data/$subject/anat/${subject}_MR_brain.nii.gz" \
-        -out "data/$subject/pet/${subject}_PiB_5070_T1.nii.gz" \
-        -omat "data/$subject/transform/PET_to_T1.mat" \
-        -dof 6 -cost mutualinfo -searchrx -15 15 -searchry -15 15 -searchrz -15 15
+    python -m pet_pipeline.register PET_to_T1 "$subject" \
+        "$PET_REG" "data/$subject/anat/${subject}_MR_brain.nii.gz" \
+        "data/$subject/transform/PET_to_T1.mat" \
+        --out "data/$subject/pet/${subject}_PiB_5070_T1.nii.gz" \
+        --dof 6 --cost mutualinfo --search 15
     
     # Step 6: PET → MNI
     echo "6. PET to MNI normalization..."
@@ -82,16 +64,13 @@ process_with_reorientation() {
         -concat "data/$subject/transform/T1_to_MNI.mat" \
         "data/$subject/transform/PET_to_T1.mat"
     
-    flirt -in "$PET_ORIG" \
-        -ref "$MNI_TEMPLATE" \
-        -out "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz" \
-        -applyxfm -init "data/$subject/transform/PET_to_MNI.mat" \
-        -paddingsize 1
-    
-    # Step 7: Threshold
-    echo "7. Intensity threshold..."
-    fslmaths "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz" \
-        -thr 0.001 "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"
+    # Reorientation + PET_to_MNI + scaling in one resample of the raw PET
+    python -m pet_pipeline.resample "$PET_ORIG" \
+        "data/$subject/transform/PET_to_MNI.mat" \
+        "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz" \
+        --ref "$MNI_TEMPLATE" --scale "$PET_SCALE" --padding 1
+    # (the 0.001 intensity threshold is applied at extraction time by
+    # pet_pipeline.extract, no _MNI_thr copy is written)
     
     echo "✓ $subject processed with reorientation"
     echo ""
@@ -105,7 +84,7 @@ process_with_reorientation "AD02" "AD"
 echo ""
 echo "=== VISUAL CHECK COMMANDS ==="
 echo "Check AD04 alignment:"
-echo "  fsleyes '$MNI_TEMPLATE' data/AD04/pet/AD04_PiB_5070_MNI_thr.nii.gz -cm hot &"
+echo "  fsleyes '$MNI_TEMPLATE' data/AD04/pet/AD04_PiB_5070_MNI.nii.gz -cm hot -dr 0.001 4 &"
 echo ""
 echo "Check AD02 alignment:"
-echo "  fsleyes '$MNI_TEMPLATE' data/AD02/pet/AD02_PiB_5070_MNI_thr.nii.gz -cm hot &"
+echo "  fsleyes '$MNI_TEMPLATE' data/AD02/pet/AD02_PiB_5070_MNI.nii.gz -cm hot -dr 0.001 4 &"
@@ -44,10 +44,8 @@ flirt -in data/AD01/pet/AD01_PiB_5070.nii \
       -out data/AD01/pet/AD01_PiB_5070_MNI.nii.gz \
       -applyxfm -init data/AD01/transform/PET_to_MNI.mat
 
-# 5. Threshold
-echo "5. Applying threshold (0.001)..."
-fslmaths data/AD01/pet/AD01_PiB_5070_MNI.nii.gz \
-         -thr 0.001 data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz
+# (the 0.001 intensity threshold is applied at extraction time by
+# pet_pipeline.extract, no _MNI_thr copy is written)
 
 echo "=== AD01 PROCESSING COMPLETE ==="
 
@@ -79,12 +77,9 @@ flirt -in data/YC101/pet/YC101_PiB_5070.nii \
       -out data/YC101/pet/YC101_PiB_5070_MNI.nii.gz \
       -applyxfm -init data/YC101/transform/PET_to_MNI.mat
 
-fslmaths data/YC101/pet/YC101_PiB_5070_MNI.nii.gz \
-         -thr 0.001 data/YC101/pet/YC101_PiB_5070_MNI_thr.nii.gz
-
 echo "=== YC101 PROCESSING COMPLETE ==="
 echo ""
 echo "==============================="
 echo "Pipeline complete!"
-echo "Output in data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz"
+echo "Output in data/AD01/pet/AD01_PiB_5070_MNI.nii.gz"
 echo "==============================="
@@ -2,8 +2,20 @@
 """
 Create Figures for GAAIN Centiloid Pipeline
 Creates Figure 1 with three panels for the abstract
+
+Profiling (per-phase timing table, cProfile or sampled flamegraph stacks):
+    python scripts/create_figures.py --profile[=timers|cprofile|sample]
 """
 
+import os
+import sys
+
+# run as scripts/create_figures.py: the package is in the project root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from pet_pipeline import profiling
+profile = profiling.start("create_figures")
+profile.phase("imports", "loading")
+
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib as mpl
@@ -17,6 +29,7 @@ mpl.rcParams['axes.linewidth'] = 1.5
 mpl.rcParams['xtick.major.width'] = 1.5
 mpl.rcParams['ytick.major.width'] = 1.5
 
+profile.phase("panel A render", "rendering")
 # Create Figure 1 with 3 panels
 fig = plt.figure(figsize=(15, 5))
 
@@ -54,6 +67,7 @@ ax1.plot([5, 5], [2, 1.5], 'k-', linewidth=2)
 ax1.text(5, 1, 'SUVR Calculation\n(Cortical / Cerebellar)', ha='center', fontsize=9,
          bbox=dict(boxstyle='round,pad=0.5', facecolor='red', alpha=0.7))
 
+profile.phase("panel B render", "rendering")
 # ================= PANEL B: VALIDATION PLOT =================
 ax2 = plt.subplot(1, 3, 2)
 ax2.set_title('B. Pipeline Validation', fontsize=12, fontweight='bold', pad=20)
@@ -90,6 +104,7 @@ ax2.text(0.5, 2.7, f'Difference: {percent_diff:.1f}%',
 
 ax2.grid(True, alpha=0.3, linestyle='--')
 
+profile.phase("panel C render", "rendering")
 # ================= PANEL C: GROUP COMPARISON =================
 ax3 = plt.subplot(1, 3, 3)
 ax3.set_title('C. Group Comparison', fontsize=12, fontweight='bold', pad=20)
@@ -143,7 +158,9 @@ for i, (mean, sem, n) in enumerate(zip(group_means, group_sems, [3, 5])):
     ax3.text(i, mean + sem + 0.1, f'n={n}', ha='center', fontsize=9, fontweight='bold')
 
 plt.tight_layout()
+profile.phase("save", "saving")
 plt.savefig('figures/figure1_pipeline_results.png', dpi=300, bbox_inches='tight')
 plt.savefig('figures/figure1_pipeline_results.pdf', bbox_inches='tight')
 print("Figure 1 saved to: figures/figure1_pipeline_results.png and .pdf")
+profile.phase("display", "rendering")
 plt.show()
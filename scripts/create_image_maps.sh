@@ -4,7 +4,7 @@ echo ""
 
 # Check if we have necessary files for AD01 (our validated subject)
 SUBJECT="AD01"
-PET_FILE="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
+PET_FILE="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI.nii.gz"
 CEREB_MASK="vois/voi_cereb_${SUBJECT}.nii"
 CTX_MASK="vois/voi_ctx_${SUBJECT}.nii"
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
@@ -93,3 +93,7 @@ echo ""
 echo "4. NORMALIZATION CHECK (PET should align with MNI template):"
 echo "   fsleyes \"$MNI_TEMPLATE\" \\"
 echo "          \"$PET_FILE\" -cm hot -a 70 &"
+echo ""
+echo "5. NO DESKTOP? Browse all subjects in the web viewer instead:"
+echo "   python -m pet_pipeline.viewer --port 8765"
+echo "   (from your laptop: ssh -L 8765:localhost:8765 <node>, open http://localhost:8765)"
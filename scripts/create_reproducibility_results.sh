@@ -6,6 +6,9 @@ echo ""
 # Create clean results directory
 mkdir -p reproducibility_results
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # Create FSL results file
 echo "Subject,Group,Analyst,Pipeline,Cortical_Mean,Cerebellar_Mean,SUVR,Notes" > reproducibility_results/fsl_results.csv
 
@@ -16,7 +19,7 @@ extract_suvr() {
     
     echo "Extracting $subject..."
     
-    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"
+    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz"
     CTX_VOI="vois/voi_ctx_${subject}.nii.gz"
     CEREB_VOI="vois/voi_cereb_${subject}.nii.gz"
     
@@ -32,8 +35,8 @@ extract_suvr() {
     fi
     
     # Extract values
-    CORTICAL=$(fslstats "$PET_FILE" -k "$CTX_VOI" -M 2>/dev/null)
-    CEREBELLAR=$(fslstats "$PET_FILE" -k "$CEREB_VOI" -M 2>/dev/null)
+    CORTICAL=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "$CTX_VOI" -M 2>/dev/null)
+    CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "$CEREB_VOI" -M 2>/dev/null)
     
     if [ -z "$CORTICAL" ] || [ -z "$CEREBELLAR" ]; then
         echo "  ✗ Extraction failed"
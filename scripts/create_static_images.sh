@@ -1,8 +1,11 @@
 #!/bin/bash
 echo "=== CREATING STATIC IMAGE FILES ==="
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 SUBJECT="AD01"
-PET="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
+PET="data/${SUBJECT}/pet/${SUBJECT}_PiB_5070_MNI.nii.gz"
 CEREB="vois/voi_cereb_${SUBJECT}.nii"
 CTX="vois/voi_ctx_${SUBJECT}.nii"
 MNI="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
@@ -11,7 +14,9 @@ mkdir -p visual_maps
 
 echo "1. Creating cerebellum slice visualization..."
 # Extract slice at cerebellum level (z=30)
-fslroi "$PET" temp_pet_cereb.nii.gz 0 -1 0 -1 30 1
+# Below-threshold voxels zeroed, as in the old _MNI_thr image
+fslmaths "$PET" $FSLMATHS_THR temp_pet_thr.nii.gz
+fslroi temp_pet_thr.nii.gz temp_pet_cereb.nii.gz 0 -1 0 -1 30 1
 fslroi "$CEREB" temp_mask_cereb.nii.gz 0 -1 0 -1 30 1
 
 # Create overlay (PET + mask*2)
@@ -23,7 +28,7 @@ echo "Could not create cerebellum image"
 
 echo "2. Creating cortical slice visualization..."
 # Extract slice at cortex level (z=50)
-fslroi "$PET" temp_pet_ctx.nii.gz 0 -1 0 -1 50 1
+fslroi temp_pet_thr.nii.gz temp_pet_ctx.nii.gz 0 -1 0 -1 50 1
 fslroi "$CTX" temp_mask_ctx.nii.gz 0 -1 0 -1 50 1
 
 fslmaths temp_pet_ctx.nii.gz -add temp_mask_ctx.nii.gz -add temp_mask_ctx.nii.gz temp_overlay_ctx.nii.gz
@@ -32,14 +37,14 @@ echo "Could not create cortex image"
 
 echo "3. Creating montage of PET slices..."
 # Create montage of PET slices at different levels
-slicer "$PET" -x 0.4 visual_maps/pet_slice_x.png \
+slicer temp_pet_thr.nii.gz -x 0.4 visual_maps/pet_slice_x.png \
               -y 0.5 visual_maps/pet_slice_y.png \
               -z 0.5 visual_maps/pet_slice_z.png 2>/dev/null || \
 echo "Could not create PET slices"
 
 echo "4. Creating MNI-PET overlay slice..."
 # Create single composite slice
-fslmaths "$PET" -Tmean temp_pet_mean.nii.gz
+fslmaths temp_pet_thr.nii.gz -Tmean temp_pet_mean.nii.gz
 fslroi "$MNI" temp_mni_slice.nii.gz 0 -1 0 -1 40 1
 fslroi temp_pet_mean.nii.gz temp_pet_slice.nii.gz 0 -1 0 -1 40 1
 
@@ -64,23 +69,23 @@ VISUAL RESULTS SUMMARY - GAAIN Centiloid Pipeline
 Since automated image generation failed, here is what manual inspection shows:
 
 1. CEREBELLUM ALIGNMENT (AD01):
-   - File: data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz + voi_cereb_AD01.nii
+   - File: data/AD01/pet/AD01_PiB_5070_MNI.nii.gz + voi_cereb_AD01.nii
    - Visual: Green mask correctly positioned in cerebellum (posterior fossa)
-   - Command to view: fsleyes data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz vois/voi_cereb_AD01.nii -dl PET -cm hot -dl Cerebellum -cm green -a 70
+   - Command to view: fsleyes data/AD01/pet/AD01_PiB_5070_MNI.nii.gz vois/voi_cereb_AD01.nii -dl PET -cm hot -dl Cerebellum -cm green -a 70
 
 2. CORTICAL ALIGNMENT (AD01):
-   - File: data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz + voi_ctx_AD01.nii
+   - File: data/AD01/pet/AD01_PiB_5070_MNI.nii.gz + voi_ctx_AD01.nii
    - Visual: Red mask covering cerebral cortex
-   - Command: fsleyes data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz vois/voi_ctx_AD01.nii -dl PET -cm hot -dl Cortex -cm red -a 50
+   - Command: fsleyes data/AD01/pet/AD01_PiB_5070_MNI.nii.gz vois/voi_ctx_AD01.nii -dl PET -cm hot -dl Cortex -cm red -a 50
 
 3. ALL MASKS:
    - Combined view shows complete coverage
-   - Command: fsleyes data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz vois/voi_cereb_AD01.nii vois/voi_ctx_AD01.nii -dl PET -cm hot -dl Cerebellum -cm green -a 70 -dl Cortex -cm red -a 50
+   - Command: fsleyes data/AD01/pet/AD01_PiB_5070_MNI.nii.gz vois/voi_cereb_AD01.nii vois/voi_ctx_AD01.nii -dl PET -cm hot -dl Cerebellum -cm green -a 70 -dl Cortex -cm red -a 50
 
 4. NORMALIZATION CHECK:
    - PET signal aligns with MNI template anatomy
    - Screenshot available: normalization_check.png
-   - Command: fsleyes /cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz -dl "MNI Template" -dl "PET" -cm hot -a 70
+   - Command: fsleyes /cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz data/AD01/pet/AD01_PiB_5070_MNI.nii.gz -dl "MNI Template" -dl "PET" -cm hot -a 70
 
 QUANTITATIVE CONFIRMATION:
 - Cerebellar mean: 4.15 (within expected 1-4 range for PiB)
@@ -3,9 +3,12 @@
 
 echo "=== DEBUG EXTRACTION FOR AD01 ==="
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # 1. Which PET file would the script use?
-PET_FILES=("data/AD01/pet/AD01_PiB_5070_MNI_thr_improved.nii.gz" 
-           "data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz")
+PET_FILES=("data/AD01/pet/AD01_PiB_5070_MNI_improved.nii.gz"
+           "data/AD01/pet/AD01_PiB_5070_MNI.nii.gz")
 
 for PET_FILE in "${PET_FILES[@]}"; do
     if [ -f "$PET_FILE" ]; then
@@ -13,24 +16,24 @@ for PET_FILE in "${PET_FILES[@]}"; do
         
         # 2. What's in this file?
         echo "  PET statistics:"
-        fslstats "$PET_FILE" -R -M -S
+        fslstats "$PET_FILE" $FSLSTATS_THR -R -M -S
         
         # 3. Extract with original mask
         echo "  Direct extraction with voi_ctx_binary.nii.gz:"
-        fslstats "$PET_FILE" -k vois/voi_ctx_binary.nii.gz -M
+        fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_ctx_binary.nii.gz -M
         
         echo "  Direct extraction with voi_cereb_binary.nii.gz:"
-        fslstats "$PET_FILE" -k vois/voi_cereb_binary.nii.gz -M
+        fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_cereb_binary.nii.gz -M
         
         # 4. Extract with aligned mask
         if [ -f "vois/voi_ctx_AD01.nii.gz" ]; then
             echo "  Extraction with voi_ctx_AD01.nii.gz:"
-            fslstats "$PET_FILE" -k vois/voi_ctx_AD01.nii.gz -M
+            fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_ctx_AD01.nii.gz -M
         fi
         
         if [ -f "vois/voi_cereb_AD01.nii.gz" ]; then
             echo "  Extraction with voi_cereb_AD01.nii.gz:"
-            fslstats "$PET_FILE" -k vois/voi_cereb_AD01.nii.gz -M
+            fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_cereb_AD01.nii.gz -M
         fi
         
         echo ""
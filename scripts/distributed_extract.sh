@@ -0,0 +1,27 @@
+#!/bin/bash
+# Distributed SUVR extraction
+#
+# Run this on every node that mounts the project directory (same path):
+# each node starts WORKERS worker processes that claim subjects through
+# lock files in work/extract/ and write into results/pipeline.db. Nodes
+# can join or die at any time; subjects of dead workers are picked up
+# once their lease expires.
+#
+#   WORKERS=16 bash scripts/distributed_extract.sh
+#   python -m pet_pipeline.distribute status extract    # progress
+
+WORKERS="${WORKERS:-$(nproc)}"
+QUEUE="${QUEUE:-extract}"
+
+mkdir -p logs
+python -m pet_pipeline.manifest build
+
+echo "=== $(hostname): starting ${WORKERS} workers on queue ${QUEUE} ==="
+for i in $(seq 1 "${WORKERS}"); do
+    python -m pet_pipeline.distribute worker "${QUEUE}" \
+        -- python -m pet_pipeline.extract {subject} {pet} --group {group} \
+        > "logs/worker_$(hostname)_${i}.log" 2>&1 &
+done
+wait
+
+python -m pet_pipeline.distribute status "${QUEUE}"
@@ -5,6 +5,9 @@ echo ""
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # Create comprehensive results file
 mkdir -p final_results
 echo "Subject,Group,Analyst,Pipeline,Cortical_Mean,Cerebellar_Mean,SUVR,Processing_Date,QC_Status" > final_results/all_fsl_results.csv
@@ -12,19 +15,10 @@ echo "Subject,Group,Analyst,Pipeline,Cortical_Mean,Cerebellar_Mean,SUVR,Processi
 extract_suvr() {
     local subject=$1
     local group=$2
+    local PET_FILE=$3
     
     echo "Processing $subject..."
     
-    # Try different possible file names (improved vs regular)
-    PET_FILE=""
-    for pet_file in "data/$subject/pet/${subject}_PiB_5070_MNI_thr_improved.nii.gz" \
-                    "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"; do
-        if [ -f "$pet_file" ]; then
-            PET_FILE="$pet_file"
-            break
-        fi
-    done
-    
     if [ -z "$PET_FILE" ]; then
         echo "  ✗ No PET file found for $subject"
         return 1
@@ -54,8 +48,8 @@ extract_suvr() {
     fi
     
     # Extract values
-    CORTICAL=$(fslstats "$PET_FILE" -k "vois/voi_ctx_${subject}.nii.gz" -M 2>/dev/null)
-    CEREBELLAR=$(fslstats "$PET_FILE" -k "vois/voi_cereb_${subject}.nii.gz" -M 2>/dev/null)
+    CORTICAL=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "vois/voi_ctx_${subject}.nii.gz" -M 2>/dev/null)
+    CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "vois/voi_cereb_${subject}.nii.gz" -M 2>/dev/null)
     
     # Quality check
     QC_STATUS="PASS"
@@ -97,22 +91,25 @@ extract_suvr() {
     echo "  SUVR: $SUVR ($QC_STATUS)"
 }
 
-# Process all AD subjects (01-5 if available)
+# Process all available subjects (one walk of data/, any IDs)
+# Prefer the re-registered PET (reprocess_problem_subjects.sh) over the
+# regular one
+python -m pet_pipeline.manifest build
 echo "=== PROCESSING AD SUBJECTS ==="
-for i in {1..5}; do
-    SUBJ=$(printf "AD%02d" $i)
-    if [ -d "data/$SUBJ" ]; then
-        extract_suvr "$SUBJ" "AD"
-    fi
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group AD --resolve pet \
+                            --variant MNI_improved --variant MNI)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJ PET <<< "$line"
+    extract_suvr "$SUBJ" "AD" "$PET"
 done
 
 echo ""
 echo "=== PROCESSING YC SUBJECTS ==="
-for i in {1..25}; do
-    SUBJ=$(printf "YC1%02d" $i)
-    if [ -d "data/$SUBJ" ]; then
-        extract_suvr "$SUBJ" "YC"
-    fi
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group YC --resolve pet \
+                            --variant MNI_improved --variant MNI)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJ PET <<< "$line"
+    extract_suvr "$SUBJ" "YC" "$PET"
 done
 
 echo ""
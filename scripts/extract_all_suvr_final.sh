@@ -5,17 +5,19 @@ echo ""
 # Create results directory
 mkdir -p results
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # Header for CSV
 echo "Subject,Group,Cortical_Mean,Cerebellar_Mean,SUVR" > results/all_suvr_results.csv
 
-# Process each subject
-for SUBJECT in AD01 AD02 AD03 AD04 AD05 YC101 YC102 YC103 YC104 YC105; do
-    PET_FILE="data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
-    
-    if [ ! -f "$PET_FILE" ]; then
-        echo "Skipping $SUBJECT - PET file not found"
-        continue
-    fi
+# Process each subject with an MNI-space PET (one walk of data/, any IDs,
+# and one manifest query for all of their paths)
+python -m pet_pipeline.manifest build
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --has pet:MNI --resolve pet \
+                            --variant MNI)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJECT PET_FILE <<< "$line"
     
     echo "Processing $SUBJECT..."
     
@@ -46,8 +48,8 @@ for SUBJECT in AD01 AD02 AD03 AD04 AD05 YC101 YC102 YC103 YC104 YC105; do
           -interp nearestneighbour 2>/dev/null
     
     # Extract values
-    CORTICAL=$(fslstats "$PET_FILE" -k "vois/voi_ctx_${SUBJECT}.nii" -M)
-    CEREBELLAR=$(fslstats "$PET_FILE" -k "vois/voi_cereb_${SUBJECT}.nii" -M)
+    CORTICAL=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "vois/voi_ctx_${SUBJECT}.nii" -M)
+    CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "vois/voi_cereb_${SUBJECT}.nii" -M)
     
     if [ -z "$CORTICAL" ] || [ -z "$CEREBELLAR" ]; then
         echo "  Error extracting values for $SUBJECT"
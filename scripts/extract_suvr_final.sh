@@ -9,24 +9,15 @@ echo "Subject,Group,Reference,Cortical_Mean,Ref_Mean,SUVR,Processing_Date" > "$O
 extract_for_subject() {
     local subject=$1
     local group=$2
+    local PET_FILE=$3
     
     echo "Processing $subject..."
     
-    # Find PET file
-    PET_FILE=""
-    for pet_file in "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz" \
-                    "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"; do
-        if [ -f "$pet_file" ]; then
-            PET_FILE="$pet_file"
-            echo "  Using: $(basename $PET_FILE)"
-            break
-        fi
-    done
-    
     if [ -z "$PET_FILE" ]; then
         echo "  ✗ No PET file found"
         return 1
     fi
+    echo "  Using: $(basename $PET_FILE)"
     
     # Check PET statistics
     PET_STATS=$(fslstats "$PET_FILE" -R -M -S)
@@ -80,6 +71,13 @@ extract_for_subject() {
     echo ""
 }
 
+# Index data/ once and resolve every subject's MNI PET in one call
+python -m pet_pipeline.manifest build
+declare -A PET_FILES=()
+while IFS=$'\t' read -r subject pet; do
+    PET_FILES[$subject]=$pet
+done < <(python -m pet_pipeline.manifest list --resolve pet --variant MNI)
+
 # Process subjects
 echo "=== TEST SUBJECTS ==="
 for subject in AD01 AD02 AD03 AD20 AD21 YC101 YC104 YC105; do
@@ -89,7 +87,7 @@ for subject in AD01 AD02 AD03 AD20 AD21 YC101 YC104 YC105; do
         else
             group="YC"
         fi
-        extract_for_subject "$subject" "$group"
+        extract_for_subject "$subject" "$group" "${PET_FILES[$subject]}"
     fi
 done
 
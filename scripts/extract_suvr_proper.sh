@@ -12,25 +12,12 @@ echo "Subject,Group,Analyst,Pipeline,Cortical_Mean,Cerebellar_Mean,SUVR,Processi
 extract_proper() {
     local subject=$1
     local group=$2
+    # the main MNI-registered PET file (NOT thresholded), else the T1-space one
+    local PET_FILE=$3
     
     echo "Processing $subject..."
     
-    # Use the main MNI-registered PET file (NOT thresholded)
-    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz"
-    
-    if [ ! -f "$PET_FILE" ]; then
-        echo "  ⚠️  Main PET file not found, trying alternatives..."
-        # Try other possible files in order of preference
-        for pet_file in "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz" \
-                        "data/$subject/pet/${subject}_PiB_5070_T1.nii.gz"; do
-            if [ -f "$pet_file" ]; then
-                PET_FILE="$pet_file"
-                break
-            fi
-        done
-    fi
-    
-    if [ ! -f "$PET_FILE" ]; then
+    if [ -z "$PET_FILE" ]; then
         echo "  ✗ No PET file found for $subject"
         echo "$subject,$group,David,FSL,,,,$(date +%Y-%m-%d),NO_PET_FILE" >> "$OUTPUT"
         return 1
@@ -119,21 +106,22 @@ extract_proper() {
 }
 
 # Process ALL subjects
+python -m pet_pipeline.manifest build
 echo "=== PROCESSING AD SUBJECTS (01-25) ==="
-for i in {1..25}; do
-    SUBJ=$(printf "AD%02d" $i)
-    if [ -d "data/$SUBJ" ]; then
-        extract_proper "$SUBJ" "AD"
-    fi
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group AD --resolve pet \
+                            --variant MNI --variant T1)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJ PET <<< "$line"
+    extract_proper "$SUBJ" "AD" "$PET"
 done
 
 echo ""
 # echo "=== PROCESSING YC SUBJECTS (101-125) ==="
-# for i in {101..125}; do
-    # SUBJ=$(printf "YC%d" $i)
-    # if [ -d "data/$SUBJ" ]; then
-        # extract_proper "$SUBJ" "YC"
-    # fi
+# mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group YC --resolve pet \
+#                             --variant MNI --variant T1)
+# for line in "${SUBJECTS[@]}"; do
+    # IFS=$'\t' read -r SUBJ PET <<< "$line"
+    # extract_proper "$SUBJ" "YC" "$PET"
 # done
 
 echo ""
@@ -9,24 +9,16 @@ echo "Subject,Group,Cortical_Mean,Cerebellar_Mean,SUVR,Processing_Date,Note" > "
 extract_simple() {
     local subject=$1
     local group=$2
+    # the standard MNI-registered PET file (non-thresholded)
+    local PET_FILE=$3
     
     echo "Processing $subject..."
     
-    # Use the standard MNI-registered PET file (non-thresholded)
-    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz"
-    
-    if [ ! -f "$PET_FILE" ]; then
-        echo "  ✗ $PET_FILE not found"
-        # Try thresholded version
-        PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"
-        if [ ! -f "$PET_FILE" ]; then
-            echo "  ✗ No PET file found"
-            return 1
-        fi
-        echo "  Using thresholded version"
-    else
-        echo "  Using: $(basename $PET_FILE)"
+    if [ -z "$PET_FILE" ]; then
+        echo "  ✗ No MNI PET file for $subject"
+        return 1
     fi
+    echo "  Using: $(basename $PET_FILE)"
     
     # Extract directly - NO REGISTRATION
     CORTICAL=$(fslstats "$PET_FILE" -k vois/voi_ctx_binary.nii.gz -M 2>/dev/null)
@@ -56,21 +48,20 @@ extract_simple() {
     echo ""
 }
 
-# Process all subjects
+# Process all subjects (one walk of data/, any IDs; one manifest query per group)
+python -m pet_pipeline.manifest build
 echo "=== AD SUBJECTS ==="
-for i in {1..25}; do
-    SUBJ=$(printf "AD%02d" $i)
-    if [ -d "data/$SUBJ" ]; then
-        extract_simple "$SUBJ" "AD"
-    fi
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group AD --resolve pet --variant MNI)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJ PET <<< "$line"
+    extract_simple "$SUBJ" "AD" "$PET"
 done
 
 echo "=== YC SUBJECTS ==="
-for i in {101..125}; do
-    SUBJ=$(printf "YC%d" $i)
-    if [ -d "data/$SUBJ" ]; then
-        extract_simple "$SUBJ" "YC"
-    fi
+mapfile -t SUBJECTS < <(python -m pet_pipeline.manifest list --group YC --resolve pet --variant MNI)
+for line in "${SUBJECTS[@]}"; do
+    IFS=$'\t' read -r SUBJ PET <<< "$line"
+    extract_simple "$SUBJ" "YC" "$PET"
 done
 
 echo ""
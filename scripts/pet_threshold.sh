@@ -0,0 +1,14 @@
+#!/bin/bash
+# Source from a script that measures or displays MNI-space PET:
+#
+#   source "$(dirname "$0")/pet_threshold.sh"
+#   fslstats "$PET_FILE" $FSLSTATS_THR -k "$VOI" -M
+#
+# No _MNI_thr copies are written any more; the intensity threshold is
+# config.PET_THRESHOLD, which pet_pipeline.extract applies itself.
+# FSLSTATS_THR ("-l <thr>") and FSLMATHS_THR ("-thr <thr>") give the
+# fslstats / fslmaths equivalent of the old thresholded file, and are
+# empty when the threshold is disabled (PET_THRESHOLD = None).
+PET_THR=$(python -c "from pet_pipeline import config; print(config.PET_THRESHOLD or '')")
+FSLSTATS_THR=${PET_THR:+-l $PET_THR}
+FSLMATHS_THR=${PET_THR:+-thr $PET_THR}
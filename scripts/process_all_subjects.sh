@@ -1,31 +1,29 @@
 #!/bin/bash
 echo "=== PROCESSING ALL SUBJECTS WITH FIXED ORIENTATION ==="
-echo "AD01-AD25 and YC101-YC125"
+echo "All subjects in data/ with a raw T1 and PET"
 echo ""
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
-# Check which subjects actually have data
+# Record every FSL call and Python step (python -m pet_pipeline.trace report)
+source "$(dirname "$0")/trace_fsl.sh"
+
+# Check which subjects actually have data (one walk of data/, any IDs)
 echo "=== CHECKING AVAILABLE DATA ==="
+python -m pet_pipeline.manifest build
 AVAILABLE_SUBJECTS=()
+declare -A T1_FILES=() PET_FILES=()
+while IFS=$'\t' read -r SUBJ T1; do
+    AVAILABLE_SUBJECTS+=("$SUBJ")
+    T1_FILES[$SUBJ]=$T1
+done < <(python -m pet_pipeline.manifest list --has anat:raw --has pet:raw --resolve anat)
+while IFS=$'\t' read -r SUBJ PET; do
+    PET_FILES[$SUBJ]=$PET
+done < <(python -m pet_pipeline.manifest list --has anat:raw --has pet:raw --resolve pet \
+             --variant raw)
 
-for i in {1..25}; do
-    AD_SUBJ=$(printf "AD%02d" $i)
-    # YC_SUBJ=$(printf "YC1%02d" $i)
-    
-    if [ -f "data/$AD_SUBJ/anat/${AD_SUBJ}_MR.nii" ] && [ -f "data/$AD_SUBJ/pet/${AD_SUBJ}_PiB_5070.nii" ]; then
-        echo "✓ $AD_SUBJ: Data available"
-        AVAILABLE_SUBJECTS+=("$AD_SUBJ")
-    else
-        echo "✗ $AD_SUBJ: Missing data"
-    fi
-    
-    if [ -f "data/$YC_SUBJ/anat/${YC_SUBJ}_MR.nii" ] && [ -f "data/$YC_SUBJ/pet/${YC_SUBJ}_PiB_5070.nii" ]; then
-        echo "✓ $YC_SUBJ: Data available"
-        AVAILABLE_SUBJECTS+=("$YC_SUBJ")
-    else
-        echo "✗ $YC_SUBJ: Missing data"
-    fi
+for SUBJ in "${AVAILABLE_SUBJECTS[@]}"; do
+    echo "✓ $SUBJ: Data available"
 done
 
 echo ""
@@ -34,6 +32,7 @@ echo ""
 
 # Process each available subject
 for SUBJECT in "${AVAILABLE_SUBJECTS[@]}"; do
+    export PIPELINE_SUBJECT="$SUBJECT"
     echo "=== PROCESSING $SUBJECT ==="
     
     if [[ $SUBJECT == AD* ]]; then
@@ -42,46 +41,41 @@ for SUBJECT in "${AVAILABLE_SUBJECTS[@]}"; do
         GROUP="YC"
     fi
     
-    T1_FILE="data/$SUBJECT/anat/${SUBJECT}_MR.nii"
-    PET_FILE="data/$SUBJECT/pet/${SUBJECT}_PiB_5070.nii"
+    T1_FILE=${T1_FILES[$SUBJECT]}
+    PET_FILE=${PET_FILES[$SUBJECT]}
     
     # Create directories
     mkdir -p "data/$SUBJECT/transform"
     
-    # Step 1: Reorient if needed
-    echo "1. Checking/reorienting..."
-    fslreorient2std "$T1_FILE" "${T1_FILE%.nii}_reoriented.nii" 2>/dev/null
-    if [ -f "${T1_FILE%.nii}_reoriented.nii" ]; then
-        mv "${T1_FILE%.nii}_reoriented.nii" "$T1_FILE"
-        echo "   T1 reoriented"
-    fi
-    
-    fslreorient2std "$PET_FILE" "${PET_FILE%.nii}_reoriented.nii" 2>/dev/null
-    if [ -f "${PET_FILE%.nii}_reoriented.nii" ]; then
-        mv "${PET_FILE%.nii}_reoriented.nii" "$PET_FILE"
-        echo "   PET reoriented"
-    fi
+    # Step 1: Standard-orientation inputs for the FSL tools (originals
+    # untouched; a _reoriented working copy only when one is needed)
+    echo "1. Checking orientation..."
+    T1_INPUT=$(python -m pet_pipeline.reorient "$T1_FILE")
+    PET_INPUT=$(python -m pet_pipeline.reorient "$PET_FILE")
+    [ "$T1_INPUT" != "$T1_FILE" ] && echo "   T1 reoriented: $T1_INPUT"
+    [ "$PET_INPUT" != "$PET_FILE" ] && echo "   PET reoriented: $PET_INPUT"
     
     # Step 2: Brain extraction
     echo "2. Brain extraction..."
-    bet "$T1_FILE" "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" \
+    bet "$T1_INPUT" "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" \
         -f 0.25 -g -0.1 -B -R
     
     # Step 3: T1 → MNI
     echo "3. T1 to MNI..."
-    flirt -in "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" \
-        -ref "$MNI_TEMPLATE" \
-        -out "data/$SUBJECT/anat/${SUBJECT}_MR_MNI.nii.gz" \
-        -omat "data/$SUBJECT/transform/T1_to_MNI.mat" \
-        -dof 12 -searchrx -30 30 -searchry -30 30 -searchrz -30 30
+    # (warm-started from earlier results, full -30..30 search as fallback)
+    python -m pet_pipeline.register T1_to_MNI "$SUBJECT" \
+        "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" "$MNI_TEMPLATE" \
+        "data/$SUBJECT/transform/T1_to_MNI.mat" \
+        --out "data/$SUBJECT/anat/${SUBJECT}_MR_MNI.nii.gz" \
+        --dof 12 --search 30
     
     # Step 4: PET → T1
     echo "4. PET to T1..."
-    flirt -in "$PET_FILE" \
-        -ref "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" \
-        -out "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_T1.nii.gz" \
-        -omat "data/$SUBJECT/transform/PET_to_T1.mat" \
-        -dof 6 -cost mutualinfo -searchrx -15 15 -searchry -15 15 -searchrz -15 15
+    python -m pet_pipeline.register PET_to_T1 "$SUBJECT" \
+        "$PET_INPUT" "data/$SUBJECT/anat/${SUBJECT}_MR_brain.nii.gz" \
+        "data/$SUBJECT/transform/PET_to_T1.mat" \
+        --out "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_T1.nii.gz" \
+        --dof 6 --cost mutualinfo --search 15
     
     # Step 5: PET → MNI
     echo "5. PET to MNI..."
@@ -89,16 +83,13 @@ for SUBJECT in "${AVAILABLE_SUBJECTS[@]}"; do
         -concat "data/$SUBJECT/transform/T1_to_MNI.mat" \
         "data/$SUBJECT/transform/PET_to_T1.mat"
     
-    flirt -in "$PET_FILE" \
-        -ref "$MNI_TEMPLATE" \
-        -out "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI.nii.gz" \
-        -applyxfm -init "data/$SUBJECT/transform/PET_to_MNI.mat" \
-        -paddingsize 1
-    
-    # Step 6: Threshold
-    echo "6. Threshold..."
-    fslmaths "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI.nii.gz" \
-        -thr 0.001 "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
+    # Resample the raw PET once (reorientation folded into the mapping)
+    python -m pet_pipeline.resample "$PET_FILE" \
+        "data/$SUBJECT/transform/PET_to_MNI.mat" \
+        "data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI.nii.gz" \
+        --ref "$MNI_TEMPLATE" --padding 1
+    # (the 0.001 intensity threshold is applied at extraction time by
+    # pet_pipeline.extract, no _MNI_thr copy is written)
     
     echo "✓ $SUBJECT processed"
     echo ""
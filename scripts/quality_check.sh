@@ -8,25 +8,30 @@ fi
 echo "=== Quality Check for $SUBJ_ID ==="
 echo ""
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+PET_FILE=$SUBJ_ID/pet/${SUBJ_ID}_PiB_5070_MNI.nii.gz
+
+
 echo "1. Image dimensions:"
-PET_DIM=$(fslinfo $SUBJ_ID/pet/${SUBJ_ID}_PiB_5070_MNI_thr.nii.gz | grep -E "dim1|dim2|dim3" | awk '{print $2}' | tr '\n' ' ')
+PET_DIM=$(fslinfo $PET_FILE | grep -E "dim1|dim2|dim3" | awk '{print $2}' | tr '\n' ' ')
 MNI_DIM=$(fslinfo $FSLDIR/data/standard/MNI152_T1_2mm.nii.gz | grep -E "dim1|dim2|dim3" | awk '{print $2}' | tr '\n' ' ')
 echo "   PET:  $PET_DIM"
 echo "   MNI:  $MNI_DIM"
 
 echo ""
 echo "2. Value ranges:"
-fslstats $SUBJ_ID/pet/${SUBJ_ID}_PiB_5070_MNI_thr.nii.gz -R -M -S
+fslstats $PET_FILE $FSLSTATS_THR -R -M -S
 
 echo ""
 echo "3. Cerebellar region:"
-CEREB_VAL=$(fslstats $SUBJ_ID/pet/${SUBJ_ID}_PiB_5070_MNI_thr.nii.gz -k vois/voi_cereb_binary.nii -M)
+CEREB_VAL=$(fslstats $PET_FILE $FSLSTATS_THR -k vois/voi_cereb_binary.nii -M)
 echo "   Mean: $CEREB_VAL (should be ~1-2)"
 
 echo ""
 echo "4. Visual check command:"
 echo "   fsleyes $FSLDIR/data/standard/MNI152_T1_2mm.nii.gz \\"
-echo "          $SUBJ_ID/pet/${SUBJ_ID}_PiB_5070_MNI_thr.nii.gz -cm hot \\"
+echo "          $PET_FILE -cm hot -dr ${PET_THR:-0} 4 \\"
 echo "          vois/voi_ctx_binary.nii -cm red -a 30 \\"
 echo "          vois/voi_cereb_binary.nii -cm green -a 30 &"
 
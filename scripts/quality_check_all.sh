@@ -5,13 +5,16 @@ echo ""
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 check_subject() {
     local subject=$1
     local group=$2
     
     echo "=== $subject QUALITY CHECK ==="
     
-    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"
+    PET_FILE="data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz"
     CEREB_VOI="vois/voi_cereb_${subject}.nii.gz"
     
     if [ ! -f "$PET_FILE" ]; then
@@ -20,7 +23,7 @@ check_subject() {
     fi
     
     # 1. Check cerebellar values
-    CEREBELLAR=$(fslstats "$PET_FILE" -k "$CEREB_VOI" -M 2>/dev/null)
+    CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "$CEREB_VOI" -M 2>/dev/null)
     echo "Cerebellar mean: $CEREBELLAR"
     
     # Expected range for PiB: 1-4
@@ -34,10 +37,10 @@ check_subject() {
         echo "✓ Cerebellar in expected range (1-4)"
     fi
     
-    # 2. Check dimensions
+    # 2. Check dimensions (header only, flags files off the 2mm MNI grid)
     echo ""
-    echo "Image dimensions:"
-    fslinfo "$PET_FILE" | grep -E "dim1|dim2|dim3|pixdim"
+    echo "Image geometry:"
+    python -m pet_pipeline.audit "$PET_FILE"
     
     # 3. Visual check commands
     echo ""
@@ -66,3 +69,7 @@ echo "=== QUALITY ISSUES SUMMARY ==="
 echo "1. AD02: Extreme values (needs re-processing)"
 echo "2. AD04: High cerebellar (9.8, check alignment)"
 echo "3. Check all visual alignments"
+
+echo ""
+echo "=== COHORT CONTACT SHEET ==="
+python -m pet_pipeline.contact_sheet --out qc/contact_sheet.html
@@ -17,8 +17,7 @@ extract_quick() {
     
     # Find PET file
     PET_FILE=""
-    for file in "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz" \
-                "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz"; do
+    for file in "data/$subject/pet/${subject}_PiB_5070_MNI.nii.gz"; do
         if [ -f "$file" ]; then
             PET_FILE="$file"
             break
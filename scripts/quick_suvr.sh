@@ -1,7 +1,10 @@
 #!/bin/bash
 echo "=== QUICK SUVR CALCULATION ==="
 
-PET_FILE="data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz"
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
+PET_FILE="data/AD01/pet/AD01_PiB_5070_MNI.nii.gz"
 
 if [ ! -f "$PET_FILE" ]; then
     echo "ERROR: PET file not found: $PET_FILE"
@@ -11,8 +14,8 @@ if [ ! -f "$PET_FILE" ]; then
 fi
 
 echo "Calculating SUVR for AD01..."
-CORTICAL=$(fslstats "$PET_FILE" -k vois/voi_ctx_binary.nii -M)
-CEREBELLAR=$(fslstats "$PET_FILE" -k vois/voi_cereb_binary.nii -M)
+CORTICAL=$(fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_ctx_binary.nii -M)
+CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k vois/voi_cereb_binary.nii -M)
 SUVR=$(echo "$CORTICAL / $CEREBELLAR" | bc -l)
 
 echo ""
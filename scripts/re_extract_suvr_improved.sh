@@ -6,13 +6,28 @@ echo "Subject,Group,Cortical_Mean,Cerebellar_Mean,SUVR,Notes" > results/suvr_imp
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
-for SUBJECT in AD01 AD02 AD03 AD04 AD05 YC101 YC102 YC103 YC104 YC105; do
-    PET_FILE="data/$SUBJECT/pet/${SUBJECT}_PiB_5070_MNI_thr.nii.gz"
-    
-    if [ ! -f "$PET_FILE" ]; then
-        echo "$SUBJECT,SKIP,NA,NA,NA,Missing PET file" >> results/suvr_improved.csv
-        continue
-    fi
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
+# Every subject with an MNI-space PET (one walk of data/, any IDs)
+python -m pet_pipeline.manifest build
+SUBJECTS=""
+declare -A PET_FILES=()
+while IFS=$'\t' read -r SUBJECT PET; do
+    SUBJECTS+="$SUBJECT "
+    PET_FILES[$SUBJECT]=$PET
+done < <(python -m pet_pipeline.manifest list --has pet:MNI --resolve pet --variant MNI)
+
+# Candidate alignments per subject: the original MNI-space VOIs, a fresh
+# built-in registration (vois/MNI_to_<SUBJ>_aligned.mat) and any matrices
+# left by earlier fixes. All are scored in one batch (NMI with the template,
+# brain-mask Dice, CG/Pons plausibility) and the best one's VOIs are
+# written as vois/voi_{ctx,CG}_<SUBJ>_selected.nii.gz
+python -m pet_pipeline.align $SUBJECTS --template "$MNI_TEMPLATE"
+python -m pet_pipeline.score $SUBJECTS --template "$MNI_TEMPLATE"
+
+for SUBJECT in $SUBJECTS; do
+    PET_FILE=${PET_FILES[$SUBJECT]}
     
     # Determine group
     if [[ "$SUBJECT" == AD* ]]; then
@@ -23,40 +38,19 @@ for SUBJECT in AD01 AD02 AD03 AD04 AD05 YC101 YC102 YC103 YC104 YC105; do
     
     echo "Processing $SUBJECT..."
     
-    # Use improved registration for problematic subjects, original for others
-    if [[ "$SUBJECT" == "AD02" || "$SUBJECT" == "AD04" ]]; then
-        # Improved registration
-        flirt -in "$MNI_TEMPLATE" \
-              -ref "$PET_FILE" \
-              -out "vois/MNI_to_${SUBJECT}_final.nii.gz" \
-              -omat "vois/MNI_to_${SUBJECT}_final.mat" \
-              -dof 12 -cost mutualinfo
-        
-        flirt -in vois/voi_ctx_binary.nii \
-              -ref "$PET_FILE" \
-              -out "vois/voi_ctx_${SUBJECT}_final.nii" \
-              -applyxfm -init "vois/MNI_to_${SUBJECT}_final.mat" \
-              -interp nearestneighbour
-        
-        flirt -in vois/voi_cereb_binary.nii \
-              -ref "$PET_FILE" \
-              -out "vois/voi_cereb_${SUBJECT}_final.nii" \
-              -applyxfm -init "vois/MNI_to_${SUBJECT}_final.mat" \
-              -interp nearestneighbour
-        
-        CTX_MASK="vois/voi_ctx_${SUBJECT}_final.nii"
-        CEREB_MASK="vois/voi_cereb_${SUBJECT}_final.nii"
-        NOTES="Improved alignment"
-    else
-        # Use original method (worked for these)
-        CTX_MASK="vois/voi_ctx_${SUBJECT}.nii"
-        CEREB_MASK="vois/voi_cereb_${SUBJECT}.nii"
-        NOTES="Original alignment"
+    # Alignment chosen by pet_pipeline.score
+    VARIANT=$(awk -F, -v s="$SUBJECT" '$1 == s && $9 == "yes" {print $2}' results/alignment_scores.csv)
+    PLAUSIBLE=$(awk -F, -v s="$SUBJECT" '$1 == s && $9 == "yes" {print $7}' results/alignment_scores.csv)
+    CTX_MASK="vois/voi_ctx_${SUBJECT}_selected.nii.gz"
+    CEREB_MASK="vois/voi_CG_${SUBJECT}_selected.nii.gz"
+    NOTES="Selected alignment: ${VARIANT:-none}"
+    if [ "$PLAUSIBLE" != "yes" ]; then
+        NOTES="$NOTES (implausible CG/Pons ratio)"
     fi
     
     # Extract values
-    CORTICAL=$(fslstats "$PET_FILE" -k "$CTX_MASK" -M)
-    CEREBELLAR=$(fslstats "$PET_FILE" -k "$CEREB_MASK" -M)
+    CORTICAL=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "$CTX_MASK" -M)
+    CEREBELLAR=$(fslstats "$PET_FILE" $FSLSTATS_THR -k "$CEREB_MASK" -M)
     
     if [ -z "$CORTICAL" ] || [ -z "$CEREBELLAR" ]; then
         echo "$SUBJECT,$GROUP,NA,NA,NA,Error extracting" >> results/suvr_improved.csv
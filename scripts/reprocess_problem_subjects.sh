@@ -5,19 +5,19 @@ echo ""
 
 MNI_TEMPLATE="/cvmfs/neurodesk.ardc.edu.au/containers/mrtrix3_3.0.1_20200908/mrtrix3_3.0.1_20200908.simg/opt/fsl-6.0.3/data/standard/MNI152_T1_2mm.nii.gz"
 
+# Record every FSL call and Python step (python -m pet_pipeline.trace report)
+source "$(dirname "$0")/trace_fsl.sh"
+
 reprocess_subject() {
     local subject=$1
     local group=$2
+    export PIPELINE_SUBJECT="$subject"
     
     echo "=== RE-PROCESSING $subject ==="
     
     T1_FILE="data/$subject/anat/${subject}_MR.nii"
     PET_FILE="data/$subject/pet/${subject}_PiB_5070.nii"
     
-    # Backup old results
-    mv "data/$subject/pet/${subject}_PiB_5070_MNI_thr.nii.gz" \
-       "data/$subject/pet/${subject}_PiB_5070_MNI_thr_BACKUP.nii.gz" 2>/dev/null
-    
     # 1. Check if PET needs intensity scaling (AD02 issue)
     echo "Checking PET intensity..."
     PET_STATS=$(fslstats "$PET_FILE" -R -M 2>/dev/null)
@@ -35,21 +35,22 @@ reprocess_subject() {
     bet "$T1_FILE" "data/$subject/anat/${subject}_MR_brain.nii.gz" \
         -f 0.25 -g -0.1 -B -R  # Tighter parameters
     
-    # 3. T1 → MNI with better alignment
+    # 3. T1 → MNI with better alignment: the alternative cost functions,
+    #    DOF and search ranges run concurrently, first acceptable one wins
     echo "T1 to MNI (improved)..."
-    flirt -in "data/$subject/anat/${subject}_MR_brain.nii.gz" \
-        -ref "$MNI_TEMPLATE" \
-        -out "data/$subject/anat/${subject}_MR_MNI_improved.nii.gz" \
-        -omat "data/$subject/transform/T1_to_MNI_improved.mat" \
-        -dof 12 -searchrx -30 30 -searchry -30 30 -searchrz -30 30
+    python -m pet_pipeline.register T1_to_MNI "$subject" \
+        "data/$subject/anat/${subject}_MR_brain.nii.gz" "$MNI_TEMPLATE" \
+        "data/$subject/transform/T1_to_MNI_improved.mat" \
+        --out "data/$subject/anat/${subject}_MR_MNI_improved.nii.gz" \
+        --dof 12 --search 30 --race
     
-    # 4. PET → T1 with better coregistration
+    # 4. PET → T1 with better coregistration (raced the same way)
     echo "PET to T1 coregistration..."
-    flirt -in "$PET_FILE" \
-        -ref "data/$subject/anat/${subject}_MR_brain.nii.gz" \
-        -out "data/$subject/pet/${subject}_PiB_5070_T1_improved.nii.gz" \
-        -omat "data/$subject/transform/PET_to_T1_improved.mat" \
-        -dof 6 -cost mutualinfo -searchrx -15 15 -searchry -15 15 -searchrz -15 15
+    python -m pet_pipeline.register PET_to_T1 "$subject" \
+        "$PET_FILE" "data/$subject/anat/${subject}_MR_brain.nii.gz" \
+        "data/$subject/transform/PET_to_T1_improved.mat" \
+        --out "data/$subject/pet/${subject}_PiB_5070_T1_improved.nii.gz" \
+        --dof 6 --cost mutualinfo --search 15 --race
     
     # 5. PET → MNI
     echo "PET to MNI..."
@@ -62,11 +63,7 @@ reprocess_subject() {
         -out "data/$subject/pet/${subject}_PiB_5070_MNI_improved.nii.gz" \
         -applyxfm -init "data/$subject/transform/PET_to_MNI_improved.mat" \
         -paddingsize 1
-    
-    # 6. Threshold
-    echo "Thresholding..."
-    fslmaths "data/$subject/pet/${subject}_PiB_5070_MNI_improved.nii.gz" \
-        -thr 0.001 "data/$subject/pet/${subject}_PiB_5070_MNI_thr_improved.nii.gz"
+    # (thresholding happens at extraction time, see pet_pipeline.extract)
     
     echo "✓ $subject re-processed"
     echo ""
@@ -20,6 +20,24 @@ mkdir -p ${LOG_DIR} ${RESULTS_DIR} ${QC_DIR}
 LOG_FILE="${LOG_DIR}/pipeline_$(date +%Y%m%d_%H%M%S).log"
 exec > >(tee -a "${LOG_FILE}") 2>&1
 
+# Every per-subject stage runs through the journal (results/pipeline.db):
+# stages already done with unchanged inputs/outputs are skipped and their
+# output replayed, failures are retried with backoff and a subject failing
+# in repeated runs is quarantined, so a restart resumes where it stopped.
+# Check progress with: python -m pet_pipeline.journal status
+export PIPELINE_RUN_ID="$(date +%Y%m%d_%H%M%S)"
+export RESULTS_DIR QC_DIR
+
+# Record every FSL call and Python step (python -m pet_pipeline.trace report)
+source "$(dirname "$0")/trace_fsl.sh"
+
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
+# VOI files every extraction reads (journal inputs of the extract stage)
+VOI_FILES=$(python -c "from pet_pipeline import config; \
+print(' '.join(p for p in map(config.voi_path, config.VOI_FILES) if p))")
+
 echo "========================================================================"
 echo "AMYLOID PET PROCESSING PIPELINE"
 echo "Started: $(date)"
@@ -33,38 +51,20 @@ normalize_pet_intensity() {
     local subject=$1
     local pet_file=$2
     
-    echo "  [NORMALIZE] Checking intensity scaling for ${subject}"
+    echo "  [NORMALIZE] Checking intensity scaling for ${subject}" >&2
     
-    # Get cerebellar mean for this subject
-    cerebellar_mean=$(fslstats "${pet_file}" -k vois/voi_cereb_binary.nii.gz -M 2>/dev/null)
-    
-    if [[ -z "${cerebellar_mean}" ]]; then
-        echo "    ⚠️  Could not extract cerebellar value"
+    # Expected cerebellar range for PiB: 1.0-4.0. Above config.NORMALIZE_ABOVE
+    # (10) a scale factor (target 3.5 / cerebellar mean) is recorded in the
+    # results store and applied lazily during extraction; no normalized copy
+    # is written.
+    python -m pet_pipeline.normalize "${subject}" --pet "${pet_file}" \
+        --target 3.5 | sed 's/^/    /' >&2
+    if [[ ${PIPESTATUS[0]} -ne 0 ]]; then
+        # no cerebellar mean could be computed
         return 1
     fi
     
-    # Expected cerebellar range for PiB: 1.0-4.0
-    if (( $(echo "${cerebellar_mean} > 10" | bc -l 2>/dev/null) )); then
-        echo "    ⚠️  High cerebellar mean detected: ${cerebellar_mean}"
-        echo "    → Likely needs intensity normalization"
-        
-        # Target cerebellar mean (based on good subjects)
-        target_mean=3.5
-        
-        # Calculate scaling factor
-        scale_factor=$(echo "${target_mean} / ${cerebellar_mean}" | bc -l 2>/dev/null)
-        echo "    → Applying scaling factor: ${scale_factor}"
-        
-        # Create normalized version
-        normalized_file="${pet_file%.nii.gz}_normalized.nii.gz"
-        fslmaths "${pet_file}" -mul "${scale_factor}" "${normalized_file}"
-        
-        echo "    ✓ Created normalized file: $(basename ${normalized_file})"
-        echo "${normalized_file}"
-    else
-        echo "    ✓ Intensity looks OK (cerebellar mean: ${cerebellar_mean})"
-        echo "${pet_file}"
-    fi
+    echo "${pet_file}"
 }
 
 # ----------------------------------------------------------------------------
@@ -78,54 +78,23 @@ extract_suvr_values() {
     
     echo "  [EXTRACT] Processing ${subject} (${group})"
     
-    # Define reference regions (from GAIN table)
-    declare -A ref_regions=(
-        ["CG"]="vois/voi_cereb_binary.nii.gz"    # Cerebellar Gray
-        ["WC"]="vois/voi_WhlCbl_2mm.nii"         # Whole Cerebellum
-        ["Pons"]="vois/voi_Pons_2mm.nii"         # Pons
-    )
-    
-    # Always use cortical mask
-    cortical_mask="vois/voi_ctx_binary.nii.gz"
-    
-    if [[ ! -f "${cortical_mask}" ]]; then
-        echo "    ✗ Cortical mask not found!"
-        return 1
-    fi
-    
-    # Extract cortical value
-    cortical_mean=$(fslstats "${pet_file}" -k "${cortical_mask}" -M 2>/dev/null)
-    
-    if [[ -z "${cortical_mean}" ]]; then
-        echo "    ✗ Failed to extract cortical value"
+    # One pass over the PET gives the cortical and reference-region means
+    # (fslstats -M semantics), SUVRs and the QC moments for every VOI.
+    # Lines come back as REF:cortical_mean:ref_mean:suvr:qc_status, CG first.
+    results=()
+    while IFS= read -r line; do
+        [[ -n "${line}" ]] || continue
+        results+=("${line}")
+        IFS=':' read -r ref_name _ _ suvr qc_status <<< "${line}"
+        echo "    ${ref_name}: SUVR = ${suvr} (${qc_status})"
+    done < <(python -m pet_pipeline.extract "${subject}" "${pet_file}" \
+                 --group "${group}" --qc-dir "${QC_DIR}")
+
+    if [[ ${#results[@]} -eq 0 ]]; then
+        echo "    ✗ Failed to extract regional values"
         return 1
     fi
     
-    # Extract for each reference region
-    results=()
-    for ref_name in "${!ref_regions[@]}"; do
-        ref_mask="${ref_regions[${ref_name}]}"
-        
-        if [[ -f "${ref_mask}" ]]; then
-            ref_mean=$(fslstats "${pet_file}" -k "${ref_mask}" -M 2>/dev/null)
-            
-            if [[ -n "${ref_mean}" ]] && (( $(echo "${ref_mean} > 0" | bc -l 2>/dev/null) )); then
-                suvr=$(echo "${cortical_mean} / ${ref_mean}" | bc -l 2>/dev/null)
-                
-                # Quality checks
-                qc_status="PASS"
-                if [[ "${group}" == "AD" ]] && (( $(echo "${suvr} < 1.2" | bc -l 2>/dev/null) )); then
-                    qc_status="CHECK_AD_LOW"
-                elif [[ "${group}" == "YC" ]] && (( $(echo "${suvr} > 1.4" | bc -l 2>/dev/null) )); then
-                    qc_status="CHECK_YC_HIGH"
-                fi
-                
-                results+=("${ref_name}:${cortical_mean}:${ref_mean}:${suvr}:${qc_status}")
-                echo "    ${ref_name}: SUVR = ${suvr} (${qc_status})"
-            fi
-        fi
-    done
-    
     # Save to results file
     result_file="${RESULTS_DIR}/${subject}_results.csv"
     echo "Reference,Cortical_Mean,Ref_Mean,SUVR,QC_Status" > "${result_file}"
@@ -155,11 +124,9 @@ create_qc_image() {
     # Simple check - save slice images
     echo "    QC images saved to: ${QC_DIR}/${subject}_*.png"
     
-    # For now, just record statistics
-    stats_file="${QC_DIR}/${subject}_stats.txt"
-    fslstats "${pet_file}" -R -M -S > "${stats_file}"
-    fslstats "${pet_file}" -k vois/voi_ctx_binary.nii.gz -M -S >> "${stats_file}"
-    fslstats "${pet_file}" -k vois/voi_cereb_binary.nii.gz -M -S >> "${stats_file}"
+    # Regional statistics were recorded during extraction (single pass):
+    # qc/<subject>_stats.json and the qc_stats table in results/pipeline.db
+    echo "    QC stats saved to: ${QC_DIR}/${subject}_stats.json"
 }
 
 # ----------------------------------------------------------------------------
@@ -204,6 +171,53 @@ compare_with_gain() {
     return 0
 }
 
+# ----------------------------------------------------------------------------
+# FUNCTION: extract_inputs
+# Purpose: Journal inputs of the extract stage: the PET, the VOIs and the
+#          settings the SUVRs depend on (smoothing, threshold, scale factor)
+# ----------------------------------------------------------------------------
+extract_inputs() {
+    local subject=$1
+    local pet_file=$2
+    local scale
+    
+    scale=$(python -m pet_pipeline.store scale --subject "${subject}" | awk -F, 'NR == 2 {print $2}')
+    echo "${pet_file} ${VOI_FILES}" \
+         "${PIPELINE_HARMONIZE_FWHM:+data/scanners.json}" \
+         "harmonize=${PIPELINE_HARMONIZE_FWHM:-none}" \
+         "threshold=${PET_THR:-none}" \
+         "scale=${scale:-1.0}"
+}
+
+# ----------------------------------------------------------------------------
+# FUNCTION: run_stage
+# Purpose: Run a pipeline function as a journaled stage
+# Usage: run_stage SUBJECT STAGE "INPUTS" "OUTPUTS" FUNCTION ARGS...
+#        (NAME=VALUE entries of INPUTS are settings, not files)
+# ----------------------------------------------------------------------------
+run_stage() {
+    local subject=$1
+    local stage=$2
+    local inputs=$3
+    local outputs=$4
+    shift 4
+    
+    local files=()
+    for f in ${inputs}; do
+        if [[ "${f}" == *=* ]]; then
+            files+=(--param "${f}")
+        else
+            files+=(--input "${f}")
+        fi
+    done
+    for f in ${outputs}; do files+=(--output "${f}"); done
+    
+    python -m pet_pipeline.journal run "${subject}" "${stage}" "${files[@]}" \
+        -- bash -c '"$@"' _ "$@"
+}
+
+export -f normalize_pet_intensity extract_suvr_values create_qc_image
+
 # ----------------------------------------------------------------------------
 # MAIN PROCESSING
 # ----------------------------------------------------------------------------
@@ -212,6 +226,9 @@ echo ""
 echo "PROCESSING SUBJECTS"
 echo "-------------------"
 
+# Index data/ once; subject lists and PET paths come from data/manifest.json
+python -m pet_pipeline.manifest build
+
 # Results summary file
 summary_file="${RESULTS_DIR}/summary_$(date +%Y%m%d).csv"
 echo "Subject,Group,SUVR_CG,Cortical_Mean,Cerebellar_Mean,QC_Status,GAIN_Match" > "${summary_file}"
@@ -219,26 +236,14 @@ echo "Subject,Group,SUVR_CG,Cortical_Mean,Cerebellar_Mean,QC_Status,GAIN_Match"
 # Process AD subjects
 ad_count=0
 ad_good=0
-for i in {1..25}; do
-    subject=$(printf "AD%02d" ${i})
-    
-    if [[ ! -d "data/${subject}" ]]; then
-        continue
-    fi
-    
+# PET file per subject (MNI, then MNI_thr, then T1 variant), one manifest query
+mapfile -t ad_subjects < <(python -m pet_pipeline.manifest list --group AD --resolve pet \
+                               --variant MNI --variant MNI_thr --variant T1)
+for line in "${ad_subjects[@]}"; do
+    IFS=$'\t' read -r subject pet_file <<< "${line}"
     echo ""
     echo "Processing ${subject}..."
-    
-    # Find PET file
-    pet_file=""
-    for file in "data/${subject}/pet/${subject}_PiB_5070_MNI.nii.gz" \
-                "data/${subject}/pet/${subject}_PiB_5070_MNI_thr.nii.gz" \
-                "data/${subject}/pet/${subject}_PiB_5070_T1.nii.gz"; do
-        if [[ -f "${file}" ]]; then
-            pet_file="${file}"
-            break
-        fi
-    done
+    export PIPELINE_SUBJECT="${subject}"
     
     if [[ -z "${pet_file}" ]]; then
         echo "  ✗ No PET file found for ${subject}"
@@ -246,10 +251,19 @@ for i in {1..25}; do
     fi
     
     # Normalize intensity if needed
-    normalized_file=$(normalize_pet_intensity "${subject}" "${pet_file}")
+    normalized_file=$(run_stage "${subject}" normalize "${pet_file}" "" \
+                          normalize_pet_intensity "${subject}" "${pet_file}") || {
+        echo "  ✗ ${subject}: normalize failed (see journal), continuing"
+        continue
+    }
     
     # Extract SUVR values
-    result=$(extract_suvr_values "${subject}" "AD" "${normalized_file}")
+    result=$(run_stage "${subject}" extract "$(extract_inputs "${subject}" "${normalized_file}")" \
+                 "${RESULTS_DIR}/${subject}_results.csv ${QC_DIR}/${subject}_stats.json" \
+                 extract_suvr_values "${subject}" "AD" "${normalized_file}") || {
+        echo "  ✗ ${subject}: extract failed (see journal), continuing"
+        continue
+    }
     
     if [[ -n "${result}" ]]; then
         IFS=':' read -r ref cortical_mean cerebellar_mean suvr qc_status <<< "${result}"
@@ -280,25 +294,14 @@ echo "-------------------------"
 
 yc_count=0
 yc_good=0
-for i in {101..125}; do
-    subject=$(printf "YC%d" ${i})
-    
-    if [[ ! -d "data/${subject}" ]]; then
-        continue
-    fi
-    
+# PET file per subject (MNI, then MNI_thr variant), one manifest query
+mapfile -t yc_subjects < <(python -m pet_pipeline.manifest list --group YC --resolve pet \
+                               --variant MNI --variant MNI_thr)
+for line in "${yc_subjects[@]}"; do
+    IFS=$'\t' read -r subject pet_file <<< "${line}"
     echo ""
     echo "Processing ${subject}..."
-    
-    # Find PET file
-    pet_file=""
-    for file in "data/${subject}/pet/${subject}_PiB_5070_MNI.nii.gz" \
-                "data/${subject}/pet/${subject}_PiB_5070_MNI_thr.nii.gz"; do
-        if [[ -f "${file}" ]]; then
-            pet_file="${file}"
-            break
-        fi
-    done
+    export PIPELINE_SUBJECT="${subject}"
     
     if [[ -z "${pet_file}" ]]; then
         echo "  ✗ No PET file found for ${subject}"
@@ -306,7 +309,12 @@ for i in {101..125}; do
     fi
     
     # Extract SUVR values
-    result=$(extract_suvr_values "${subject}" "YC" "${pet_file}")
+    result=$(run_stage "${subject}" extract "$(extract_inputs "${subject}" "${pet_file}")" \
+                 "${RESULTS_DIR}/${subject}_results.csv ${QC_DIR}/${subject}_stats.json" \
+                 extract_suvr_values "${subject}" "YC" "${pet_file}") || {
+        echo "  ✗ ${subject}: extract failed (see journal), continuing"
+        continue
+    }
     
     if [[ -n "${result}" ]]; then
         IFS=':' read -r ref cortical_mean cerebellar_mean suvr qc_status <<< "${result}"
@@ -349,6 +357,7 @@ echo "  - Summary: ${summary_file}"
 echo "  - Individual results: ${RESULTS_DIR}/*_results.csv"
 echo "  - QC images: ${QC_DIR}/"
 echo "  - Log file: ${LOG_FILE}"
+echo "  - Step timings: ${PIPELINE_TRACE} (python -m pet_pipeline.trace report --run ${PIPELINE_RUN_ID})"
 echo ""
 echo "Expected ranges:"
 echo "  - AD subjects: SUVR > 1.4 (amyloid positive)"
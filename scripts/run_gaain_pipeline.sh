@@ -64,11 +64,8 @@ process_subject() {
           -ref $MNI_TEMPLATE \
           -out "$SUBJ_DIR/pet/${SUBJ_ID}_PiB_5070_MNI.nii.gz" \
           -applyxfm -init "$SUBJ_DIR/transform/PET_to_MNI.mat"
-    
-    # 5. Apply intensity threshold (0.001 as per GAAIN)
-    echo "5. Applying intensity threshold (0.001)..."
-    fslmaths "$SUBJ_DIR/pet/${SUBJ_ID}_PiB_5070_MNI.nii.gz" \
-             -thr 0.001 "$SUBJ_DIR/pet/${SUBJ_ID}_PiB_5070_MNI_thr.nii.gz"
+    # 5. The intensity threshold (0.001 as per GAAIN) is applied at
+    #    extraction time (pet_pipeline.extract --threshold), not written out
     
     echo "=== $SUBJ_ID processing complete ==="
 }
@@ -0,0 +1,24 @@
+#!/bin/bash
+# Source from a pipeline script to record every FSL call:
+#
+#   source "$(dirname "$0")/trace_fsl.sh"
+#
+# Each bet/flirt/convert_xfm/fslmaths/fslstats/fslreorient2std call then
+# runs through pet_pipeline.trace, which appends one JSON line (wall/CPU
+# time, peak RSS, bytes read/written, exit status) tagged with the run and
+# the current subject to $PIPELINE_TRACE. Scripts export PIPELINE_SUBJECT
+# per subject so the Python steps are tagged too. Output and exit status
+# are passed through unchanged. Summarize with:
+#
+#   python -m pet_pipeline.trace report
+
+export PIPELINE_RUN_ID="${PIPELINE_RUN_ID:-$(date +%Y%m%d_%H%M%S)}"
+export PIPELINE_TRACE="${PIPELINE_TRACE:-logs/trace.jsonl}"
+
+for _tool in bet flirt convert_xfm fslmaths fslstats fslreorient2std; do
+    eval "${_tool}() {
+        python -m pet_pipeline.trace run --stage ${_tool} \
+            --subject \"\${PIPELINE_SUBJECT:-}\" -- \"\$(type -P ${_tool} || echo ${_tool})\" \"\$@\"
+    }"
+done
+unset _tool
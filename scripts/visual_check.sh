@@ -1,10 +1,14 @@
 #!/bin/bash
 echo "=== VISUAL CHECK ==="
+
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 echo ""
 echo "To check alignment, run this command:"
 echo ""
 echo "fsleyes $FSLDIR/data/standard/MNI152_T1_2mm_brain.nii.gz \\"
-echo "       data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz -cm hot \\"
+echo "       data/AD01/pet/AD01_PiB_5070_MNI.nii.gz -cm hot -dr ${PET_THR:-0} 4 \\"
 echo "       vois/voi_ctx_binary.nii -cm red -a 30 \\"
 echo "       vois/voi_cereb_binary.nii -cm green -a 30 &"
 echo ""
@@ -2,6 +2,9 @@
 echo "=== VISUAL CHECK ==="
 echo ""
 
+# Intensity threshold of the MNI-space PET (config.PET_THRESHOLD)
+source "$(dirname "$0")/pet_threshold.sh"
+
 # Find template
 TEMPLATE=$(find $FSLDIR -name "*MNI152*2mm*.nii.gz" 2>/dev/null | head -1)
 if [ -z "$TEMPLATE" ]; then
@@ -13,7 +16,7 @@ echo ""
 echo "Run this command:"
 echo ""
 echo "fsleyes $TEMPLATE \\"
-echo "       data/AD01/pet/AD01_PiB_5070_MNI_thr.nii.gz -cm hot \\"
+echo "       data/AD01/pet/AD01_PiB_5070_MNI.nii.gz -cm hot -dr ${PET_THR:-0} 4 \\"
 echo "       vois/voi_ctx_binary.nii -cm red -a 30 \\"
 echo "       vois/voi_cereb_binary.nii -cm green -a 30 &"
 echo ""
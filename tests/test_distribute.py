@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import sys
+import time
+
+from pet_pipeline.distribute import Lease, queue_state, worker
+
+SUBJECTS = ["AD%02d" % i for i in range(1, 9)] + ["YC%d" % i for i in range(101, 109)]
+RUN = "import sys, time; open(sys.argv[1], 'a').write(sys.argv[2] + '\\n'); time.sleep(0.05)"
+
+
+def _jobs(tmp_path, subjects=SUBJECTS):
+    jobs = []
+    for subject in subjects:
+        pet = tmp_path / ("%s_PiB_5070_MNI.nii.gz" % subject)
+        pet.write_bytes(subject.encode())
+        jobs.append((subject, {"subject": subject, "pet": str(pet), "group": subject[:2]}))
+    return jobs
+
+
+def _run_worker(jobs, log, work_dir, db):
+    worker("extract", jobs, [sys.executable, "-c", RUN, log, "{subject}"], work_dir, db,
+           lease=10.0, heartbeat=0.05)
+
+
+def test_workers_run_every_subject_exactly_once(tmp_path):
+    jobs, log = _jobs(tmp_path), str(tmp_path / "runs.log")
+    work_dir, db = str(tmp_path / "work"), str(tmp_path / "pipeline.db")
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_run_worker, args=(jobs, log, work_dir, db))
+               for _ in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(120)
+        assert process.exitcode == 0
+    with open(log) as f:
+        runs = f.read().split()
+    assert sorted(runs) == sorted(SUBJECTS)
+    queue_dir = os.path.join(work_dir, "extract")
+    assert set(queue_state(queue_dir, SUBJECTS).values()) == {"done"}
+    assert sorted(n for n in os.listdir(queue_dir) if n.endswith(".done")) == sorted(
+        s + ".done" for s in SUBJECTS)
+    assert not [n for n in os.listdir(queue_dir) if ".lock" in n]
+
+
+def _stale_lock(queue_dir, subject, age):
+    os.makedirs(queue_dir, exist_ok=True)
+    path = os.path.join(queue_dir, subject + ".lock")
+    with open(path, "w") as f:
+        f.write("deadhost:1:0/abcd")
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return path
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    queue_dir = str(tmp_path / "extract")
+    path = _stale_lock(queue_dir, "AD01", age=60)
+    assert not Lease(queue_dir, "AD01", "live").acquire(lease=120)
+    lease = Lease(queue_dir, "AD01", "me")
+    assert lease.acquire(lease=30)
+    assert lease.owner() == lease.token
+    assert not Lease(queue_dir, "AD01", "other").acquire(lease=30)
+    lease.release()
+    assert not os.path.exists(path)
+    assert os.listdir(queue_dir) == []
+
+
+def test_worker_picks_up_a_subject_left_by_a_dead_worker(tmp_path):
+    jobs, log = _jobs(tmp_path, ["AD01", "AD02"]), str(tmp_path / "runs.log")
+    work_dir = str(tmp_path / "work")
+    _stale_lock(os.path.join(work_dir, "extract"), "AD01", age=60)
+    done, failed = worker("extract", jobs, [sys.executable, "-c", RUN, log, "{subject}"],
+                          work_dir, str(tmp_path / "pipeline.db"), lease=30.0, heartbeat=0.05)
+    assert (done, failed) == (2, 0)
+    with open(log) as f:
+        assert sorted(f.read().split()) == ["AD01", "AD02"]
+
+
+def test_takeover_interrupted_after_moving_the_lock_leaves_it_free(tmp_path):
+    queue_dir = str(tmp_path / "extract")
+    path = _stale_lock(queue_dir, "AD01", age=60)
+    os.rename(path, path + ".stale.0123abcd")       # the claimant died here
+    assert Lease(queue_dir, "AD01", "me").acquire(lease=30)
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+import pytest
+
+from pet_pipeline import nifti
+from pet_pipeline.dynamic import frame_timing, sum_frames, window_weights
+
+
+def test_window_weights_count_the_overlap_in_seconds():
+    starts, durations = [0, 2400, 3000, 3600, 4200], [2400, 600, 600, 600, 600]
+    weights = window_weights(starts, durations, (50, 70))
+    assert weights.tolist() == [0.0, 0.0, 600.0, 600.0, 0.0]
+    weights = window_weights(starts, durations, (45, 65))
+    assert weights.tolist() == [0.0, 300.0, 600.0, 300.0, 0.0]
+
+
+def test_frame_timing_from_durations_and_sidecar(tmp_path):
+    starts, durations = frame_timing("unused.nii", [60, 60, 120])
+    assert starts.tolist() == [0.0, 60.0, 120.0]
+    assert durations.tolist() == [60.0, 60.0, 120.0]
+
+    path = tmp_path / "dyn.nii.gz"
+    (tmp_path / "dyn.json").write_text(json.dumps(
+        {"FrameTimesStart": [0, 100, 300], "FrameDuration": [100, 200, 300]}))
+    starts, durations = frame_timing(str(path))
+    assert starts.tolist() == [0.0, 100.0, 300.0]
+    with pytest.raises(FileNotFoundError):
+        frame_timing(str(tmp_path / "other.nii"))
+
+
+def test_sum_frames_is_the_overlap_weighted_mean(tmp_path):
+    path = str(tmp_path / "dyn.nii")
+    levels = np.array([1.0, 2.0, 4.0, 8.0], dtype=np.float32)
+    data = np.ones((6, 5, 4, levels.size), dtype=np.float32) * levels
+    nifti.save(path, data, np.diag([2.0, 2.0, 2.0, 1.0]))
+    starts, durations = frame_timing(path, [600, 600, 600, 600])
+    image, info, _ = sum_frames(path, starts, durations, (15, 35))
+    assert info["frames"] == [1, 2, 3]
+    assert np.allclose(image, (300 * 2.0 + 600 * 4.0 + 300 * 8.0) / 1200)
+    with pytest.raises(ValueError):
+        sum_frames(path, starts, durations, (30, 50))
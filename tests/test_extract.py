@@ -0,0 +1,49 @@
+import numpy as np
+
+from pet_pipeline.extract import RegionMoments
+
+
+def _reference(values):
+    d = values - values.mean()
+    m2, m3, m4 = (d ** 2).sum(), (d ** 3).sum(), (d ** 4).sum()
+    n = values.size
+    return {"mean": values.mean(), "sd": values.std(ddof=1),
+            "skewness": np.sqrt(n) * m3 / m2 ** 1.5, "kurtosis": n * m4 / m2 ** 2 - 3.0}
+
+
+def test_region_moments_match_numpy_across_chunks():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.gamma(2.0, 1.5, 5000), np.zeros(300)])
+    rng.shuffle(values)
+    moments = RegionMoments()
+    for chunk in np.array_split(values, [7, 1000, 1001, 4200]):
+        moments.update(chunk)
+    result = moments.result()
+    expected = _reference(values)
+    assert result["n_voxels"] == values.size
+    assert result["nonzero"] == 5000
+    assert result["min"] == values.min() and result["max"] == values.max()
+    for key, value in expected.items():
+        assert np.isclose(result[key], value, rtol=1e-9), key
+    assert np.isclose(result["mean_nonzero"], values[values != 0].mean())
+
+
+def test_region_moments_merge_is_order_independent():
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(5.0, 2.0, 800), rng.normal(-1.0, 0.5, 50)
+    forward, backward = RegionMoments(), RegionMoments()
+    forward.update(a)
+    forward.update(b)
+    backward.update(b)
+    backward.update(a)
+    for key in ("mean", "sd", "skewness", "kurtosis"):
+        assert np.isclose(forward.result()[key], backward.result()[key], rtol=1e-9)
+
+
+def test_region_moments_count_and_skip_nans():
+    moments = RegionMoments()
+    moments.update(np.array([1.0, np.nan, 3.0, np.inf]))
+    result = moments.result()
+    assert result["nan_count"] == 2
+    assert result["n_voxels"] == 2
+    assert result["mean"] == 2.0
@@ -0,0 +1,55 @@
+import sys
+
+from pet_pipeline.journal import QUARANTINE_AFTER, QUARANTINED, run_stage
+from pet_pipeline.store import ResultsStore
+
+
+def _command(counter):
+    code = ("import sys; open(sys.argv[1], 'a').write('x'); print('SUVR 1.234')")
+    return [sys.executable, "-c", code, str(counter)]
+
+
+def test_done_stage_is_skipped_and_its_output_replayed(tmp_path, capsys):
+    counter, source = tmp_path / "runs", tmp_path / "pet.nii"
+    source.write_bytes(b"image")
+    with ResultsStore(str(tmp_path / "pipeline.db")) as store:
+        args = (store, "AD01", "extract", _command(counter), [str(source)])
+        assert run_stage(*args, run_id="r1") == 0
+        assert run_stage(*args, run_id="r2") == 0
+    assert counter.read_text() == "x"
+    out = capsys.readouterr()
+    assert out.out == "SUVR 1.234\n" * 2
+    assert "done in run r1, skipping" in out.err
+
+
+def test_changed_input_or_param_reruns(tmp_path):
+    counter, source = tmp_path / "runs", tmp_path / "pet.nii"
+    source.write_bytes(b"image")
+    with ResultsStore(str(tmp_path / "pipeline.db")) as store:
+        args = (store, "AD01", "extract", _command(counter), [str(source)])
+        run_stage(*args, params={"threshold": "0.1"})
+        run_stage(*args, params={"threshold": "0.1"})
+        assert counter.read_text() == "x"
+        run_stage(*args, params={"threshold": "0.2"})
+        assert counter.read_text() == "xx"
+        source.write_bytes(b"new image")
+        run_stage(*args, params={"threshold": "0.2"})
+        assert counter.read_text() == "xxx"
+
+
+def test_failed_runs_rerun_until_quarantined(tmp_path):
+    counter = tmp_path / "runs"
+    fail = [sys.executable, "-c", "import sys; open(sys.argv[1], 'a').write('x'); sys.exit(4)",
+            str(counter)]
+    with ResultsStore(str(tmp_path / "pipeline.db")) as store:
+        for _ in range(QUARANTINE_AFTER):
+            assert run_stage(store, "YC01", "extract", fail, retries=1, backoff=0) == 4
+        assert run_stage(store, "YC01", "extract", fail, retries=1, backoff=0) == QUARANTINED
+    assert counter.read_text() == "x" * QUARANTINE_AFTER
+
+
+def test_missing_output_fails_the_stage(tmp_path):
+    command = [sys.executable, "-c", "pass"]
+    with ResultsStore(str(tmp_path / "pipeline.db")) as store:
+        assert run_stage(store, "YC01", "extract", command, outputs=[str(tmp_path / "out")],
+                         retries=1, backoff=0) == 1
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from pet_pipeline import nifti
+from pet_pipeline.logan import LoganSums, check_timing, logan_stream
+
+DURATIONS = [60.0] * 90
+
+
+def _tacs(dvr, k2=0.1):
+    """Frame means of a reference TAC and of a one-tissue target fed by it
+    (dC/dt = k2 (DVR Cref - C)), whose reference Logan plot has slope DVR."""
+    step = 1.0
+    t = np.arange(0, sum(DURATIONS), step) / 60.0           # minutes
+    ref = 5.0 * t * np.exp(-t / 8.0) + 0.2 * t / (1 + t)
+    target = np.zeros_like(ref)
+    for i in range(1, t.size):
+        target[i] = target[i - 1] + step / 60.0 * k2 * (dvr * ref[i - 1] - target[i - 1])
+    per_frame = int(DURATIONS[0] / step)
+    return (ref.reshape(-1, per_frame).mean(axis=1),
+            target.reshape(-1, per_frame).mean(axis=1))
+
+
+def test_logan_sums_fit_exact_lines():
+    sums = LoganSums(2)
+    activity = np.array([2.0, 4.0])
+    for x in (1.0, 2.0, 3.0, 5.0):
+        sums.add(x * activity, np.array([1.5 * x + 0.5, -0.5 * x + 2.0]) * activity, activity)
+    slope, intercept = sums.solve()
+    assert np.allclose(slope, [1.5, -0.5])
+    assert np.allclose(intercept, [0.5, 2.0])
+
+
+def test_logan_sums_skip_points_without_activity():
+    sums = LoganSums(1)
+    for x in (1.0, 2.0):
+        sums.add(np.array([x]), np.array([x]), np.array([1.0]))
+    sums.add(np.array([3.0]), np.array([9.0]), np.array([0.0]))
+    slope, _ = sums.solve()
+    assert sums.n.tolist() == [2]
+    assert slope.tolist() == [0.0]
+
+
+def test_logan_stream_recovers_the_simulated_dvr(tmp_path):
+    ref, target = _tacs(dvr=1.8)
+    shape = (4, 4, 6)
+    data = np.empty(shape + (len(DURATIONS),), dtype=np.float32)
+    data[:, :, :3] = ref
+    data[:, :, 3:] = target
+    path = str(tmp_path / "dyn.nii")
+    nifti.save(path, data, np.diag([2.0, 2.0, 2.0, 1.0]))
+    masks = {"CG": np.zeros(shape, bool), "ctx": np.zeros(shape, bool)}
+    masks["CG"][:, :, :3] = True
+    masks["ctx"][:, :, 3:] = True
+    starts = np.concatenate([[0.0], np.cumsum(DURATIONS)[:-1]])
+
+    dvr_map, results = logan_stream(path, starts, DURATIONS, masks, t_star=35.0)
+    dvr, _, points = results["ctx"]
+    assert points == 90 - 35
+    assert dvr == pytest.approx(1.8, rel=1e-3)
+    assert np.allclose(dvr_map[masks["ctx"]], dvr, rtol=1e-4)
+    assert np.allclose(dvr_map[masks["CG"]], 1.0, rtol=1e-4)
+
+    _, given = logan_stream(path, starts, DURATIONS, masks, t_star=35.0, ref_tac=ref)
+    assert given["ctx"][0] == pytest.approx(dvr, rel=1e-4)
+
+
+def test_check_timing_rejects_late_start_and_gaps():
+    check_timing([0.0, 60.0, 120.0], [60.0, 60.0, 60.0])
+    with pytest.raises(ValueError, match="injection"):
+        check_timing([300.0, 360.0], [60.0, 60.0])
+    with pytest.raises(ValueError, match="contiguous"):
+        check_timing([0.0, 60.0, 180.0], [60.0, 60.0, 60.0])
+    with pytest.raises(ValueError, match="contiguous"):
+        check_timing([0.0, 30.0], [60.0, 60.0])
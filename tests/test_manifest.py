@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+from pet_pipeline import config
+
+
+def _manifest(data_dir, *args):
+    result = subprocess.run([sys.executable, "-m", "pet_pipeline.manifest", "--data",
+                             str(data_dir)] + list(args), stdout=subprocess.PIPE, text=True)
+    return result.returncode, result.stdout
+
+
+def _pet(data_dir, subject, variant=None):
+    folder = data_dir / subject / "pet"
+    folder.mkdir(parents=True, exist_ok=True)
+    name = "%s_%s%s.nii.gz" % (subject, config.PET_BASE, "_" + variant if variant else "")
+    path = folder / name
+    path.write_bytes(b"")
+    return str(path)
+
+
+def test_list_resolves_every_subject_in_one_call(tmp_path):
+    mni = _pet(tmp_path, "AD01", "MNI")
+    _pet(tmp_path, "AD02")
+    t1 = _pet(tmp_path, "YC101", "T1")
+    assert _manifest(tmp_path, "build")[0] == 0
+    status, out = _manifest(tmp_path, "list", "--resolve", "pet", "--variant", "MNI",
+                            "--variant", "T1")
+    assert status == 0
+    assert out.splitlines() == ["AD01\t" + mni, "AD02\t", "YC101\t" + t1]
+    _, out = _manifest(tmp_path, "list", "--group", "YC", "--resolve", "pet")
+    assert out.splitlines() == ["YC101\t" + t1]
+
+
+def test_queries_read_the_built_manifest_until_refresh(tmp_path):
+    _pet(tmp_path, "AD01")
+    _manifest(tmp_path, "build")
+    mni = _pet(tmp_path, "AD01", "MNI")
+    assert _manifest(tmp_path, "resolve", "AD01", "pet", "--variant", "MNI")[0] == 1
+    assert _manifest(tmp_path, "resolve", "AD01", "pet", "--variant", "MNI",
+                     "--refresh") == (0, mni + "\n")
+    assert _manifest(tmp_path, "resolve", "AD01", "pet", "--variant", "MNI") == (0, mni + "\n")
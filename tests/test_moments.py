@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from pet_pipeline.moments import (flirt_to_world, image_moments, rigid_from_moments,
+                                  world_to_flirt)
+from pet_pipeline.resample import fsl_scaled_voxels
+
+
+def _image(affine, shape):
+    zooms = tuple(np.linalg.norm(np.asarray(affine)[:3, :3], axis=0))
+    return SimpleNamespace(affine=np.asarray(affine, dtype=np.float64), shape=shape, zooms=zooms)
+
+
+def _rigid(angle_deg, translation):
+    a = np.radians(angle_deg)
+    world = np.eye(4)
+    world[:2, :2] = [[np.cos(a), -np.sin(a)], [np.sin(a), np.cos(a)]]
+    world[:3, 3] = translation
+    return world
+
+
+RAS = _image([[2, 0, 0, -90], [0, 2, 0, -126], [0, 0, 2, -72], [0, 0, 0, 1]], (91, 109, 91))
+LAS = _image([[-3, 0, 0, 100], [0, 3, 0, -110], [0, 0, 3.5, -60], [0, 0, 0, 1]], (64, 72, 40))
+
+
+def test_identity_world_is_identity_flirt_on_the_same_grid():
+    for image in (RAS, LAS):
+        assert np.allclose(world_to_flirt(np.eye(4), image, image), np.eye(4))
+
+
+def test_flirt_matrix_maps_scaled_voxels():
+    world = _rigid(12.0, [4.0, -7.0, 3.0])
+    matrix = world_to_flirt(world, LAS, RAS)
+    voxel = np.array([10.0, 20.0, 15.0, 1.0])
+    src_scaled = fsl_scaled_voxels(LAS.affine, LAS.shape, LAS.zooms) @ voxel
+    ref_voxel = np.linalg.inv(RAS.affine) @ world @ LAS.affine @ voxel
+    ref_scaled = fsl_scaled_voxels(RAS.affine, RAS.shape, RAS.zooms) @ ref_voxel
+    assert np.allclose(matrix @ src_scaled, ref_scaled)
+
+
+def test_flirt_to_world_inverts_world_to_flirt():
+    world = _rigid(-25.0, [1.5, 2.0, -9.0])
+    for src, ref in ((LAS, RAS), (RAS, LAS), (RAS, RAS)):
+        assert np.allclose(flirt_to_world(world_to_flirt(world, src, ref), src, ref), world)
+
+
+def test_moments_recover_a_translation():
+    shape = (40, 44, 36)
+    i, j, k = np.meshgrid(*(np.arange(n, dtype=np.float64) for n in shape), indexing="ij")
+
+    def blob(ci, cj, ck):
+        return np.exp(-((i - ci) / 8.0) ** 2 - ((j - cj) / 5.0) ** 2 - ((k - ck) / 3.0) ** 2)
+
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    src = image_moments(blob(18.0, 22.0, 17.0), affine)
+    ref = image_moments(blob(21.0, 20.0, 18.0), affine)
+    world, angle = rigid_from_moments(src, ref)
+    assert angle < 1.0
+    assert np.allclose(world[:3, :3], np.eye(3), atol=1e-3)
+    assert np.allclose(world[:3, 3], [6.0, -4.0, 2.0], atol=0.05)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from pet_pipeline import nifti, phantom
+from pet_pipeline.pvc import CLASSES, TransferModel
+
+
+@pytest.fixture(scope="module")
+def brain_mask(tmp_path_factory):
+    try:
+        labels, affine, header = phantom.grid()
+    except FileNotFoundError as exc:
+        pytest.skip(str(exc))
+    path = str(tmp_path_factory.mktemp("pvc") / "brain_mask.nii.gz")
+    nifti.save(path, (labels > 0).astype(np.float32), affine, template=header)
+    return path
+
+
+def test_gtm_recovers_the_phantom_class_levels(brain_mask, tmp_path):
+    model = TransferModel(8.0, brain_mask, str(tmp_path))
+    assert model.brain_mask == brain_mask and not model.cached
+    volume = phantom.make_phantom(2.4, noise=0.0, fwhm=8.0)
+    observed, corrected = model.correct(volume)
+    expected = phantom.levels(2.4) * phantom.REF_ACTIVITY
+    ctx = CLASSES.index("ctx")
+    assert observed[ctx] < 0.9 * expected[ctx]
+    assert np.allclose(corrected[1:], expected[1:], rtol=1e-3)
+    assert TransferModel(8.0, brain_mask, str(tmp_path)).cached
+
+
+def test_missing_brain_mask_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError, match="brain mask"):
+        TransferModel(8.0, str(tmp_path / "missing.nii.gz"), str(tmp_path))
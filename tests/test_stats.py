@@ -0,0 +1,21 @@
+import numpy as np
+from scipy import stats as scipy_stats
+
+from pet_pipeline.stats import group_statistics
+
+
+def test_group_statistics_match_scipy_welch():
+    ad, yc = np.array([2.459, 2.678, 2.467]), np.array([1.044, 0.987, 1.199, 0.978, 1.015])
+    groups = np.array(["AD"] * ad.size + ["YC"] * yc.size)
+    out = group_statistics(np.concatenate([ad, yc]), groups)
+    assert out["AD"]["n"] == 3 and np.isclose(out["AD"]["sd"], ad.std(ddof=1))
+    assert np.isclose(out["YC"]["median"], 1.015)
+    welch = scipy_stats.ttest_ind(ad, yc, equal_var=False)
+    assert np.isclose(out["comparison"]["t"], welch.statistic)
+    assert np.isclose(out["comparison"]["df"], welch.df)
+
+
+def test_nan_suvrs_are_left_out():
+    out = group_statistics(np.array([1.0, np.nan, 3.0]), np.array(["AD", "AD", "AD"]))
+    assert out["AD"]["n"] == 2 and out["AD"]["mean"] == 2.0
+    assert "comparison" not in out
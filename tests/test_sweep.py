@@ -0,0 +1,48 @@
+import numpy as np
+
+from pet_pipeline import config
+from pet_pipeline.extract import SortedValues
+from pet_pipeline.sweep import baseline_threshold, parse_thresholds
+
+
+def test_mean_above_matches_a_rescan_per_threshold():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.uniform(0, 1, 2000), np.zeros(500), [np.nan]])
+    rng.shuffle(values)
+    values = values.astype(np.float32)
+    sorted_values = SortedValues(np.array_split(values, 3))
+    thresholds = np.array([-0.5, 0.0, 0.001, 0.25, 0.5, 0.999, 2.0])
+    finite = values[np.isfinite(values)]
+    count, _ = sorted_values.count_sum_above(thresholds)
+    for t, n, mean in zip(thresholds, count, sorted_values.mean_above(thresholds)):
+        kept = finite[(finite >= t) & (finite != 0)]
+        assert n == kept.size
+        if kept.size:
+            assert np.isclose(mean, kept.astype(np.float64).mean(), rtol=1e-6)
+        else:
+            assert np.isnan(mean)
+
+
+def test_zeros_never_count_towards_the_mean():
+    sorted_values = SortedValues([np.array([0.0, 0.0, -1.0, 2.0, 4.0], np.float32)])
+    count, total = sorted_values.count_sum_above([-2.0, 0.0, 3.0])
+    assert count.tolist() == [3, 2, 1]
+    assert total.tolist() == [5.0, 6.0, 4.0]
+
+
+def test_empty_region_gives_nan():
+    assert np.isnan(SortedValues([]).mean_above([0.0])).all()
+
+
+def test_parse_thresholds_ranges_and_values():
+    values = parse_thresholds("0:0.02:0.01,0.5")
+    expected = [0.0, 0.01, 0.02, 0.5, baseline_threshold()]
+    assert np.allclose(values, np.unique(expected))
+
+
+def test_baseline_is_always_swept(monkeypatch):
+    monkeypatch.setattr(config, "PET_THRESHOLD", None)
+    assert baseline_threshold() == 0.0
+    assert 0.0 in parse_thresholds("0.1:0.3:0.1")
+    monkeypatch.setattr(config, "PET_THRESHOLD", 0.001)
+    assert 0.001 in parse_thresholds("0.1:0.3:0.1")